@@ -8,14 +8,19 @@ from glob import glob
 from datetime import datetime
 from tqdm import tqdm
 from pipe import artefact_generator_fast  # nutzt deine schnelle Version
+from pipe import raster_io, region_tiles
+
+ARTEFACT_TYPES = ["STD", "MORAN", "GEARY"]
+LISA_TYPES = ["MORANP", "LISA"]
 
 # ------------------------------------------------------------
 # Hilfsfunktionen
 # ------------------------------------------------------------
 
 def list_rasters(base_dir, prefix):
-    """Listet alle TIFs mit Prefix (z.B. NDVI oder NDWI)."""
-    return sorted(glob(os.path.join(base_dir, f"{prefix}_*.tif")))
+    """Listet alle Basis-TIFs mit Prefix (z.B. NDVI oder NDWI), ohne Artefakte/Stacks."""
+    files = glob(os.path.join(base_dir, f"{prefix}_*.tif"))
+    return sorted(f for f in files if not raster_io.is_artefact_file(f))
 
 
 def extract_date_from_filename(filename):
@@ -28,8 +33,16 @@ def extract_date_from_filename(filename):
         return None, None
 
 
-def check_missing_artefacts(base_dir, prefix="NDVI"):
-    """Prüft, welche Artefakte (STD, MORAN, GEARY) pro Monat fehlen."""
+def check_missing_artefacts(base_dir, prefix="NDVI", layout=None, types=None):
+    """
+    Prüft, welche Artefakte (STD, MORAN, GEARY; optional types) pro Monat fehlen.
+
+    layout "files": je Artefakt eine Datei; layout "stack": fehlende Bänder
+    im Mehrband-Stack {prefix}_STACK_YYYY_MM.tif (None → outputs.raster.layout).
+    Liefert (Basisname ohne .tif, fehlende Typen).
+    """
+    layout = layout or raster_io.raster_options().get("layout", "files")
+    types = types or ARTEFACT_TYPES
     base_files = list_rasters(base_dir, prefix)
     status = []
 
@@ -37,37 +50,51 @@ def check_missing_artefacts(base_dir, prefix="NDVI"):
         year, month = extract_date_from_filename(path)
         if not year:
             continue
-        stem = f"{prefix}_{year}_{str(month).zfill(2)}"
-        expected = [
-            os.path.join(base_dir, f"{prefix}_STD_{year}_{str(month).zfill(2)}.tif"),
-            os.path.join(base_dir, f"{prefix}_MORAN_{year}_{str(month).zfill(2)}.tif"),
-            os.path.join(base_dir, f"{prefix}_GEARY_{year}_{str(month).zfill(2)}.tif"),
-        ]
-        existing = [os.path.exists(e) for e in expected]
+        stem = os.path.basename(path)[:-len(".tif")]
+        month_token = f"{year}_{str(month).zfill(2)}"
+
+        if layout == "stack":
+            bands = raster_io.stack_bands(raster_io.stack_path(base_dir, prefix, month_token))
+            existing = [f"{prefix}_{t}" in bands for t in types]
+        else:
+            expected = [os.path.join(base_dir, f"{prefix}_{t}_{month_token}.tif") for t in types]
+            existing = [os.path.exists(e) for e in expected]
+
         if not all(existing):
-            missing = [n for n, ok in zip(["STD", "MORAN", "GEARY"], existing) if not ok]
+            missing = [n for n, ok in zip(types, existing) if not ok]
             status.append((stem, missing))
     return status
 
 
-def generate_missing_artefacts(cfg, mode="NDVI"):
-    """Erzeugt gezielt fehlende Artefakte."""
+def generate_missing_artefacts(cfg, mode="NDVI", tiles=None):
+    """
+    Erzeugt gezielt fehlende Artefakte – bei Kachelung (export.tiling) je
+    Kachelordner; tiles (Liste von IDs) beschränkt den Lauf auf einzelne Kacheln.
+    """
     base_dir = cfg["paths"]["ndvi_dir"] if mode == "NDVI" else cfg["paths"]["ndwi_dir"]
-    missing = check_missing_artefacts(base_dir, prefix=mode)
+    lisa_opts = dict(cfg.get("artefacts", {}).get("lisa", {}) or {})
+    with_lisa = lisa_opts.pop("enabled", False)
+    types = ARTEFACT_TYPES + LISA_TYPES if with_lisa else ARTEFACT_TYPES
+    missing = [
+        (folder, stem, missing_types)
+        for tile, folder in region_tiles.list_tile_dirs(cfg, base_dir).items()
+        if tiles is None or tile in tiles
+        for stem, missing_types in check_missing_artefacts(folder, prefix=mode, types=types)
+    ]
 
     if not missing:
         print(f"✅ Alle Artefakte für {mode} vollständig.")
         return
 
     print(f"\n⚙️ Fehlende Artefakte für {mode}: {len(missing)} Datensätze\n")
-    for stem, types in missing:
+    for _, stem, types in missing:
         print(f"   - {stem}: {', '.join(types)} fehlen")
 
     # Nutzerhinweis: Blockweise Verarbeitung
     print("\n🚀 Starte gezielte Berechnung fehlender Artefakte ...")
 
-    for stem, types in tqdm(missing):
-        base_path = os.path.join(base_dir, f"{stem}.tif")
+    for folder, stem, types in tqdm(missing):
+        base_path = os.path.join(folder, f"{stem}.tif")
         if not os.path.exists(base_path):
             print(f"⚠️ Basisraster fehlt: {base_path}")
             continue
@@ -78,6 +105,9 @@ def generate_missing_artefacts(cfg, mode="NDVI"):
                 compute_std="STD" in types,
                 compute_moran="MORAN" in types,
                 compute_geary="GEARY" in types,
+                compute_lisa=any(t in types for t in LISA_TYPES),
+                lisa_options=lisa_opts,
+                coarse_grid=cfg.get("artefacts", {}).get("coarse_grid", False),
             )
         except Exception as e:
             print(f"❌ Fehler bei {stem}: {e}")
@@ -5,103 +5,96 @@ import os
 import time
 import numpy as np
 import rasterio
-from scipy.ndimage import generic_filter
-from libpysal.weights import lat2W
-from esda import Moran_Local, Geary_Local
 from tqdm import tqdm
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from config.config import cfg
+from pipe import raster_io, io_pipeline, lisa, region_tiles, artefact_generator_fast
 
 
 # === Hilfsfunktionen ===
 
 def local_std(arr, size=11):
-    """Lokale Standardabweichung mit NaN-handling."""
-    return generic_filter(arr, np.nanstd, size=size, mode='nearest')
+    """Lokale Standardabweichung mit NaN-handling (NaN → Szenenmittel, wie artefact_generator_fast)."""
+    return artefact_generator_fast.local_std(arr, size=size)
 
 
 def save_raster(out_path, profile, data):
-    """Speichert eine GeoTIFF-Datei im float32-Format."""
-    meta = profile.copy()
-    meta.update(dtype="float32", count=1, compress="lzw")
-    with rasterio.open(out_path, "w", **meta) as dst:
-        dst.write(data.astype("float32"), 1)
+    """Speichert eine GeoTIFF-Datei (Format laut cfg["outputs"]["raster"])."""
+    raster_io.save_raster(out_path, profile, data)
 
 
-def safe_geary(values, w):
+def _write_artefacts(full_path, index, month, prof, artefacts, arr, suffix, downsample):
+    """Write-behind-Auftrag: Einzeldateien oder Mehrband-Stack (outputs.raster.layout)."""
+    out_paths = raster_io.save_artefacts(
+        full_path, index, month, prof, artefacts, base=arr, suffix=suffix, downsample=downsample,
+    )
+    print(f"     ✅ {', '.join(artefacts)} gespeichert: {', '.join(os.path.basename(p) for p in out_paths)}")
+
+
+def base_raster_jobs(indices=("NDVI", "NDWI"), tiles=None):
     """
-    Robuster Wrapper für Geary_Local – nutzt Fallback, wenn moderne API fehlt.
+    (index, Ordner, Basisraster) je Indexordner aus cfg["paths"] – bei Kachelung
+    (export.tiling) je Kachelordner; tiles (Liste von IDs) beschränkt die Auswahl.
     """
-    try:
-        # Versuch: moderne sklearn-API
-        model = Geary_Local()
-        if hasattr(model, "fit_transform"):
-            res = model.fit_transform(values.reshape(-1, 1))
-            return np.array(res).ravel()
-    except Exception:
-        pass
-
-    try:
-        # Versuch: klassische API
-        g = Geary_Local(values, w)
-        for attr in ["Cs", "geary_local", "localG", "G_local", "stat", "statistic"]:
-            if hasattr(g, attr):
-                print(f"     ↳ Geary_Local ({attr}) verwendet.")
-                return np.array(getattr(g, attr)).ravel()
-    except Exception:
-        pass
-
-    # Fallback: manuelle Berechnung
-    print("     ⚙️ Geary-Fallback aktiv (manuelle Berechnung).")
-    y = values.copy()
-    mean_y = np.mean(y)
-    numerator = np.zeros_like(y)
-    for i, neighbors in enumerate(w.neighbors.values()):
-        numerator[i] = np.sum((y[i] - y[neighbors])**2)
-    denominator = 2 * len(y) * np.sum((y - mean_y)**2)
-    return (len(y) - 1) * numerator / denominator
+    jobs = []
+    for index in indices:
+        index_dir = cfg["paths"][f"{index.lower()}_dir"]
+        for tile, folder in region_tiles.list_tile_dirs(cfg, index_dir).items():
+            if (tiles is not None and tile not in tiles) or not os.path.isdir(folder):
+                continue
+            jobs.append((index, folder, sorted(
+                os.path.join(folder, f) for f in os.listdir(folder)
+                if f.endswith(".tif") and index in f and not raster_io.is_artefact_file(f)
+            )))
+    return jobs
 
 
 # === Hauptfunktion ===
 
-def generate_environmental_artefacts(sample=False, sample_size=500, downsample=5):
+def generate_environmental_artefacts(sample=False, sample_size=500, downsample=5, tiles=None):
     """
     Berechnet lokale Umweltartefakte (STD, Moran, Geary)
-    für alle Raster im NDVI/NDWI-Verzeichnis.
+    für alle Raster im NDVI/NDWI-Verzeichnis – bei Kachelung je Kachelordner,
+    die Ausgaben landen neben dem Basisraster.
 
     Args:
         sample (bool): Wenn True, nur mittleren Ausschnitt verarbeiten.
         sample_size (int): Größe der Stichprobe in Pixeln.
         downsample (int): Reduktionsfaktor für Moran/Geary-Berechnung.
-    """
-    dirs = cfg["data"]["raster_dirs"]
+        tiles (list): Kachel-IDs (None → alle vorhandenen Kachelordner).
 
-    for index, index_dir in dirs.items():
-        full_path = os.path.join(cfg["data"]["base_dir"], index_dir)
-        os.makedirs(full_path, exist_ok=True)
+    Ist artefacts.lisa.enabled gesetzt, kommen Pseudo-p-Werte (MORANP) und
+    die LISA-Clusterkarte (HH/LH/LL/HL) hinzu.
 
-        raster_files = sorted([
-            os.path.join(full_path, f) for f in os.listdir(full_path)
-            if f.endswith(".tif") and index in f and "_STD_" not in f and "_MORAN_" not in f and "_GEARY_" not in f
-        ])
+    Lesen des nächsten Rasters und Schreiben der Ergebnisse laufen im
+    Hintergrund (artefacts.io_pipeline: prefetch, write_queue).
 
-        print(f"\n📂 {index}: {len(raster_files)} Raster gefunden")
+    Mit artefacts.coarse_grid bleiben Moran/Geary/MORANP/LISA in
+    Downsample-Auflösung (skalierter Geotransform) statt hochkopiert zu werden.
+    """
+    io_opts = cfg.get("artefacts", {}).get("io_pipeline", {})
+    writer = io_pipeline.start_writer(io_opts.get("write_queue", 1))
+    read_stats = {}
+    lisa_opts = dict(cfg.get("artefacts", {}).get("lisa", {}) or {})
+    with_lisa = lisa_opts.pop("enabled", False)
+    coarse = cfg.get("artefacts", {}).get("coarse_grid", False)
+
+    for index, full_path, raster_files in base_raster_jobs(tiles=tiles):
+        print(f"\n📂 {index} ({full_path}): {len(raster_files)} Raster gefunden")
         for f in raster_files[:3]:
             print(f"   - {os.path.basename(f)}")
 
-        for path in tqdm(raster_files, desc=f"{index}-Analyse"):
+        pipeline = io_pipeline.prefetch(
+            raster_files, raster_io.read_raster, depth=io_opts.get("prefetch", 1), stats=read_stats
+        )
+        for path, (arr, prof) in tqdm(pipeline, total=len(raster_files), desc=f"{index}-Analyse"):
             t0 = time.time()
             base = os.path.basename(path)
             month = base.split("_")[-2] + "_" + base.split("_")[-1].split(".")[0]
             print(f"\n🧮 Verarbeite {index} → {month}")
 
-            with rasterio.open(path) as src:
-                arr = src.read(1).astype("float32")
-                prof = src.profile
-                arr[arr == src.nodata] = np.nan
-
             if sample:
                 mid_y, mid_x = arr.shape[0] // 2, arr.shape[1] // 2
                 arr = arr[mid_y - sample_size//2 : mid_y + sample_size//2,
@@ -111,34 +104,27 @@ def generate_environmental_artefacts(sample=False, sample_size=500, downsample=5
             # --- STD ---
             print("  • Berechne lokale STD …")
             std_map = local_std(arr, size=11)
-            out_std = os.path.join(full_path, f"{index}_STD_{month}{'_sample' if sample else ''}.tif")
-            save_raster(out_std, prof, std_map)
-            print(f"     ✅ STD gespeichert: {os.path.basename(out_std)}")
 
-            # --- Moran & Geary ---
+            # --- Moran & Geary (Downsample-Gitter, vektorisiert wie esda) ---
             print("  • Berechne Moran & Geary …")
-            sub_arr = arr[::downsample, ::downsample].astype("float64")
-            sub_arr[np.isnan(sub_arr)] = 0
-
-            w = lat2W(*sub_arr.shape)
-            w.transform = "r"
-
-            moran = Moran_Local(sub_arr.ravel(), w)
-            geary_vals = safe_geary(sub_arr.ravel(), w)
-
-            moran_map = np.repeat(np.repeat(moran.Is.reshape(sub_arr.shape), downsample, axis=0), downsample, axis=1)
-            geary_map = np.repeat(np.repeat(geary_vals.reshape(sub_arr.shape), downsample, axis=0), downsample, axis=1)
-
-            moran_map = moran_map[:arr.shape[0], :arr.shape[1]]
-            geary_map = geary_map[:arr.shape[0], :arr.shape[1]]
-
-            out_moran = os.path.join(full_path, f"{index}_MORAN_{month}{'_sample' if sample else ''}.tif")
-            out_geary = os.path.join(full_path, f"{index}_GEARY_{month}{'_sample' if sample else ''}.tif")
-
-            save_raster(out_moran, prof, moran_map)
-            save_raster(out_geary, prof, geary_map)
-
-            print(f"     ✅ MORAN & GEARY gespeichert.")
+            moran_map, geary_map = lisa.moran_geary(arr, downsample)
+            if not coarse:
+                moran_map = lisa.upsample(moran_map, downsample, arr.shape)
+                geary_map = lisa.upsample(geary_map, downsample, arr.shape)
+
+            artefacts = {"STD": std_map, "MORAN": moran_map, "GEARY": geary_map}
+            if with_lisa:
+                print(f"  • Berechne LISA-Signifikanz ({lisa_opts.get('mode', 'permutation')}) …")
+                res = lisa.lisa_rasters(arr, downsample=downsample, coarse=coarse, **lisa_opts)
+                artefacts.update(MORANP=res["MORANP"], LISA=res["LISA"])
+
+            # Schreiben im Hintergrund, währenddessen rechnet das nächste Raster
+            io_pipeline.submit_write(
+                writer, _write_artefacts, full_path, index, month, prof,
+                artefacts, arr, "_sample" if sample else "", downsample,
+            )
             print(f"     ⏱️ Dauer: {time.time()-t0:.1f}s")
 
+    io_pipeline.finish_writer(writer)
+    io_pipeline.report(read_stats, writer)
     print("\n🏁 Fertig! Alle Artefakte berechnet.")
@@ -6,42 +6,69 @@
 import os, time, numpy as np, rasterio
 from tqdm import tqdm
 from scipy.ndimage import generic_filter
-from libpysal.weights import lat2W
-from esda import Moran_Local, Geary_Local
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from pipe import raster_io, io_pipeline, lisa
 
 # ------------------------------------------------------------
 # Hilfsfunktionen
 # ------------------------------------------------------------
 
-def local_std(arr, size=11):
-    """Lokale Standardabweichung mit NaN-handling (blockweise)."""
-    arr = np.nan_to_num(arr, nan=np.nanmean(arr))
-    return generic_filter(arr, np.nanstd, size=size, mode='nearest')
+def std_fill(arr):
+    """NaN-Füllwert vor der STD: Szenenmittel (float64) – gilt für alle STD-Pfade."""
+    return np.nanmean(arr, dtype=np.float64)
 
 
-def save_raster(out_path, profile, data):
-    """Speichert ein GeoTIFF im float32-Format."""
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    meta = profile.copy()
-    meta.update(dtype="float32", count=1, compress="lzw", BIGTIFF="IF_NEEDED")
-    with rasterio.open(out_path, "w", **meta) as dst:
-        dst.write(data.astype("float32"), 1)
+def std_window(arr, y0, y1, x0, x1, size=11, fill=None):
+    """
+    Lokale STD für arr[y0:y1, x0:x1]: Ausschnitt mit Halo (size // 2), NaN → fill
+    (Szenenmittel), generic_filter/nanstd mit mode="nearest" – am echten Rand wie
+    auf der ganzen Szene, innen liefert der Halo die Nachbarn.
+    """
+    fill = std_fill(arr) if fill is None else fill
+    halo = size // 2
+    ya, yb = max(y0 - halo, 0), min(y1 + halo, arr.shape[0])
+    xa, xb = max(x0 - halo, 0), min(x1 + halo, arr.shape[1])
+    block = arr[ya:yb, xa:xb].astype(np.float32)
+    block[np.isnan(block)] = fill
+    res = generic_filter(block, np.nanstd, size=size, mode='nearest')
+    return res[y0 - ya:y1 - ya, x0 - xa:x1 - xa]
 
 
-def compute_moran_geary(arr, downsample=5):
-    """Berechnet lokale Moran- & Geary-Werte auf einem Downsample."""
-    sub = arr[::downsample, ::downsample].astype("float64")
-    sub[np.isnan(sub)] = 0
-    w = lat2W(*sub.shape)
-    w.transform = "r"
+def local_std(arr, size=11, strip_rows=512):
+    """
+    Lokale Standardabweichung mit NaN-handling (NaN → Szenenmittel), streifenweise
+    mit Halo direkt in ein float32-Ergebnis – ohne gefüllte Kopie der ganzen Szene.
+    """
+    fill = std_fill(arr)
+    out = np.empty(arr.shape, dtype=np.float32)
+    for y in range(0, arr.shape[0], strip_rows):
+        y1 = min(y + strip_rows, arr.shape[0])
+        out[y:y1] = std_window(arr, y, y1, 0, arr.shape[1], size, fill)
+    return out
+
+
+def save_raster(out_path, profile, data):
+    """Speichert ein GeoTIFF (Format laut cfg["outputs"]["raster"])."""
+    raster_io.save_raster(out_path, profile, data)
+
 
-    moran = Moran_Local(sub.ravel(), w)
-    geary = Geary_Local(sub.ravel(), w)
+def _write_artefacts(out_dir, prefix, month, prof, artefacts, arr, downsample):
+    """Write-behind-Auftrag; ein vorhandener Stack wird um die neuen Bänder ergänzt."""
+    out_paths = raster_io.save_artefacts(out_dir, prefix, month, prof, artefacts, base=arr, downsample=downsample)
+    print(f"     ✅ {', '.join(artefacts)} gespeichert: {', '.join(os.path.basename(p) for p in out_paths)}")
 
-    moran_map = np.repeat(np.repeat(moran.Is.reshape(sub.shape), downsample, axis=0), downsample, axis=1)
-    geary_map = np.repeat(np.repeat(geary.Cs.reshape(sub.shape), downsample, axis=0), downsample, axis=1)
 
-    return moran_map[:arr.shape[0], :arr.shape[1]], geary_map[:arr.shape[0], :arr.shape[1]]
+def compute_moran_geary(arr, downsample=5, coarse=False):
+    """
+    Berechnet lokale Moran- & Geary-Werte (esda Moran_Local.Is / Geary_Local.localG)
+    auf einem Downsample – vektorisiert, ohne Gewichtsobjekt und Permutationen.
+    coarse=True → Ergebnis in Zellauflösung statt auf volle Größe vergrößert.
+    """
+    moran, geary = lisa.moran_geary(arr, downsample)
+    if coarse:
+        return moran, geary
+    return lisa.upsample(moran, downsample, arr.shape), lisa.upsample(geary, downsample, arr.shape)
 
 
 # ------------------------------------------------------------
@@ -56,56 +83,88 @@ def generate_environmental_artefacts_fast(
     compute_geary=True,
     std_size=11,
     downsample=5,
+    prefetch=1,
+    write_queue=1,
+    compute_lisa=False,
+    lisa_options=None,
+    coarse_grid=False,
+    files=None,
+    strip_rows=512,
 ):
     """
     Berechnet Umwelt-Artefakte (lokale STD, Moran, Geary)
     - entweder für alle Raster im Ordner (base_dir)
     - oder gezielt für eine einzelne Datei (single_file)
+    - oder für eine Dateiliste (files, z. B. aus artefact_planner)
+
+    Mit compute_lisa=True kommen Pseudo-p-Werte (MORANP) und die Clusterkarte
+    (LISA: 1 HH, 2 LH, 3 LL, 4 HL, 0 nicht signifikant) hinzu; lisa_options
+    wird an lisa.lisa_rasters durchgereicht (mode, permutations, seed, …).
+
+    Das nächste Raster wird vorgeladen (prefetch), Ergebnisse werden über eine
+    begrenzte Warteschlange (write_queue) im Hintergrund geschrieben.
+
+    Mit coarse_grid=True werden Moran/Geary/MORANP/LISA in Downsample-Auflösung
+    mit skaliertem Geotransform gespeichert (Einzeldateien) statt hochkopiert.
+    strip_rows ist die Streifenhöhe der STD (Zwischenspeicher ≈ Streifen × Breite).
     """
 
-    if single_file:
+    if files:
+        files = list(files)
+    elif single_file:
         files = [single_file]
     elif base_dir:
         files = [os.path.join(base_dir, f) for f in os.listdir(base_dir)
-                 if f.endswith(".tif") and "_STD_" not in f and "_MORAN_" not in f and "_GEARY_" not in f]
+                 if f.endswith(".tif") and not raster_io.is_artefact_file(f)]
     else:
-        raise ValueError("Bitte base_dir oder single_file angeben!")
+        raise ValueError("Bitte base_dir, single_file oder files angeben!")
 
     print(f"\n📊 Starte Artefaktlauf ({len(files)} Raster)")
-    for i, path in enumerate(files, 1):
+    writer = io_pipeline.start_writer(write_queue)
+    read_stats = {}
+    pipeline = io_pipeline.prefetch(files, raster_io.read_raster, depth=prefetch, stats=read_stats)
+    for i, (path, (arr, prof)) in enumerate(pipeline, 1):
         t0 = time.time()
         base = os.path.basename(path)
         prefix = base.split("_")[0]
         month = "_".join(base.replace(".tif", "").split("_")[-2:])
 
         print(f"\n🧮 [{i}/{len(files)}] {base}")
-        with rasterio.open(path) as src:
-            arr = src.read(1).astype("float32")
-            prof = src.profile
-            arr[arr == src.nodata] = np.nan
+
+        out_dir = base_dir or os.path.dirname(path)
+        artefacts = {}
 
         if compute_std:
             print("  ▶️ Berechne STD ...")
-            std_map = local_std(arr, size=std_size)
-            out_std = os.path.join(base_dir or os.path.dirname(path), f"{prefix}_STD_{month}.tif")
-            save_raster(out_std, prof, std_map)
-            print(f"     ✅ STD gespeichert: {os.path.basename(out_std)}")
+            artefacts["STD"] = local_std(arr, size=std_size, strip_rows=strip_rows)
 
         if compute_moran or compute_geary:
             print("  ▶️ Berechne Moran & Geary ...")
             try:
-                moran_map, geary_map = compute_moran_geary(arr, downsample=downsample)
+                moran_map, geary_map = compute_moran_geary(arr, downsample=downsample, coarse=coarse_grid)
                 if compute_moran:
-                    out_moran = os.path.join(base_dir or os.path.dirname(path), f"{prefix}_MORAN_{month}.tif")
-                    save_raster(out_moran, prof, moran_map)
-                    print(f"     ✅ MORAN gespeichert: {os.path.basename(out_moran)}")
+                    artefacts["MORAN"] = moran_map
                 if compute_geary:
-                    out_geary = os.path.join(base_dir or os.path.dirname(path), f"{prefix}_GEARY_{month}.tif")
-                    save_raster(out_geary, prof, geary_map)
-                    print(f"     ✅ GEARY gespeichert: {os.path.basename(out_geary)}")
+                    artefacts["GEARY"] = geary_map
             except Exception as e:
                 print(f"     ⚠️ Fehler bei Moran/Geary: {e}")
 
+        if compute_lisa:
+            opts = dict(lisa_options or {})
+            print(f"  ▶️ Berechne LISA-Signifikanz ({opts.get('mode', 'permutation')}) ...")
+            res = lisa.lisa_rasters(arr, downsample=downsample, coarse=coarse_grid, **opts)
+            artefacts["MORANP"], artefacts["LISA"] = res["MORANP"], res["LISA"]
+            if compute_moran:
+                artefacts.setdefault("MORAN", res["MORAN"])
+
+        # Einzeldateien oder Mehrband-Stack (outputs.raster.layout); ein
+        # vorhandener Stack wird um die neu berechneten Bänder ergänzt.
+        if artefacts:
+            io_pipeline.submit_write(writer, _write_artefacts, out_dir, prefix, month, prof, artefacts, arr, downsample)
+
         print(f"     ⏱️ Dauer: {time.time() - t0:.1f}s")
 
+    io_pipeline.finish_writer(writer)
+    io_pipeline.report(read_stats, writer)
+
     print("\n🏁 Lauf abgeschlossen.")
\ No newline at end of file
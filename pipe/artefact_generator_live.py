@@ -2,30 +2,42 @@
 # NDVI/NDWI Artefaktberechnung mit Live-Status während STD
 # Kompatibel mit Colab (2025-10)
 
-import os, sys, time, datetime, shutil, psutil
+import os, sys, time, datetime, psutil
 import numpy as np
 import rasterio
-from scipy.ndimage import generic_filter
-from libpysal.weights import lat2W
-from esda import Moran_Local
 from tqdm import tqdm
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from config.config import cfg
+from pipe import raster_io, checkpoint, io_pipeline, lisa, artefact_generator, artefact_generator_fast
+from rasterio.windows import Window
 
 
-def local_std_blockwise(arr, size=11, block_size=512, progress_cb=None):
-    """Berechnet lokale STD blockweise und ruft progress_cb nach jedem Block."""
+def local_std_blockwise(arr, size=11, block_size=512, progress_cb=None, ckpt=None):
+    """
+    Berechnet lokale STD blockweise (mit Halo, NaN → Szenenmittel wie
+    artefact_generator_fast.local_std) und ruft progress_cb nach jedem Block.
+    Mit ckpt (checkpoint.open_checkpoint) werden erledigte Blöcke aus dem
+    Teilraster übernommen und neue Blöcke dort + im Journal vermerkt.
+    """
     result = np.zeros_like(arr, dtype=np.float32)
     ny, nx = arr.shape
     total_blocks = (ny // block_size + 1) * (nx // block_size + 1)
     done_blocks = 0
+    fill = artefact_generator_fast.std_fill(arr)
 
+    tile_id = 0
     for y in range(0, ny, block_size):
         for x in range(0, nx, block_size):
-            block = arr[y:y+block_size, x:x+block_size]
-            result[y:y+block_size, x:x+block_size] = generic_filter(
-                block, np.nanstd, size=size, mode="nearest"
-            )
+            window = Window(x, y, min(block_size, nx - x), min(block_size, ny - y))
+            if ckpt is not None and tile_id in ckpt["done"]:
+                result[y:y+block_size, x:x+block_size] = checkpoint.read_tile(ckpt, window)
+            else:
+                result[y:y+block_size, x:x+block_size] = artefact_generator_fast.std_window(
+                    arr, y, min(y + block_size, ny), x, min(x + block_size, nx), size, fill
+                )
+                if ckpt is not None:
+                    checkpoint.record_tile(ckpt, tile_id, window, result[y:y+block_size, x:x+block_size])
+            tile_id += 1
             done_blocks += 1
             if progress_cb:
                 progress_cb(done_blocks, total_blocks)
@@ -33,40 +45,77 @@ def local_std_blockwise(arr, size=11, block_size=512, progress_cb=None):
 
 
 def save_raster(out_path, profile, data):
-    """Schreibt TIFF robust (lokal + Copy auf Drive)."""
-    meta = profile.copy()
-    meta.update(dtype="float32", count=1, compress="lzw", BIGTIFF="IF_NEEDED")
-    tmp = "/content/tmp_" + os.path.basename(out_path)
-    with rasterio.open(tmp, "w", **meta) as dst:
-        dst.write(data.astype("float32"), 1)
-    shutil.move(tmp, out_path)
-
-
-def generate_environmental_artefacts_live(block_size=512, std_size=11, downsample=5):
-    """Berechnet STD + Moran (Geary optional) mit Live-Status."""
-    dirs = cfg["data"]["raster_dirs"]
-
-    for index, index_dir in dirs.items():
-        full_path = os.path.join(cfg["data"]["base_dir"], index_dir)
-        os.makedirs(full_path, exist_ok=True)
-
-        raster_files = sorted([
-            os.path.join(full_path, f)
-            for f in os.listdir(full_path)
-            if f.endswith(".tif") and index in f and "_STD_" not in f
-        ])
-        print(f"\n📂 {index}: {len(raster_files)} Raster gefunden")
-
+    """Schreibt TIFF robust (lokal in paths.temp_dir + Move auf Drive)."""
+    raster_io.save_raster(out_path, profile, data, tmp_dir=cfg["paths"]["temp_dir"])
+
+
+def _commit_outputs(full_path, index, month, prof, artefacts, arr, ckpt, t0, downsample):
+    """Write-behind-Auftrag: Artefakte speichern, danach Checkpoint aufräumen."""
+    out_paths = raster_io.save_artefacts(
+        full_path, index, month, prof, artefacts, base=arr, tmp_dir=cfg["paths"]["temp_dir"],
+        downsample=downsample,
+    )
+    print(f"  💾 Gespeichert: {', '.join(os.path.basename(p) for p in out_paths)} ({time.time()-t0:.1f}s gesamt)")
+    if ckpt is not None:
+        checkpoint.clear_checkpoint(ckpt)
+
+
+def _raster_jobs(files=None):
+    """
+    (index, Ordner, Basisraster) je Index- bzw. Kachelordner (wie
+    artefact_generator.base_raster_jobs) oder, mit files, aus einer Dateiliste
+    (Index = Präfix des Dateinamens).
+    """
+    if files:
+        groups = {}
+        for path in sorted(files):
+            index = os.path.basename(path).split("_")[0]
+            groups.setdefault((index, os.path.dirname(path)), []).append(path)
+        return [(index, folder, paths) for (index, folder), paths in groups.items()]
+
+    return artefact_generator.base_raster_jobs()
+
+
+def generate_environmental_artefacts_live(
+    block_size=512, std_size=11, downsample=5, resume=True, files=None, coarse_grid=None, prefetch=None, write_queue=None,
+):
+    """
+    Berechnet STD + Moran (Geary optional) mit Live-Status.
+
+    Mit resume=True werden vollständige Raster übersprungen und die STD-Blöcke
+    kachelweise gecheckpointet (Teilraster + Journal neben der Ausgabe), sodass
+    ein erneuter Aufruf nach einem Abbruch beim ersten offenen Block weitermacht.
+
+    Das nächste Raster wird im Hintergrund vorgeladen, fertige Ausgaben werden
+    über eine begrenzte Write-behind-Warteschlange geschrieben (artefacts.io_pipeline).
+    Mit artefacts.coarse_grid wird Moran in Downsample-Auflösung gespeichert.
+    files (Liste, optional) ersetzt die Ordnersuche (Index- bzw. Kachelordner);
+    coarse_grid/prefetch/write_queue überschreiben die Konfiguration (None → cfg).
+    """
+    io_opts = cfg.get("artefacts", {}).get("io_pipeline", {})
+    writer = io_pipeline.start_writer(io_opts.get("write_queue", 1) if write_queue is None else write_queue)
+    read_stats = {}
+    coarse = cfg.get("artefacts", {}).get("coarse_grid", False) if coarse_grid is None else coarse_grid
+
+    for index, full_path, raster_files in _raster_jobs(files):
+        print(f"\n📂 {index} ({full_path}): {len(raster_files)} Raster gefunden")
+
+        todo = []
         for i, path in enumerate(raster_files, 1):
             base = os.path.basename(path)
             month = base.split("_")[-2] + "_" + base.split("_")[-1].split(".")[0]
+            if resume and raster_io.artefacts_exist(full_path, index, month, ["STD", "MORAN"]):
+                print(f"⏭️ [{i}/{len(raster_files)}] {index}_{month} bereits vollständig")
+                continue
+            todo.append((i, path, month))
+
+        # Read-ahead: nächstes Raster wird dekodiert, während das aktuelle rechnet
+        pipeline = io_pipeline.prefetch(
+            todo, lambda job: raster_io.read_raster(job[1]), depth=io_opts.get("prefetch", 1) if prefetch is None else prefetch, stats=read_stats
+        )
+        for (i, path, month), (arr, prof) in pipeline:
             print(f"\n🧮 [{i}/{len(raster_files)}] {index}_{month} @ {datetime.datetime.now().strftime('%H:%M:%S')}")
 
-            with rasterio.open(path) as src:
-                arr = src.read(1).astype("float32")
-                prof = src.profile
-                arr[arr == src.nodata] = np.nan
-
             # --- STD mit Live-Monitor ---
             t0 = time.time()
             print("  ▶️ Berechne lokale STD (mit Live-Status) ...")
@@ -77,25 +126,29 @@ def generate_environmental_artefacts_live(block_size=512, std_size=11, downsampl
                     print(f"     🧮 Block {done}/{total} ({pct:.1f}%) – RAM {ram:.1f}%")
                     sys.stdout.flush()
 
-            std_map = local_std_blockwise(arr, size=std_size, block_size=block_size, progress_cb=progress)
+            ckpt = None
+            if resume:
+                ny, nx = arr.shape
+                n_tiles = len(range(0, ny, block_size)) * len(range(0, nx, block_size))
+                ckpt = checkpoint.open_checkpoint(
+                    os.path.join(full_path, f"{index}_STD_{month}.tif"), prof, n_tiles,
+                    checkpoint.source_signature(path, block_size=block_size, std_size=std_size),
+                )
+            std_map = local_std_blockwise(arr, size=std_size, block_size=block_size, progress_cb=progress, ckpt=ckpt)
             print(f"  ✅ STD fertig in {time.time()-t0:.1f}s")
 
-            out_std = os.path.join(full_path, f"{index}_STD_{month}.tif")
-            save_raster(out_std, prof, std_map)
-            print(f"  💾 Gespeichert: {os.path.basename(out_std)}")
-
             # --- Moran (reduziert) ---
             print("  ▶️ Berechne lokalen Moran ...")
-            sub = arr[::downsample, ::downsample]
-            sub[np.isnan(sub)] = 0
-            w = lat2W(*sub.shape)
-            w.transform = "r"
-            moran = Moran_Local(sub.ravel(), w)
-            moran_map = np.repeat(np.repeat(moran.Is.reshape(sub.shape), downsample, 0), downsample, 1)
-            moran_map = moran_map[:arr.shape[0], :arr.shape[1]]
-
-            out_moran = os.path.join(full_path, f"{index}_MORAN_{month}.tif")
-            save_raster(out_moran, prof, moran_map)
-            print(f"  ✅ MORAN gespeichert ({time.time()-t0:.1f}s gesamt)")
+            moran_map = lisa.local_moran(lisa.downsample_grid(arr, downsample))[0]  # arr bleibt unverändert
+            if not coarse:
+                moran_map = lisa.upsample(moran_map, downsample, arr.shape)
+
+            # Einzeldateien oder Mehrband-Stack (outputs.raster.layout) – im Hintergrund
+            io_pipeline.submit_write(
+                writer, _commit_outputs, full_path, index, month, prof,
+                {"STD": std_map, "MORAN": moran_map.astype("float32", copy=False)}, arr, ckpt, t0, downsample,
+            )
 
+    io_pipeline.finish_writer(writer)
+    io_pipeline.report(read_stats, writer)
     print("\n🏁 Lauf abgeschlossen – alle Artefakte erzeugt.")
\ No newline at end of file
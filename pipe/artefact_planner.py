@@ -0,0 +1,279 @@
+# ============================================================
+# 🧭 artefact_planner.py
+# Version: 2025-10 | Ein Einstieg für die Artefaktberechnung: Plan nach RAM, Kernen & Rastergröße
+# ============================================================
+
+import os
+import sys
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import psutil
+import rasterio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pipe import raster_io, region_tiles, artefact_generator_fast
+
+BACKENDS = ("fast", "live")  # artefact_generator (ganze Szene in generic_filter) nur direkt aufrufbar
+TILE_SIZES = (2048, 1024, 512, 256)
+_MB = 1024 ** 2
+_BASELINE_MB = 180       # Interpreter + numpy/scipy/rasterio je Prozess (gemessen ~150–200 MB)
+_GRID_TEMPS = 8          # float64-Gitter in local_moran/local_geary (sub, z, lag, card, Is, …)
+_STRIP_TEMPS = 3         # Streifen, gefüllte Kopie, generic_filter-Ergebnis
+_MAX_DOWNSAMPLE_STEPS = 2  # Downsample höchstens ×4 gegenüber der Konfiguration
+
+
+# ------------------------------------------------------------
+# Bestandsaufnahme
+# ------------------------------------------------------------
+
+def planner_options(cfg):
+    """artefacts.planner mit Defaults; override-Werte ≠ null ersetzen die Planung."""
+    opts = {"memory_target_mb": None, "memory_fraction": 0.7, "override": {}}
+    opts.update(cfg.get("artefacts", {}).get("planner", {}) or {})
+    opts["override"] = {k: v for k, v in (opts.get("override") or {}).items() if v is not None}
+    return opts
+
+
+def system_resources():
+    """Verfügbarer/gesamter RAM (MB) und logische Kerne laut psutil."""
+    mem = psutil.virtual_memory()
+    return {
+        "available_mb": mem.available / _MB,
+        "total_mb": mem.total / _MB,
+        "cores": psutil.cpu_count(logical=True) or 1,
+    }
+
+
+def inspect_rasters(files):
+    """Nur Dateiköpfe: größte Szene (Pixel, Form) und Quell-dtype über alle Raster."""
+    info = {"count": len(files), "max_pixels": 0, "max_shape": (0, 0), "dtype": None}
+    for path in files:
+        with rasterio.open(path) as src:
+            if src.height * src.width > info["max_pixels"]:
+                info.update(max_pixels=src.height * src.width, max_shape=(src.height, src.width),
+                            dtype=src.dtypes[0])
+    return info
+
+
+def list_base_rasters(cfg, indices=("NDVI", "NDWI"), tiles=None):
+    """Alle Basisraster (ohne Artefakte/Stacks) der Indexordner, bei Kachelung je Kachelordner."""
+    files = []
+    for index in indices:
+        index_dir = cfg["paths"][f"{index.lower()}_dir"]
+        for tile, folder in region_tiles.list_tile_dirs(cfg, index_dir).items():
+            if (tiles is None or tile in tiles) and os.path.isdir(folder):
+                files += sorted(
+                    os.path.join(folder, f) for f in os.listdir(folder)
+                    if f.startswith(f"{index}_") and f.endswith(".tif") and not raster_io.is_artefact_file(f)
+                )
+    return files
+
+
+# ------------------------------------------------------------
+# Speichermodell
+# ------------------------------------------------------------
+
+def estimate_mb(plan, shape, lisa_opts=None):
+    """
+    Geschätzter Spitzen-RSS eines Prozesses (MB) für eine Szene der Form shape:
+    Szene + Ergebnisse (in Rechnung, beim Writer, write_queue wartend) +
+    vorgeladene Szenen (prefetch) + Zwischenspeicher des Backends.
+    """
+    h, w = shape
+    scene = 4 * h * w / _MB                                    # float32 mit NaN
+    ds = plan["downsample"]
+    cells = math.ceil(h / ds) * math.ceil(w / ds)
+    grid = 8 * cells / _MB                                     # float64-Gitter
+    coarse_map = 4 * cells / _MB
+    halo = plan["std_size"] // 2
+
+    if plan["backend"] == "live":
+        maps = ["MORAN"]                                       # live rechnet kein Geary
+        temp = _STRIP_TEMPS * 4 * plan["tile_size"] ** 2 / _MB
+    else:
+        maps = ["MORAN", "GEARY"]
+        temp = _STRIP_TEMPS * 4 * (plan["tile_size"] + 2 * halo) * w / _MB
+
+    if lisa_opts is not None:
+        maps += ["MORANP", "LISA"]
+        temp = max(temp, lisa_opts.get("max_memory_mb", 512) + 4 * grid)
+    results = scene + sum(coarse_map if plan["coarse_grid"] else scene for _ in maps)  # STD + Karten
+    temp = max(temp, _GRID_TEMPS * grid)
+
+    prefetched = (plan["prefetch"] + 1) * scene if plan["prefetch"] > 0 else 0.0  # Warteschlange + Leser
+    sets = 2 + plan["write_queue"]                             # in Rechnung + in Arbeit beim Writer + wartend
+    return _BASELINE_MB + sets * (scene + results) + prefetched + temp + scene  # + Kopie beim Schreiben
+
+
+def _fit_workers(plan, target_mb, n_files, cores):
+    """Prozesse = min(Kerne, Raster, Speicherziel / Schätzung je Prozess), mindestens 1."""
+    return max(1, min(cores, max(n_files, 1), int(target_mb // plan["estimate_mb"])))
+
+
+def _pick_tile(plan, shape, budget_mb, lisa_opts=None):
+    """
+    Größte Kachel/Streifenhöhe, mit der die Schätzung eines Prozesses ins Budget
+    passt (sonst die kleinste). Die Kachel begrenzt nur den STD-Zwischenspeicher –
+    Szene und Ergebnisse werden von allen Backends ganz gehalten.
+    """
+    for tile in TILE_SIZES:
+        if estimate_mb(dict(plan, tile_size=tile), shape, lisa_opts) <= budget_mb:
+            return tile
+    return TILE_SIZES[-1]
+
+
+# ------------------------------------------------------------
+# Planung
+# ------------------------------------------------------------
+
+def make_plan(cfg, files):
+    """
+    Wählt Backend, Kachelgröße, Prozesse, Downsample und coarse_grid so, dass die
+    Schätzung unter dem Speicherziel (memory_target_mb bzw. memory_fraction ×
+    verfügbarer RAM) bleibt und möglichst viele Szenen parallel laufen.
+    Abstufung bei Knappheit: kleinere Kachel → ohne Read-ahead, write_queue 1
+    (nur Durchsatz) → coarse_grid → Downsample ×2/×4 → live (ohne Geary); jede
+    Stufe wird ausgegeben. Passt auch die letzte Stufe nicht, bricht der Plan ab
+    (RuntimeError), statt mit reduzierter Qualität dennoch zu überlaufen.
+    artefacts.planner.override setzt einzelne Werte fest und wird ohne Abstufung
+    übernommen (nur mit Warnung, falls die Schätzung das Ziel übersteigt).
+    """
+    opts = planner_options(cfg)
+    art = cfg.get("artefacts", {})
+    io_opts = art.get("io_pipeline", {}) or {}
+    lisa_opts = dict(art.get("lisa", {}) or {})
+    with_lisa = lisa_opts.pop("enabled", False)
+    res = system_resources()
+    info = inspect_rasters(files)
+    target = float(opts["memory_target_mb"] or opts["memory_fraction"] * res["available_mb"])
+    shape = info["max_shape"]
+
+    base = {
+        "backend": "fast",
+        "downsample": int(art.get("subsample_step", 5)),
+        "coarse_grid": bool(art.get("coarse_grid", False)),
+        "std_size": int(art.get("std_kernel_size", 11)),
+        "prefetch": int(io_opts.get("prefetch", 1)),
+        "write_queue": int(io_opts.get("write_queue", 1)),
+        "tile_size": 512,
+    }
+    steps = [
+        {},
+        {"prefetch": 0, "write_queue": 1},
+        {"coarse_grid": True},
+        *({"downsample": base["downsample"] * 2 ** k} for k in range(1, _MAX_DOWNSAMPLE_STEPS + 1)),
+        {"backend": "live"},
+    ]
+
+    lisa_arg = lisa_opts if with_lisa else None
+    override = opts["override"]
+    if override.get("backend") not in (None, *BACKENDS):
+        raise ValueError(f"❌ Unbekanntes Backend {override['backend']!r} – erlaubt: {BACKENDS}")
+
+    plan, notes = dict(base), []
+    if override:
+        plan.update(override)
+        if "tile_size" not in override:
+            plan["tile_size"] = _pick_tile(plan, shape, target, lisa_arg)
+        plan["estimate_mb"] = estimate_mb(plan, shape, lisa_arg)
+    else:
+        for step in steps:
+            plan.update(step)
+            plan["tile_size"] = _pick_tile(plan, shape, target, lisa_arg)
+            plan["estimate_mb"] = estimate_mb(plan, shape, lisa_arg)
+            if step:
+                notes.append(", ".join(f"{k}={v}" for k, v in step.items()))
+            if plan["estimate_mb"] <= target:
+                break
+        if plan["estimate_mb"] > target:
+            base_mb = estimate_mb(dict(base, tile_size=TILE_SIZES[-1]), shape, lisa_arg)
+            raise RuntimeError(
+                f"❌ Kein Plan unter {target:.0f} MB (größtes Raster {shape[0]}×{shape[1]} px: "
+                f"{base_mb:.0f} MB wie konfiguriert, {plan['estimate_mb']:.0f} MB maximal reduziert). "
+                "artefacts.planner.memory_target_mb/override setzen oder "
+                "artefact_sparse.compute_sparse_artefacts für Punktwerte nutzen."
+            )
+    plan["workers"] = int(override.get("workers") or _fit_workers(plan, target, info["count"], res["cores"]))
+
+    plan.update({
+        "target_mb": target, "fits": plan["estimate_mb"] * plan["workers"] <= target,
+        "notes": notes, "overridden": sorted(override), "lisa": lisa_opts if with_lisa else None,
+        "resources": res, "rasters": info,
+    })
+    return plan
+
+
+def print_plan(plan):
+    """Gibt den gewählten Plan mit Begründung aus."""
+    res, info = plan["resources"], plan["rasters"]
+    h, w = info["max_shape"]
+    print("🧭 Artefakt-Plan")
+    print(f"   💻 RAM verfügbar {res['available_mb']:.0f}/{res['total_mb']:.0f} MB, {res['cores']} Kerne "
+          f"→ Ziel {plan['target_mb']:.0f} MB")
+    print(f"   🗺️ {info['count']} Raster, größtes {h}×{w} px ({info['dtype']})")
+    print(f"   ⚙️ Backend {plan['backend']}, Kachel {plan['tile_size']}, Prozesse {plan['workers']}, "
+          f"Downsample {plan['downsample']}, coarse_grid {plan['coarse_grid']}, "
+          f"prefetch {plan['prefetch']}, write_queue {plan['write_queue']}")
+    print(f"   🧠 Schätzung {plan['estimate_mb']:.0f} MB je Prozess, "
+          f"{plan['estimate_mb'] * plan['workers']:.0f} MB gesamt")
+    if plan["notes"]:
+        print(f"   ↘️ Angepasst: {' → '.join(plan['notes'])}")
+    if plan["overridden"]:
+        print(f"   ✍️ Aus Konfiguration: {', '.join(plan['overridden'])}")
+    if plan["backend"] == "live":
+        print("   ℹ️ live berechnet STD + Moran (kein Geary), dafür mit Checkpoints.")
+    if not plan["fits"]:
+        print("   ⚠️ Speicherziel wird mit den festgesetzten Werten voraussichtlich überschritten.")
+
+
+# ------------------------------------------------------------
+# Ausführung
+# ------------------------------------------------------------
+
+def _run_backend(plan, files):
+    """Führt ein Backend für eine Dateigruppe aus (auch im Arbeitsprozess)."""
+    if plan["backend"] == "fast":
+        artefact_generator_fast.generate_environmental_artefacts_fast(
+            files=files, std_size=plan["std_size"], downsample=plan["downsample"],
+            prefetch=plan["prefetch"], write_queue=plan["write_queue"], coarse_grid=plan["coarse_grid"],
+            compute_lisa=plan["lisa"] is not None, lisa_options=plan["lisa"], strip_rows=plan["tile_size"],
+        )
+    else:
+        # erst hier importiert: live lädt beim Import die globale Konfiguration
+        from pipe import artefact_generator_live
+        artefact_generator_live.generate_environmental_artefacts_live(
+            block_size=plan["tile_size"], std_size=plan["std_size"], downsample=plan["downsample"],
+            files=files, coarse_grid=plan["coarse_grid"], prefetch=plan["prefetch"],
+            write_queue=plan["write_queue"],
+        )
+
+
+def generate_artefacts(cfg, files=None, indices=("NDVI", "NDWI"), tiles=None, dry_run=False):
+    """
+    Einheitlicher Einstieg statt der Wahl zwischen artefact_generator/_fast/_live:
+    plant nach Rastergröße, RAM und Kernen, gibt den Plan aus und führt ihn aus.
+    Mehrere Prozesse teilen die Raster reihum auf (jeder mit eigener I/O-Pipeline).
+    """
+    files = files or list_base_rasters(cfg, indices, tiles)
+    if not files:
+        print("⚠️ Keine Basisraster gefunden.")
+        return None
+    plan = make_plan(cfg, files)
+    print_plan(plan)
+    if dry_run:
+        return plan
+
+    workers = min(plan["workers"], len(files))
+    if workers == 1:
+        _run_backend(plan, files)
+    else:
+        # größte Raster zuerst, reihum verteilt → ähnliche Last je Prozess
+        order = sorted(files, key=os.path.getsize, reverse=True)
+        groups = [order[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(_run_backend, plan, group) for group in groups]:
+                future.result()
+    print("\n🏁 Artefakt-Plan ausgeführt.")
+    return plan
@@ -0,0 +1,287 @@
+# ============================================================
+# 🎯 artefact_sparse.py
+# Version: 2025-10 | STD/Moran/Geary nur in Fenstern um Fund- & Hintergrundpunkte
+# ============================================================
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.windows import Window
+from tqdm import tqdm
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pipe import raster_io, region_tiles, artefact_generator_fast
+
+_ROW_BLOCK = 256  # Zeilen des Downsample-Gitters pro Lesevorgang (globale Statistik)
+
+
+# ------------------------------------------------------------
+# Hilfsfunktionen
+# ------------------------------------------------------------
+
+def _point_columns(df):
+    """Spaltennamen für Länge/Breite/Datum (Beobachtungen oder Hintergrund)."""
+    lon = "longitude" if "longitude" in df.columns else "lon"
+    lat = "latitude" if "latitude" in df.columns else "lat"
+    date = "date" if "date" in df.columns else "observed_on"
+    return lon, lat, date
+
+
+def merge_windows(boxes):
+    """
+    Vereinigt sich überlappende/berührende Fenster (r0, r1, c0, c1; halboffen)
+    zu ihren umschließenden Rechtecken, bis keine Überlappung mehr besteht.
+    Gibt (Fenster, Zuordnung Box → Fenster) zurück.
+    """
+    merged = [list(b) for b in boxes]
+    owner = list(range(len(boxes)))
+    changed = True
+    while changed:
+        changed = False
+        order = sorted(range(len(merged)), key=lambda k: merged[k][0])
+        out, remap = [], {}
+        for k in order:
+            r0, r1, c0, c1 = merged[k]
+            for j, m in enumerate(out):
+                if r0 <= m[1] and m[0] <= r1 and c0 <= m[3] and m[2] <= c1:
+                    m[0], m[1] = min(m[0], r0), max(m[1], r1)
+                    m[2], m[3] = min(m[2], c0), max(m[3], c1)
+                    remap[k] = j
+                    changed = True
+                    break
+            else:
+                remap[k] = len(out)
+                out.append([r0, r1, c0, c1])
+        owner = [remap[o] for o in owner]
+        merged = out
+    return [tuple(m) for m in merged], owner
+
+
+def downsample_stats(src, downsample):
+    """
+    Mittelwert/Standardabweichung/Anzahl des Downsample-Gitters arr[::ds, ::ds]
+    (NaN → 0 wie im Vollraster-Lauf) in einem speicherbegrenzten Durchlauf;
+    im selben Durchlauf das Szenenmittel aller gültigen Pixel (STD-Füllwert,
+    artefact_generator_fast.std_fill). Gibt (mean, std, n, fill) zurück.
+    """
+    total, total_sq, n = 0.0, 0.0, 0
+    valid_sum, valid_n = 0.0, 0
+    rows_per_read = _ROW_BLOCK * downsample
+    for y in range(0, src.height, rows_per_read):
+        h = min(rows_per_read, src.height - y)
+        full = raster_io.read_band(src, window=Window(0, y, src.width, h))
+        valid_sum += np.nansum(full, dtype=np.float64)
+        valid_n += int(np.count_nonzero(~np.isnan(full)))
+        block = np.nan_to_num(full[::downsample, ::downsample].astype("float64"), nan=0.0)
+        total += block.sum()
+        total_sq += (block * block).sum()
+        n += block.size
+    mean = total / n
+    std = np.sqrt(max(total_sq / n - mean * mean, 0.0))
+    fill = valid_sum / valid_n if valid_n else np.nan
+    return mean, std, n, fill
+
+
+def _lisa_cells(block, r0, c0, downsample, grid_shape, mean, std, n):
+    """
+    Lokaler Moran (esda Moran_Local.Is) und lokaler Geary (esda Geary_Local.localG)
+    für die Downsample-Zellen eines Fensters – Rook-Nachbarschaft (lat2W),
+    zeilenstandardisiert, globale z-Standardisierung des Gesamtgitters.
+    Zellen, deren Nachbarn außerhalb des Fensters liegen, werden NaN.
+    """
+    oy, ox = (-r0) % downsample, (-c0) % downsample
+    sub = np.nan_to_num(block[oy::downsample, ox::downsample].astype("float64"), nan=0.0)
+    i0, j0 = (r0 + oy) // downsample, (c0 + ox) // downsample
+    gh, gw = grid_shape
+    z = (sub - mean) / std if std > 0 else np.zeros_like(sub)
+
+    lag = np.zeros_like(z)
+    diff2 = np.zeros_like(z)
+    count = np.zeros_like(z)
+    complete = np.ones(z.shape, dtype=bool)
+    ii = np.arange(i0, i0 + z.shape[0])[:, None]
+    jj = np.arange(j0, j0 + z.shape[1])[None, :]
+
+    for dy, dx in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        nb = np.full_like(z, np.nan)
+        ys, yd = slice(max(dy, 0), z.shape[0] + min(dy, 0)), slice(max(-dy, 0), z.shape[0] + min(-dy, 0))
+        xs, xd = slice(max(dx, 0), z.shape[1] + min(dx, 0)), slice(max(-dx, 0), z.shape[1] + min(-dx, 0))
+        nb[yd, xd] = z[ys, xs]
+        exists = (ii + dy >= 0) & (ii + dy < gh) & (jj + dx >= 0) & (jj + dx < gw)
+        missing = exists & np.isnan(nb)
+        complete &= ~missing
+        use = exists & ~np.isnan(nb)
+        lag += np.where(use, nb, 0.0)
+        diff2 += np.where(use, (z - np.where(use, nb, 0.0)) ** 2, 0.0)
+        count += use
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lag /= count
+        diff2 /= count
+    moran = (n - 1) * z * lag / n
+    geary = diff2
+    moran[~complete] = np.nan
+    geary[~complete] = np.nan
+    return moran, geary, i0, j0
+
+
+def _cells_to_pixels(cells, i0, j0, rows, cols, downsample):
+    """Zellwerte auf Vollauflösung abbilden (entspricht np.repeat im Vollraster-Lauf)."""
+    ci = rows // downsample - i0
+    cj = cols // downsample - j0
+    ok = (ci >= 0) & (ci < cells.shape[0]) & (cj >= 0) & (cj < cells.shape[1])
+    out = np.full(rows.shape, np.nan, dtype="float32")
+    out[ok] = cells[ci[ok], cj[ok]]
+    return out
+
+
+def compute_window_artefacts(src, window, downsample, std_size, grid_stats):
+    """
+    Liest ein Fenster (inkl. Halo) und berechnet STD sowie Moran/Geary-Zellen.
+    grid_stats aus downsample_stats; STD mit NaN → Szenenmittel wie die Generatoren.
+    """
+    r0, r1, c0, c1 = window
+    mean, std_grid, n, fill = grid_stats
+    block = raster_io.read_band(src, window=Window(c0, r0, c1 - c0, r1 - r0))
+    # mode="nearest" wirkt nur an echten Rasterrändern – innen liefert der Halo die Nachbarn
+    std = artefact_generator_fast.std_window(block, 0, block.shape[0], 0, block.shape[1], std_size, fill)
+    grid_shape = (-(-src.height // downsample), -(-src.width // downsample))
+    moran, geary, i0, j0 = _lisa_cells(block, r0, c0, downsample, grid_shape, mean, std_grid, n)
+    return std, moran, geary, i0, j0
+
+
+# ------------------------------------------------------------
+# Hauptfunktion
+# ------------------------------------------------------------
+
+def compute_sparse_artefacts(
+    cfg,
+    points=None,
+    indices=("NDVI", "NDWI"),
+    std_size=None,
+    downsample=None,
+    core_radius=None,
+    output="table",
+):
+    """
+    Berechnet STD, Moran und Geary nur in Fenstern um die Punkte statt
+    flächendeckend. Jedes Fenster erhält einen Halo (STD-Kernel bzw. zwei
+    Downsample-Zellen), überlappende Fenster werden zusammengelegt. Die Werte
+    sind identisch zum Vollraster-Lauf der Generatoren (STD: NaN → Szenenmittel,
+    generic_filter/nanstd mit mode="nearest"; Moran_Local.Is, Geary_Local.localG
+    auf arr[::downsample, ::downsample]).
+
+    Args:
+        cfg (dict): Konfiguration.
+        points (DataFrame): Punkte mit latitude/longitude (oder lat/lon) und
+            date/observed_on (None → inaturalist_combined.csv).
+        indices (tuple): Zu verarbeitende Indizes.
+        std_size (int): Kernelgröße STD (None → artefacts.std_kernel_size).
+        downsample (int): Moran/Geary-Reduktion (None → artefacts.subsample_step).
+        core_radius (int): Pixelradius um jeden Punkt, der ausgegeben wird.
+        output (str): "table" → Wertetabelle je Punkt,
+            "raster" → maskierte Raster (NaN außerhalb der Fenster, Suffix _sparse).
+
+    Returns:
+        DataFrame mit {index}_STD/_MORAN/_GEARY je Punkt.
+    """
+    opts = cfg.get("artefacts", {})
+    std_size = std_size or opts.get("std_kernel_size", 11)
+    downsample = downsample or opts.get("subsample_step", 5)
+    core_radius = core_radius if core_radius is not None else opts.get("sparse", {}).get("core_radius_px", 0)
+    halo = max(std_size // 2, 2 * downsample)
+
+    out_dir = cfg["paths"]["output_dir"]
+    if points is None:
+        points = pd.read_csv(os.path.join(out_dir, "inaturalist_combined.csv"))
+    points = points.reset_index(drop=True)
+    lon_col, lat_col, date_col = _point_columns(points)
+    dates = pd.to_datetime(points[date_col], errors="coerce")
+
+    point_tiles = region_tiles.tiles_for_points(cfg, points[lon_col].values, points[lat_col].values)
+
+    result = points.copy()
+    for index in indices:
+        index_dir = cfg["paths"][f"{index.lower()}_dir"]
+        # Je Kachel (ohne Kachelung: nur der Indexordner) die Basisraster
+        base_files = sorted(
+            (tile, folder, f)
+            for tile, folder in region_tiles.list_tile_dirs(cfg, index_dir).items()
+            for f in os.listdir(folder)
+            if f.endswith(".tif") and f.startswith(index) and not raster_io.is_artefact_file(f)
+        )
+        for metric in ("STD", "MORAN", "GEARY"):
+            result[f"{index}_{metric}"] = np.nan
+
+        print(f"\n🎯 {index}: {len(base_files)} Raster, {len(points)} Punkte")
+        for tile, folder, fname in tqdm(base_files, desc=f"{index}-Sparse"):
+            t0 = time.time()
+            year, month = (int(x) for x in fname[:-4].split("_")[-2:])
+            in_month = (dates.dt.year == year) & (dates.dt.month == month)
+            sel = np.flatnonzero(in_month.values & (point_tiles == tile))
+            if len(sel) == 0:
+                continue
+
+            with rasterio.open(os.path.join(folder, fname)) as src:
+                rows, cols = rasterio.transform.rowcol(
+                    src.transform, points[lon_col].values[sel], points[lat_col].values[sel]
+                )
+                rows, cols = np.asarray(rows), np.asarray(cols)
+                inside = (rows >= 0) & (rows < src.height) & (cols >= 0) & (cols < src.width)
+                sel, rows, cols = sel[inside], rows[inside], cols[inside]
+                if len(sel) == 0:
+                    continue
+
+                reach = core_radius + halo
+                boxes = [
+                    (max(r - reach, 0), min(r + reach + 1, src.height),
+                     max(c - reach, 0), min(c + reach + 1, src.width))
+                    for r, c in zip(rows, cols)
+                ]
+                windows, owner = merge_windows(boxes)
+                grid_stats = downsample_stats(src, downsample)
+                prof = src.profile
+
+                if output == "raster":
+                    masked = {m: np.full((src.height, src.width), np.nan, dtype="float32")
+                              for m in ("STD", "MORAN", "GEARY")}
+
+                owner = np.asarray(owner)
+                for w_id, window in enumerate(windows):
+                    std, moran, geary, i0, j0 = compute_window_artefacts(
+                        src, window, downsample, std_size, grid_stats
+                    )
+                    r0, _, c0, _ = window
+                    members = np.flatnonzero(owner == w_id)
+                    pr, pc = rows[members], cols[members]
+                    result.loc[sel[members], f"{index}_STD"] = std[pr - r0, pc - c0]
+                    result.loc[sel[members], f"{index}_MORAN"] = _cells_to_pixels(moran, i0, j0, pr, pc, downsample)
+                    result.loc[sel[members], f"{index}_GEARY"] = _cells_to_pixels(geary, i0, j0, pr, pc, downsample)
+
+                    if output == "raster":
+                        for r, c in zip(pr, pc):
+                            ys = np.arange(max(r - core_radius, 0), min(r + core_radius + 1, src.height))
+                            xs = np.arange(max(c - core_radius, 0), min(c + core_radius + 1, src.width))
+                            gy, gx = np.meshgrid(ys, xs, indexing="ij")
+                            masked["STD"][gy, gx] = std[gy - r0, gx - c0]
+                            masked["MORAN"][gy, gx] = _cells_to_pixels(moran, i0, j0, gy, gx, downsample)
+                            masked["GEARY"][gy, gx] = _cells_to_pixels(geary, i0, j0, gy, gx, downsample)
+
+            if output == "raster":
+                month_token = f"{year}_{month:02d}"
+                raster_io.save_artefacts(folder, index, month_token, prof, masked, suffix="_sparse")
+                del masked
+
+            print(f"   ✅ {fname}: {len(sel)} Punkte, {len(windows)} Fenster ({time.time() - t0:.1f}s)")
+
+    if output == "table":
+        os.makedirs(out_dir, exist_ok=True)
+        out_path = os.path.join(out_dir, "inat_points_artefacts_sparse.csv")
+        result.to_csv(out_path, index=False)
+        print(f"\n✅ Sparse-Artefakte gespeichert: {out_path}")
+    return result
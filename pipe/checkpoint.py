@@ -0,0 +1,104 @@
+# ============================================================
+# 🧷 checkpoint.py
+# Version: 2025-10 | Kachel-Checkpoints für lange Rasterläufe (Colab-Abbrüche)
+# ============================================================
+
+import os
+import json
+
+import rasterio
+
+
+# ------------------------------------------------------------
+# Hilfsfunktionen
+# ------------------------------------------------------------
+
+def checkpoint_paths(out_path):
+    """Teilraster + Journal neben der Zieldatei (versteckt, von der Rastersuche ignoriert)."""
+    folder, name = os.path.split(out_path)
+    stem = name[:-len(".tif")] if name.endswith(".tif") else name
+    return (os.path.join(folder, f".{stem}.partial.tif"),
+            os.path.join(folder, f".{stem}.journal.jsonl"))
+
+
+def source_signature(path, **params):
+    """Identifiziert Eingabe + Parameter – ändert sich etwas, wird der Checkpoint verworfen."""
+    stat = os.stat(path)
+    return {"source": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, **params}
+
+
+def _read_journal(journal):
+    header, done = None, set()
+    with open(journal) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break  # abgeschnittene letzte Zeile nach Abbruch
+            if header is None:
+                header = entry
+            else:
+                done.add(entry["tile"])
+    return header, done
+
+
+# ------------------------------------------------------------
+# Hauptfunktionen
+# ------------------------------------------------------------
+
+def open_checkpoint(out_path, profile, n_tiles, signature):
+    """
+    Öffnet (oder beginnt) einen Checkpoint für out_path. Passt das Journal zur
+    Signatur, werden erledigte Kacheln übernommen; sonst wird neu begonnen.
+    Gibt einen Zustand {partial, journal, done, n_tiles} zurück.
+    """
+    partial, journal = checkpoint_paths(out_path)
+    header = {"signature": signature, "n_tiles": n_tiles}
+
+    if os.path.exists(journal) and os.path.exists(partial):
+        old_header, done = _read_journal(journal)
+        if old_header == header:
+            print(f"  ⏩ Checkpoint gefunden: {len(done)}/{n_tiles} Kacheln erledigt")
+            return {"partial": partial, "journal": journal, "done": done, "n_tiles": n_tiles}
+        print("  ♻️ Checkpoint passt nicht zu Eingabe/Parametern – starte neu")
+
+    meta = profile.copy()
+    for key in ("blockxsize", "blockysize", "tiled", "interleave", "compress", "predictor"):
+        meta.pop(key, None)
+    meta.update(driver="GTiff", dtype="float32", count=1, nodata=None,
+                tiled=True, blockxsize=256, blockysize=256, BIGTIFF="IF_NEEDED")
+    with rasterio.open(partial, "w", **meta):
+        pass
+    with open(journal, "w") as f:
+        f.write(json.dumps(header) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return {"partial": partial, "journal": journal, "done": set(), "n_tiles": n_tiles}
+
+
+def record_tile(state, tile_id, window, data):
+    """Schreibt eine fertige Kachel ins Teilraster und vermerkt sie danach im Journal."""
+    with rasterio.open(state["partial"], "r+") as dst:
+        dst.write(data.astype("float32", copy=False), 1, window=window)
+    # Erst nach dem Schließen (Daten auf der Platte) ins Journal eintragen
+    with open(state["journal"], "a") as f:
+        f.write(json.dumps({"tile": tile_id}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    state["done"].add(tile_id)
+
+
+def read_tile(state, window):
+    """Liest eine bereits erledigte Kachel aus dem Teilraster."""
+    with rasterio.open(state["partial"]) as src:
+        return src.read(1, window=window)
+
+
+def clear_checkpoint(state):
+    """Nach dem atomaren Commit der Zieldatei: Teilraster + Journal entfernen."""
+    for path in (state["partial"], state["journal"]):
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,226 @@
+# ============================================================
+# 📅 climatology.py
+# Version: 2025-10 | Monatsklimatologie über export.years + Anomalie-Raster (inkrementell)
+# ============================================================
+
+import os
+import sys
+from glob import glob
+
+import numpy as np
+import rasterio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pipe import raster_io, region_tiles, io_pipeline
+
+_STATS = ("MEAN", "STD", "COUNT")
+
+
+# ------------------------------------------------------------
+# Namen & Optionen
+# ------------------------------------------------------------
+
+def climatology_options(cfg):
+    """climatology mit Defaults (enabled: false → keine Anomalie-Features)."""
+    opts = {"enabled": False, "min_years": 3, "write_anomalies": False}
+    opts.update(cfg.get("climatology", {}) or {})
+    return opts
+
+
+def climatology_path(folder, index, month):
+    """Pfad der Klimatologie eines Kalendermonats, z. B. NDVI_CLIM_07.tif."""
+    return os.path.join(folder, f"{index}_CLIM_{int(month):02d}.tif")
+
+
+def anomaly_path(folder, index, year, month):
+    """Pfad des Anomalie-Rasters eines Jahres-Monats, z. B. NDVI_ANOM_2023_07.tif."""
+    return os.path.join(folder, f"{index}_ANOM_{year}_{int(month):02d}.tif")
+
+
+def find_climatology(folder, prefix, year, month):
+    """
+    Suchfunktion für region_tiles.mosaic_index (prefix z. B. "NDVI_CLIM");
+    das Jahr wird ignoriert – die Klimatologie gilt für alle Jahre.
+    """
+    path = os.path.join(folder, f"{prefix}_{int(month):02d}.tif")
+    return path if os.path.exists(path) else None
+
+
+def find_base_raster(folder, index, year, month):
+    """Basisraster eines Jahres-Monats (ohne Artefakte/Stacks/Klimatologie) oder None."""
+    files = sorted(glob(os.path.join(folder, f"{index}_*{year}_{int(month):02d}*.tif")))
+    files = [f for f in files if not raster_io.is_artefact_file(f)]
+    return files[0] if files else None
+
+
+# ------------------------------------------------------------
+# Akkumulatoren (Welford, NaN-bewusst)
+# ------------------------------------------------------------
+
+def new_accumulator(shape):
+    """Leerer Zustand je Pixel: Anzahl, laufendes Mittel, Summe der Abweichungsquadrate (float32)."""
+    return {
+        "count": np.zeros(shape, dtype=np.uint16),
+        "mean": np.zeros(shape, dtype=np.float32),
+        "m2": np.zeros(shape, dtype=np.float32),
+        "years": [],
+    }
+
+
+def accumulate(acc, arr, year):
+    """
+    Nimmt ein Jahr auf (in place): nur gültige Pixel zählen. Der Speicher hängt
+    von der Szenengröße ab, nicht von der Zahl der Jahre.
+    """
+    valid = ~np.isnan(arr)
+    acc["count"][valid] += 1
+    x = arr[valid]
+    delta = x - acc["mean"][valid]
+    acc["mean"][valid] += delta / acc["count"][valid]
+    acc["m2"][valid] += delta * (x - acc["mean"][valid])
+    acc["years"].append(int(year))
+
+
+def finalize(acc):
+    """Zustand → {MEAN, STD (Populations-Std), COUNT}; Pixel ohne Jahr → NaN."""
+    count = acc["count"].astype(np.float32)
+    empty = count == 0
+    mean = acc["mean"].copy()
+    mean[empty] = np.nan
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt(acc["m2"] / count)
+    std[empty] = np.nan
+    return {"MEAN": mean, "STD": std, "COUNT": count}
+
+
+def anomaly(values, mean, std, count, min_years=3):
+    """
+    (Wert − Mittel, (Wert − Mittel) / Std) – z-Wert NaN bei Std 0 oder
+    weniger als min_years gültigen Jahren. Für Raster wie für Punktwerte.
+    """
+    anom = values - mean
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = anom / std
+    z[(count < min_years) | ~(std > 0)] = np.nan
+    return anom, z
+
+
+def load_climatology(path):
+    """
+    Liest eine vorhandene Klimatologie zurück in einen Akkumulator
+    (m2 = STD² · COUNT) samt Profil, damit neue Jahre nur ergänzt werden.
+    """
+    with rasterio.open(path) as src:
+        names = [d.split("_")[-1] for d in src.descriptions]
+        bands = {n: raster_io.read_band(src, i) for i, n in enumerate(names, 1)}
+        years = [int(y) for y in src.tags().get("YEARS", "").split(",") if y]
+        profile = src.profile
+    count = np.nan_to_num(bands["COUNT"]).astype(np.uint16)
+    std = np.nan_to_num(bands["STD"])
+    acc = {
+        "count": count,
+        "mean": np.nan_to_num(bands["MEAN"]),
+        "m2": (std * std * count).astype(np.float32),
+        "years": years,
+    }
+    return acc, profile
+
+
+def save_climatology(path, profile, index, acc):
+    """Schreibt MEAN/STD/COUNT als ein Raster; die enthaltenen Jahre stehen im Tag YEARS."""
+    stats = finalize(acc)
+    bands = [(f"{index}_CLIM_{name}", stats[name]) for name in _STATS]
+    tags = {"YEARS": ",".join(str(y) for y in sorted(acc["years"]))}
+    return raster_io.save_bands(path, profile, bands, tags=tags)
+
+
+# ------------------------------------------------------------
+# Stufe
+# ------------------------------------------------------------
+
+def update_climatology(folder, index, month, years):
+    """
+    Aktualisiert die Klimatologie eines Ordners (Kachel) und Kalendermonats:
+    vorhandene Jahre bleiben, nur neue Jahresraster werden gelesen (Read-ahead)
+    und eingerechnet. Gibt (Pfad, neu aufgenommene Jahre) zurück.
+    """
+    path = climatology_path(folder, index, month)
+    acc, profile = load_climatology(path) if os.path.exists(path) else (None, None)
+    done = set(acc["years"]) if acc else set()
+
+    todo = []
+    for year in years:
+        if year in done:
+            continue
+        base = find_base_raster(folder, index, year, month)
+        if base:
+            todo.append((year, base))
+    if not todo:
+        return path, []
+
+    added = []
+    for (year, base), (arr, prof) in io_pipeline.prefetch(todo, lambda job: raster_io.read_raster(job[1])):
+        if acc is None:
+            acc, profile = new_accumulator(arr.shape), prof
+        if arr.shape != acc["count"].shape:
+            print(f"     ⚠️ {os.path.basename(base)}: Gitter {arr.shape} ≠ {acc['count'].shape} – übersprungen")
+            continue
+        accumulate(acc, arr, year)
+        added.append(year)
+
+    if added:
+        save_climatology(path, profile, index, acc)
+    return path, added
+
+
+def write_anomalies(cfg, folder, index, month, years, clim_path):
+    """
+    Anomalie-Raster je Jahr: {index}_ANOM (Wert − Mittel) und {index}_ZSCORE
+    ((Wert − Mittel) / Std; NaN bei Std 0 oder weniger als min_years Jahren).
+    """
+    min_years = climatology_options(cfg)["min_years"]
+    with rasterio.open(clim_path) as src:
+        mean, std, count = (raster_io.read_band(src, i) for i in (1, 2, 3))
+    written = []
+    for year in years:
+        base = find_base_raster(folder, index, year, month)
+        if not base:
+            continue
+        arr, prof = raster_io.read_raster(base)
+        anom, z = anomaly(arr, mean, std, count, min_years)
+        out = anomaly_path(folder, index, year, month)
+        raster_io.save_bands(out, prof, [(f"{index}_ANOM", anom), (f"{index}_ZSCORE", z)])
+        written.append(out)
+    return written
+
+
+def build_climatologies(cfg, indices=("NDVI", "NDWI"), years=None, months=None, tiles=None):
+    """
+    Berechnet bzw. aktualisiert für jeden Index, jede Kachel und jeden
+    Kalendermonat die Klimatologie über export.years. Schon enthaltene Jahre
+    werden nicht erneut gelesen – kommt ein Jahr hinzu, wird nur dieses
+    eingerechnet. Mit climatology.write_anomalies werden die Anomalie-Raster
+    aller Jahre neu geschrieben, sobald sich eine Klimatologie ändert.
+    """
+    years = sorted(years or cfg["export"]["years"])
+    months = months or cfg["export"]["months"]
+    opts = climatology_options(cfg)
+
+    for index in indices:
+        index_dir = cfg["paths"][f"{index.lower()}_dir"]
+        folders = region_tiles.list_tile_dirs(cfg, index_dir)
+        if tiles is not None:
+            folders = {t: f for t, f in folders.items() if t in set(tiles)}
+        for tile, folder in folders.items():
+            for month in months:
+                path, added = update_climatology(folder, index, month, years)
+                if not os.path.exists(path):
+                    print(f"⚠️ {index} {tile} Monat {int(month):02d}: keine Jahresraster gefunden")
+                    continue
+                status = f"+{', '.join(map(str, added))}" if added else "aktuell"
+                print(f"📅 {index} {tile} Monat {int(month):02d}: {os.path.basename(path)} ({status})")
+                if opts["write_anomalies"] and added:
+                    write_anomalies(cfg, folder, index, month, years, path)
+
+    print("\n🏁 Klimatologie abgeschlossen.")
@@ -6,9 +6,24 @@ from shapely import wkt
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+import pickle
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+EDA_COLUMNS = [
+    "NDVI_at_point", "NDWI_at_point",
+    "NDVI_std_100m", "NDWI_std_100m",
+    "Moran_I_local", "Geary_C_local",
+    "NDWI_Moran_I_local", "NDWI_Geary_C_local"
+]
+HEX_PAIRS = [("NDVI_at_point", "NDWI_at_point")]
+PAIRPLOT_GROUPS = [
+    (["NDVI_at_point", "NDVI_std_100m", "Moran_I_local", "Geary_C_local"],
+     "Vegetationsstruktur und Autokorrelation"),
+    (["NDWI_at_point", "NDWI_std_100m", "NDWI_Moran_I_local", "NDWI_Geary_C_local"],
+     "Feuchtigkeitsstruktur und Autokorrelation"),
+]
+
 
 def run_eda(path):
     df = pd.read_csv(path)
@@ -17,12 +32,7 @@ def run_eda(path):
 
     print("🧩 Datensatz:", len(gdf), "Funde")
 
-    cols = [
-        "NDVI_at_point", "NDWI_at_point",
-        "NDVI_std_100m", "NDWI_std_100m",
-        "Moran_I_local", "Geary_C_local",
-        "NDWI_Moran_I_local", "NDWI_Geary_C_local"
-    ]
+    cols = EDA_COLUMNS
     num = gdf[cols].select_dtypes(np.number)
     print(num.describe())
 
@@ -59,5 +69,194 @@ def run_eda(path):
     plt.title("NDVI zum Fundzeitpunkt (monatlich)")
     plt.show()
 
+
+
+# ------------------------------------------------------------
+# Streaming-EDA für große Feature-Tabellen
+# ------------------------------------------------------------
+
+def _reservoir_update(reservoir, chunk, seen, rng):
+    """Reservoir-Sampling (Algorithmus R), vektorisiert pro Chunk."""
+    size = len(reservoir["rows"]) if reservoir["rows"] is not None else reservoir["size"]
+    values = chunk.to_numpy(dtype=np.float32)
+    t = seen + np.arange(len(values))
+    if reservoir["rows"] is None:
+        reservoir["rows"] = np.full((size, values.shape[1]), np.nan, dtype=np.float32)
+        reservoir["months"] = np.full(size, -1, dtype=np.int16)
+    fill = t < size
+    reservoir["rows"][t[fill]] = values[fill]
+    reservoir["months"][t[fill]] = chunk.index.values[fill]
+    j = rng.integers(0, t[~fill] + 1)
+    take = j < size
+    reservoir["rows"][j[take]] = values[~fill][take]
+    reservoir["months"][j[take]] = chunk.index.values[~fill][take]
+
+
+def compute_eda_aggregates(path, cols=None, chunksize=200_000, hist_bins=200, value_range=(-1.0, 1.0),
+                           month_col="observed_on", sample_size=20_000, seed=42):
+    """
+    Ein chunkweiser Durchlauf über die CSV mit begrenztem Speicher:
+    Zählungen/Mittel/Varianz/Min/Max, paarweise Korrelationsmatrix (NaN-sicher),
+    2D-Histogramme für HEX_PAIRS, monatliche Histogramme je Spalte und eine
+    Reservoir-Stichprobe für Streu-/Paarplots.
+    """
+    cols = cols or EDA_COLUMNS
+    header = pd.read_csv(path, nrows=0).columns
+    cols = [c for c in cols if c in header]
+    k = len(cols)
+    edges = np.linspace(value_range[0], value_range[1], hist_bins + 1)
+    rng = np.random.default_rng(seed)
+
+    agg = {
+        "cols": cols, "edges": edges, "n_rows": 0,
+        "min": np.full(k, np.inf), "max": np.full(k, -np.inf),
+        "n": np.zeros((k, k)), "sx": np.zeros((k, k)), "sxx": np.zeros((k, k)), "sxy": np.zeros((k, k)),
+        "hex": {p: np.zeros((hist_bins, hist_bins), dtype=np.int64) for p in HEX_PAIRS if set(p) <= set(cols)},
+        "monthly": {c: np.zeros((13, hist_bins), dtype=np.int64) for c in cols},
+    }
+    reservoir = {"size": sample_size, "rows": None, "months": None}
+    shift = None
+
+    usecols = cols + ([month_col] if month_col in header else [])
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize):
+        if month_col in chunk:
+            months = pd.to_datetime(chunk[month_col], errors="coerce").dt.month.fillna(0).astype(int).values
+        else:
+            months = np.zeros(len(chunk), dtype=int)
+        X = chunk[cols].to_numpy(dtype=np.float64)
+        M = ~np.isnan(X)
+        if shift is None:
+            # Verschiebung um den ersten Chunk-Mittelwert gegen Auslöschung in den Summen
+            shift = np.nan_to_num(np.nanmean(X, axis=0)) if M.any() else np.zeros(k)
+        Z = np.where(M, X - shift, 0.0)
+        Mf = M.astype(np.float64)
+
+        agg["n"] += Mf.T @ Mf
+        agg["sx"] += Z.T @ Mf          # sx[i, j] = Σ x_i über Zeilen mit x_i und x_j gültig
+        agg["sxx"] += (Z * Z).T @ Mf
+        agg["sxy"] += Z.T @ Z
+        agg["min"] = np.fmin(agg["min"], np.nanmin(np.where(M, X, np.inf), axis=0))
+        agg["max"] = np.fmax(agg["max"], np.nanmax(np.where(M, X, -np.inf), axis=0))
+
+        for (a, b), hist in agg["hex"].items():
+            ia, ib = cols.index(a), cols.index(b)
+            ok = M[:, ia] & M[:, ib]
+            hist += np.histogram2d(X[ok, ia], X[ok, ib], bins=[edges, edges])[0].astype(np.int64)
+
+        bins = np.clip(np.searchsorted(edges, X, side="right") - 1, 0, hist_bins - 1)
+        for j, c in enumerate(cols):
+            ok = M[:, j]
+            np.add.at(agg["monthly"][c], (months[ok], bins[ok, j]), 1)
+
+        sample = chunk[cols].set_index(pd.Index(months))
+        _reservoir_update(reservoir, sample, agg["n_rows"], rng)
+        agg["n_rows"] += len(chunk)
+
+    agg["shift"] = shift if shift is not None else np.zeros(k)
+    agg["sample"] = pd.DataFrame(reservoir["rows"][:min(sample_size, agg["n_rows"])], columns=cols) \
+        if reservoir["rows"] is not None else pd.DataFrame(columns=cols)
+    if reservoir["months"] is not None:
+        agg["sample"]["month"] = reservoir["months"][:len(agg["sample"])]
+    return agg
+
+
+def summarize_aggregates(agg):
+    """describe()-ähnliche Übersicht und Korrelationsmatrix aus den Aggregaten."""
+    cols = agg["cols"]
+    n, sx, sxx, sxy = agg["n"], agg["sx"], agg["sxx"], agg["sxy"]
+    count = np.diag(n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.diag(sx) / count + agg["shift"]
+        var = (np.diag(sxx) - np.diag(sx) ** 2 / count) / (count - 1)
+        cov = n * sxy - sx * sx.T
+        corr = cov / np.sqrt((n * sxx - sx ** 2) * (n * sxx.T - sx.T ** 2))
+    summary = pd.DataFrame(
+        {"count": count, "mean": mean, "std": np.sqrt(var), "min": agg["min"], "max": agg["max"]},
+        index=cols,
+    ).T
+    return summary, pd.DataFrame(corr, index=cols, columns=cols)
+
+
+def _box_stats_from_hist(counts, edges, label):
+    """Boxplot-Kennwerte (Quartile, Whisker 5/95 %) aus einem Histogramm."""
+    cdf = np.cumsum(counts) / counts.sum()
+    centers = (edges[:-1] + edges[1:]) / 2
+    q = lambda p: float(centers[min(np.searchsorted(cdf, p), len(centers) - 1)])
+    return {"label": label, "med": q(0.5), "q1": q(0.25), "q3": q(0.75),
+            "whislo": q(0.05), "whishi": q(0.95), "fliers": []}
+
+
+def load_or_compute_aggregates(path, cache_path=None, refresh=False, **kwargs):
+    """Aggregate aus dem Cache laden (gültig bei gleicher Datei/Parametern) oder neu berechnen."""
+    cache_path = cache_path or path + ".eda.pkl"
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, sorted(kwargs.items()))
+    if not refresh and os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+        if cached.get("key") == key:
+            print(f"♻️ EDA-Aggregate aus Cache: {cache_path}")
+            return cached["agg"]
+
+    agg = compute_eda_aggregates(path, **kwargs)
+    with open(cache_path, "wb") as f:
+        pickle.dump({"key": key, "agg": agg}, f)
+    print(f"💾 EDA-Aggregate gecacht: {cache_path}")
+    return agg
+
+
+def run_eda_streaming(path, cache_path=None, refresh=False, **kwargs):
+    """
+    EDA für sehr große Feature-Tabellen: ein chunkweiser Durchlauf mit
+    begrenztem Speicher, Plots aus vorberechneten Aggregaten und einer
+    Reservoir-Stichprobe. Erneutes Plotten nutzt den Cache ohne Neueinlesen.
+    """
+    agg = load_or_compute_aggregates(path, cache_path=cache_path, refresh=refresh, **kwargs)
+    summary, corr = summarize_aggregates(agg)
+
+    print("🧩 Datensatz:", agg["n_rows"], "Funde")
+    print(summary)
+
+    plt.figure(figsize=(8,6))
+    sns.heatmap(corr, annot=True, cmap="RdYlBu_r", center=0, fmt=".2f")
+    plt.title("Korrelationsmatrix der Umweltkennwerte")
+    plt.show()
+
+    edges = agg["edges"]
+    centers = (edges[:-1] + edges[1:]) / 2
+    gx, gy = np.meshgrid(centers, centers, indexing="ij")
+    for (a, b), hist in agg["hex"].items():
+        ok = hist.ravel() > 0
+        plt.figure(figsize=(6,6))
+        plt.hexbin(gx.ravel()[ok], gy.ravel()[ok], C=hist.ravel()[ok], reduce_C_function=np.sum,
+                   gridsize=50, extent=(edges[0], edges[-1], edges[0], edges[-1]), cmap="viridis", mincnt=1)
+        plt.colorbar(label="Anzahl")
+        plt.xlabel(a)
+        plt.ylabel(b)
+        plt.title("NDVI vs. NDWI – Vegetationsvitalität und Feuchte")
+        plt.show()
+
+    sample = agg["sample"]
+    for vars_, title in PAIRPLOT_GROUPS:
+        vars_ = [v for v in vars_ if v in sample.columns]
+        if len(vars_) >= 2 and len(sample):
+            sns.pairplot(sample, vars=vars_, diag_kind="kde")
+            plt.suptitle(f"{title} (Stichprobe n={len(sample)})", y=1.02)
+            plt.show()
+
+    if "NDVI_at_point" in agg["monthly"]:
+        hist = agg["monthly"]["NDVI_at_point"]
+        stats = [_box_stats_from_hist(hist[m], edges, str(m)) for m in range(1, 13) if hist[m].sum() > 0]
+        if stats:
+            fig, ax = plt.subplots(figsize=(10,4))
+            ax.bxp(stats, showfliers=False)
+            ax.set_xlabel("month")
+            ax.set_ylabel("NDVI_at_point")
+            plt.title("NDVI zum Fundzeitpunkt (monatlich)")
+            plt.show()
+
+    return agg
+
 # Beispiel:
 # run_eda("/content/drive/MyDrive/iNaturalist/inat_c_nebularis_env_full.csv")
+# run_eda_streaming("/content/drive/MyDrive/iNaturalist/inat_c_nebularis_env_full.csv")
@@ -4,12 +4,24 @@
 # ============================================================
 
 import os
-import rasterio
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
 from datetime import datetime
 from glob import glob
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from pipe import raster_io, region_tiles, feature_cache, shared_points, climatology
+
+# Feature-Schema der Punkttabelle (auch für die Flächenvorhersage)
+FEATURE_COLUMNS = [
+    "NDVI", "NDWI",
+    "NDVI_STD", "NDVI_MORAN", "NDVI_GEARY",
+    "NDWI_STD", "NDWI_MORAN", "NDWI_GEARY",
+]
+# Zusätzliche Spalten bei climatology.enabled (Abweichung vom Monatsmittel aller Jahre)
+CLIMATOLOGY_COLUMNS = ["NDVI_ANOM", "NDVI_ZSCORE", "NDWI_ANOM", "NDWI_ZSCORE"]
+
 
 # ------------------------------------------------------------
 # Hilfsfunktionen
@@ -21,38 +33,75 @@ def find_raster(base_dir, prefix, year, month):
     """
     pattern = f"{prefix}_*{year}_{str(month).zfill(2)}*.tif"
     files = sorted(glob(os.path.join(base_dir, pattern)))
+    if not raster_io.is_artefact_file(prefix + "_"):
+        # Basisraster gesucht → Artefakte/Stacks desselben Monats ignorieren
+        files = [f for f in files if not raster_io.is_artefact_file(f)]
     return files[0] if files else None
 
 
-def read_raster_value(raster_path, lon, lat):
+def feature_columns(cfg):
+    """Feature-Spalten der Punkttabelle (mit climatology.enabled inkl. Anomalien)."""
+    enabled = climatology.climatology_options(cfg)["enabled"]
+    return FEATURE_COLUMNS + (CLIMATOLOGY_COLUMNS if enabled else [])
+
+
+def sample_month(cfg, year, month, lon, lat, cache=None, pool=None):
     """
-    Liest den Pixelwert eines Raster-TIFs an einer gegebenen Koordinate.
+    Umweltwerte aller Punkte eines Monats → {Spalte: Werte} (NDVI/NDWI,
+    Artefakte, bei climatology.enabled Anomalie/z-Wert). Stack, falls
+    vorhanden, sonst Einzeldateien; fehlende Raster → Spalte fehlt.
     """
-    if raster_path is None or not os.path.exists(raster_path):
-        return np.nan
-    try:
-        with rasterio.open(raster_path) as src:
-            row, col = src.index(lon, lat)
-            val = src.read(1)[row, col]
-            if val == src.nodata:
-                return np.nan
-            return float(val)
-    except Exception:
-        return np.nan
+    clim_opts = climatology.climatology_options(cfg)
+    out = {}
+    for index in ("NDVI", "NDWI"):
+        index_dir = cfg["paths"][f"{index.lower()}_dir"]
+        # Mehrband-Stack: alle Kennwerte in einem Durchlauf über die Blöcke
+        stacks = region_tiles.mosaic_index(cfg, index_dir, f"{index}_STACK", year, month, find_raster)
+        if stacks:
+            sampled = region_tiles.sample_mosaic(cfg, stacks, lon, lat, cache, pool)
+        else:
+            # Einzeldateien: Basisraster + Artefakt-Raster
+            sampled = {}
+            for name in [index] + [f"{index}_{m}" for m in ("STD", "MORAN", "GEARY")]:
+                mosaic = region_tiles.mosaic_index(cfg, index_dir, name, year, month, find_raster)
+                vals = region_tiles.sample_mosaic(cfg, mosaic, lon, lat, cache, pool)
+                if vals:
+                    sampled[name] = next(iter(vals.values()))
+
+        if clim_opts["enabled"] and index in sampled:
+            clim = region_tiles.mosaic_index(
+                cfg, index_dir, f"{index}_CLIM", year, month, climatology.find_climatology
+            )
+            stats = region_tiles.sample_mosaic(cfg, clim, lon, lat, cache, pool)
+            if stats:
+                sampled[f"{index}_ANOM"], sampled[f"{index}_ZSCORE"] = climatology.anomaly(
+                    sampled[index], stats[f"{index}_CLIM_MEAN"], stats[f"{index}_CLIM_STD"],
+                    stats[f"{index}_CLIM_COUNT"], clim_opts["min_years"],
+                )
+
+        out.update(sampled)
+    return out
 
 
 def extract_features(cfg):
     """
     Ergänzt Beobachtungsdaten (Pilze, Meisen) um NDVI/NDWI + Artefaktwerte.
     Erwartet: inaturalist_combined.csv im output_dir.
+
+    Punkte werden je Monat gebündelt; pro Raster werden alle Punkte nach
+    internem Block sortiert gelesen und in die Eingabereihenfolge zurückgeschrieben.
+    Bei Kachelung (export.tiling) werden die Kachelordner über einen
+    Mosaik-Index abgefragt – Kachelgrenzen spielen für den Aufrufer keine Rolle.
+    Vor jedem Rasterzugriff wird der persistente Feature-Cache gefragt; mit
+    feature_extraction.parallel verteilen sich große Punktmengen auf Prozesse,
+    die das einmal dekodierte Raster aus Shared Memory lesen.
+    Mit climatology.enabled kommen Anomalie und z-Wert gegenüber der
+    Monatsklimatologie (climatology.py) hinzu – ein Zugriff je Punkt.
     """
 
     base_dir = cfg["paths"]["base_data_dir"]
     out_dir = cfg["paths"]["output_dir"]
 
-    ndvi_dir = cfg["paths"]["ndvi_dir"]
-    ndwi_dir = cfg["paths"]["ndwi_dir"]
-
     infile = os.path.join(out_dir, "inaturalist_combined.csv")
     if not os.path.exists(infile):
         raise FileNotFoundError(f"❌ {infile} fehlt – bitte zuerst inat_loader ausführen!")
@@ -60,40 +109,32 @@ def extract_features(cfg):
     df = pd.read_csv(infile)
     df["date"] = pd.to_datetime(df["date"])
 
-    results = []
-    for i, row in tqdm(df.iterrows(), total=len(df), desc="🔍 Extrahiere Umweltwerte"):
-        lat, lon = row["latitude"], row["longitude"]
-        year, month = row["date"].year, row["date"].month
-
-        ndvi_file = find_raster(ndvi_dir, "NDVI", year, month)
-        ndwi_file = find_raster(ndwi_dir, "NDWI", year, month)
-
-        # Artefakt-Raster prüfen
-        ndvi_std = find_raster(ndvi_dir, "NDVI_STD", year, month)
-        ndvi_moran = find_raster(ndvi_dir, "NDVI_MORAN", year, month)
-        ndvi_geary = find_raster(ndvi_dir, "NDVI_GEARY", year, month)
-
-        ndwi_std = find_raster(ndwi_dir, "NDWI_STD", year, month)
-        ndwi_moran = find_raster(ndwi_dir, "NDWI_MORAN", year, month)
-        ndwi_geary = find_raster(ndwi_dir, "NDWI_GEARY", year, month)
-
-        vals = {
-            "latitude": lat,
-            "longitude": lon,
-            "date": row["date"].strftime("%Y-%m-%d"),
-            "species": row["species"],
-            "NDVI": read_raster_value(ndvi_file, lon, lat),
-            "NDWI": read_raster_value(ndwi_file, lon, lat),
-            "NDVI_STD": read_raster_value(ndvi_std, lon, lat),
-            "NDVI_MORAN": read_raster_value(ndvi_moran, lon, lat),
-            "NDVI_GEARY": read_raster_value(ndvi_geary, lon, lat),
-            "NDWI_STD": read_raster_value(ndwi_std, lon, lat),
-            "NDWI_MORAN": read_raster_value(ndwi_moran, lon, lat),
-            "NDWI_GEARY": read_raster_value(ndwi_geary, lon, lat),
-        }
-        results.append(vals)
-
-    df_out = pd.DataFrame(results)
+    df_out = pd.DataFrame({
+        "latitude": df["latitude"],
+        "longitude": df["longitude"],
+        "date": df["date"].dt.strftime("%Y-%m-%d"),
+        "species": df["species"],
+    })
+    columns = feature_columns(cfg)
+    for col in columns:
+        df_out[col] = np.nan
+
+    cache = feature_cache.open_cache(cfg)
+    pool = None
+    try:
+        pool = shared_points.open_pool(cfg)
+        groups = df.groupby([df["date"].dt.year, df["date"].dt.month]).indices
+        for (year, month), pos in tqdm(groups.items(), desc="🔍 Extrahiere Umweltwerte"):
+            lon = df["longitude"].to_numpy()[pos]
+            lat = df["latitude"].to_numpy()[pos]
+
+            sampled = sample_month(cfg, year, month, lon, lat, cache, pool)
+            for name, values in sampled.items():
+                if name in columns:
+                    df_out.iloc[pos, df_out.columns.get_loc(name)] = values
+    finally:
+        shared_points.close_pool(pool)
+        feature_cache.close_cache(cache)
 
     outfile = os.path.join(out_dir, "inaturalist_features.csv")
     df_out.to_csv(outfile, index=False)
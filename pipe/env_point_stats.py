@@ -10,12 +10,43 @@ import rasterio
 from esda import Moran, Geary
 from libpysal.weights import lat2W
 from tqdm import tqdm
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from pipe import raster_io, region_tiles, shared_points
+
+
+def window_stats(arr):
+    """STD, Moran & Geary eines Punktfensters → {Kennzahl: Wert} (None bei < 5 gültigen Pixeln)."""
+    vals = arr.flatten()
+    vals = vals[~np.isnan(vals)]
+    if len(vals) < 5:
+        return None
+
+    # STD
+    stats = {"STD": float(np.nanstd(vals))}
+
+    # Moran & Geary (lokal)
+    if vals.shape[0] > 8:
+        n = int(np.sqrt(len(vals)))
+        if n*n == len(vals):  # quadratisches Fenster
+            w = lat2W(n, n)
+            w.transform = "r"
+            mor = Moran(vals, w)
+            gea = Geary(vals, w)
+            stats["MORAN"] = float(mor.I)
+            stats["GEARY"] = float(gea.C)
+    return stats
+
 
 def extract_pointwise_stats(cfg, window=11):
     """
     Berechnet lokale STD, Moran & Geary direkt an Fundpunkten.
     - Nutzt vorhandene NDVI/NDWI Raster
     - Kein globales Artefakt nötig
+    - Je Raster werden die Punkte nach internem Block sortiert; Punkte eines
+      Blocks teilen sich einen Lesevorgang (Ausgabe in Eingabereihenfolge)
+    - Mit feature_extraction.parallel verteilen sich die Punkte auf Prozesse,
+      die das einmal dekodierte Raster aus Shared Memory lesen
     """
 
     base_dir = cfg["paths"]["base_data_dir"]
@@ -31,52 +62,37 @@ def extract_pointwise_stats(cfg, window=11):
     ndvi_dir = cfg["paths"]["ndvi_dir"]
     ndwi_dir = cfg["paths"]["ndwi_dir"]
 
+    # Alle Kachelordner (ohne Kachelung: nur der Indexordner)
     raster_paths = {
-        "NDVI": sorted([os.path.join(ndvi_dir, f) for f in os.listdir(ndvi_dir) if f.endswith(".tif")]),
-        "NDWI": sorted([os.path.join(ndwi_dir, f) for f in os.listdir(ndwi_dir) if f.endswith(".tif")]),
+        key: [f for f in region_tiles.find_tile_raster(cfg, folder, "*.tif") if not raster_io.is_artefact_file(f)]
+        for key, folder in (("NDVI", ndvi_dir), ("NDWI", ndwi_dir))
     }
 
-    results = []
-
-    for i, row in tqdm(df.iterrows(), total=len(df), desc="🧩 Punktstatistiken"):
-        lat, lon = row["latitude"], row["longitude"]
-
-        row_result = {"latitude": lat, "longitude": lon, "species": row.get("species", "")}
-
+    species = df["species"] if "species" in df.columns else pd.Series("", index=df.index)
+    results = [
+        {"latitude": lat, "longitude": lon, "species": sp}
+        for lat, lon, sp in zip(df["latitude"], df["longitude"], species)
+    ]
+    pad = window // 2
+    pool = shared_points.open_pool(cfg)
+    try:
         for key, rasters in raster_paths.items():
-            for path in rasters:
+            for path in tqdm(rasters, desc=f"🧩 Punktstatistiken {key}"):
                 month = "_".join(os.path.basename(path).split("_")[-2:]).replace(".tif", "")
                 try:
+                    # Pixelpositionen aller Punkte, dann Fenster in Blockreihenfolge (bzw. parallel)
                     with rasterio.open(path) as src:
-                        # Pixelposition finden
-                        px, py = src.index(lon, lat)
-                        pad = window // 2
-                        # Lokales Fenster lesen
-                        win = rasterio.windows.Window(px - pad, py - pad, window, window)
-                        arr = src.read(1, window=win).astype("float32")
-                        arr[arr == src.nodata] = np.nan
-                        vals = arr.flatten()
-                        vals = vals[~np.isnan(vals)]
-                        if len(vals) < 5:
-                            continue
-
-                        # STD
-                        row_result[f"{key}_STD_{month}"] = float(np.nanstd(vals))
-
-                        # Moran & Geary (lokal)
-                        if vals.shape[0] > 8:
-                            n = int(np.sqrt(len(vals)))
-                            if n*n == len(vals):  # quadratisches Fenster
-                                w = lat2W(n, n)
-                                w.transform = "r"
-                                mor = Moran(vals, w)
-                                gea = Geary(vals, w)
-                                row_result[f"{key}_MORAN_{month}"] = float(mor.I)
-                                row_result[f"{key}_GEARY_{month}"] = float(gea.C)
+                        rows, cols = raster_io.points_to_pixels(src, df["longitude"], df["latitude"])
+                    per_point = shared_points.map_windows(
+                        pool, path, rows - pad, cols - pad, window, window, window_stats
+                    )
+                    for row_result, stats in zip(results, per_point):
+                        if stats:
+                            row_result.update({f"{key}_{m}_{month}": v for m, v in stats.items()})
                 except Exception as e:
-                    pass
-
-        results.append(row_result)
+                    print(f"⚠️ Fehler bei {os.path.basename(path)}: {e}")
+    finally:
+        shared_points.close_pool(pool)
 
     df_out = pd.DataFrame(results)
     out_path = os.path.join(output_dir, "inat_points_localstats.csv")
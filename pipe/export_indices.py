@@ -3,6 +3,7 @@ import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from config.config import cfg
+from pipe import region_tiles
 
 def init_gee(project_id=None):
     """
@@ -43,6 +44,13 @@ def get_monthly_index(year, month, region, index):
 
     return col.select(index).median().clip(region)
 
+def export_description(index, year, month, tile=None):
+    """
+    Dateiname/Taskname eines Monatsexports, z. B. NDVI_BerlinBB_2023_07 bzw.
+    je Kachel NDVI_E01300N05250_2023_07 (tile None → export.tiling.region_name).
+    """
+    return region_tiles.raster_name(index, tile or region_tiles.region_token(cfg), year, month)
+
 def export_monthly_index(year=None, months=None, region=None, index='NDVI', folder=None):
     """
     Exportiert monatliche Mittelwerte von NDVI/NDWI für eine Region aus GEE nach Google Drive.
@@ -53,6 +61,9 @@ def export_monthly_index(year=None, months=None, region=None, index='NDVI', fold
         - region: ee.Geometry (oder None → Standard aus cfg)
         - index: 'NDVI' oder 'NDWI'
         - folder: Zielordner auf Drive (optional, sonst aus cfg)
+
+    Gibt die gestarteten ee.batch.Task-Objekte zurück (für Statusabfragen,
+    siehe export_orchestrator.py).
     """
     year = year or cfg["export"]["start_year"]
     months = months or cfg["export"]["months"]
@@ -63,18 +74,25 @@ def export_monthly_index(year=None, months=None, region=None, index='NDVI', fold
         bbox = cfg["inat"]["bbox_default"]
         region = ee.Geometry.Rectangle(bbox)
 
+    # Koordinaten nur einmal vom Server holen (statt pro Monat)
+    region_coords = region.coordinates().getInfo()
+
+    tasks = []
     for m in months:
         image = get_monthly_index(year, m, region, index)
-        description = f"{index}_BerlinBB_{year}_{m:02d}"
+        description = export_description(index, year, m)
         task = ee.batch.Export.image.toDrive(
             image=image,
             description=description,
             folder=folder,
             fileNamePrefix=description,
-            region=region.coordinates().getInfo(),
+            region=region_coords,
             scale=cfg["export"]["scale"],
             crs='EPSG:4326',
             maxPixels=int(cfg["export"]["max_pixels"])
         )
         task.start()
+        tasks.append(task)
         print(f"🚀 Export gestartet: {description}")
+
+    return tasks
@@ -0,0 +1,235 @@
+# ============================================================
+# 🚀 export_orchestrator.py
+# Version: 2025-10 | Warteschlange für GEE-Exporte mit Limit, Polling & Auto-Ingest
+# ============================================================
+
+import os
+import sys
+import time
+import shutil
+from collections import deque
+from glob import glob
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import cfg as default_cfg
+from pipe import raster_inventory, region_tiles  # export_indices (earthengine-api) erst bei Bedarf
+
+STATE_COMPLETED = "COMPLETED"
+STATES_FAILED = ("FAILED", "CANCELLED")
+
+
+# ------------------------------------------------------------
+# Hilfsfunktionen
+# ------------------------------------------------------------
+
+def build_export_jobs(cfg, indices=("NDVI", "NDWI"), years=None, months=None, tiles=None):
+    """
+    Erzeugt je (Kachel, index, year, month) einen Exportauftrag aus cfg["export"].
+    Aufträge sind kachelweise sortiert, damit fertige Kacheln früh weiterverarbeitet
+    werden können; tiles (Liste von IDs) beschränkt den Lauf auf einzelne Kacheln.
+    """
+    years = years or cfg["export"]["years"]
+    months = months or cfg["export"]["months"]
+    grid = [t for t in region_tiles.tile_grid(cfg) if tiles is None or t["id"] in tiles]
+
+    jobs = []
+    for tile in grid:
+        for index in indices:
+            local_dir = cfg["paths"][f"{index.lower()}_dir"]
+            for year in years:
+                for month in months:
+                    jobs.append({
+                        "index": index,
+                        "year": int(year),
+                        "month": int(month),
+                        "tile": tile["id"],
+                        "bbox": tile["export_bbox"],
+                        "description": region_tiles.raster_name(index, tile["id"], int(year), int(month)),
+                        "folder": os.path.basename(os.path.normpath(local_dir)),
+                        "local_dir": local_dir,
+                        "target_dir": region_tiles.tile_dir(cfg, local_dir, tile["id"]),
+                        "attempts": 0,
+                        "task": None,
+                        "state": "QUEUED",
+                        "path": None,
+                    })
+    return jobs
+
+
+def find_exported_file(local_dir, description):
+    """Sucht die von Drive synchronisierte Exportdatei (auch gekachelte Teile)."""
+    files = sorted(glob(os.path.join(local_dir, f"{description}*.tif")))
+    return files[0] if files else None
+
+
+def bbox_coords(bbox):
+    """Rechteck-Ring [[x0, y0], …] clientseitig – kein getInfo()-Roundtrip je Kachel."""
+    x0, y0, x1, y1 = bbox
+    return [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]
+
+
+def _start_job(job, ee_module, image_fn, gee_cfg):
+    """Startet einen einzelnen Export-Task (Region = Kachel inkl. Halo) und merkt ihn im Job vor."""
+    job["attempts"] += 1
+    region = ee_module.Geometry.Rectangle(job["bbox"])
+    image = image_fn(job["year"], job["month"], region, job["index"])
+    task = ee_module.batch.Export.image.toDrive(
+        image=image,
+        description=job["description"],
+        folder=job["folder"],
+        fileNamePrefix=job["description"],
+        region=bbox_coords(job["bbox"]),
+        scale=gee_cfg["scale"],
+        crs="EPSG:4326",
+        maxPixels=int(float(gee_cfg["max_pixels"])),
+    )
+    task.start()
+    job["task"] = task
+    job["state"] = "RUNNING"
+    print(f"🚀 Export gestartet: {job['description']} (Versuch {job['attempts']})")
+
+
+def _task_status(task):
+    """task.status() ohne Abbruch bei vorübergehenden EE-Fehlern (→ state UNKNOWN)."""
+    try:
+        return task.status()
+    except Exception as e:
+        print(f"⚠️ Statusabfrage fehlgeschlagen: {e}")
+        return {"state": "UNKNOWN"}
+
+
+# ------------------------------------------------------------
+# Hauptfunktion
+# ------------------------------------------------------------
+
+def run_export_queue(
+    jobs=None,
+    cfg=None,
+    max_running=None,
+    poll_interval=None,
+    max_poll_interval=None,
+    max_retries=None,
+    ingest_timeout=None,
+    ee_module=None,
+    image_fn=None,
+    sleep=time.sleep,
+    clock=time.monotonic,
+):
+    """
+    Arbeitet Exportaufträge (je Kachel, siehe export.tiling) ab, hält höchstens max_running Tasks gleichzeitig aktiv,
+    pollt den Status mit exponentiellem Backoff, startet fehlgeschlagene Tasks
+    erneut und trägt fertige Dateien ins lokale Rasterinventar ein.
+
+    Args:
+        jobs (list): Aufträge aus build_export_jobs (None → alle aus cfg["export"]).
+        cfg (dict): Konfiguration (None → config.cfg).
+        max_running (int): Maximale Zahl gleichzeitig laufender Tasks.
+        poll_interval (float): Start-Intervall zwischen Statusabfragen (s).
+        max_poll_interval (float): Obergrenze für den Backoff (s).
+        max_retries (int): Neustarts pro Auftrag nach FAILED/CANCELLED.
+        ingest_timeout (float): Wartezeit auf die Drive-Synchronisierung (s).
+        ee_module: Earth-Engine-Modul oder Stand-in mit gleicher API.
+        image_fn: Funktion (year, month, region, index) → ee.Image.
+        sleep, clock: austauschbar für Tests.
+
+    Returns:
+        dict mit Listen "completed" und "failed".
+    """
+    cfg = cfg or default_cfg
+    opts = cfg["export"].get("orchestrator", {})
+    max_running = max_running or opts.get("max_running", 4)
+    poll_interval = poll_interval or opts.get("poll_interval_s", 30)
+    max_poll_interval = max_poll_interval or opts.get("max_poll_interval_s", 300)
+    max_retries = max_retries if max_retries is not None else opts.get("max_retries", 2)
+    ingest_timeout = ingest_timeout if ingest_timeout is not None else opts.get("ingest_timeout_s", 1800)
+    if ee_module is None or image_fn is None:
+        from pipe import export_indices  # importiert earthengine-api
+        ee_module = ee_module or export_indices.ee
+        image_fn = image_fn or export_indices.get_monthly_index
+
+    jobs = jobs if jobs is not None else build_export_jobs(cfg)
+    inv_path = raster_inventory.inventory_path(cfg)
+
+    queue = deque(jobs)
+    running, awaiting_ingest, completed, failed = [], [], [], []
+    delay = poll_interval
+
+    print(f"\n📋 {len(queue)} Exporte in der Warteschlange (max. {max_running} parallel)")
+
+    while queue or running or awaiting_ingest:
+        # --- Freie Slots auffüllen ---
+        retry = []
+        while queue and len(running) < max_running:
+            job = queue.popleft()
+            try:
+                _start_job(job, ee_module, image_fn, cfg["gee"])
+                running.append(job)
+            except Exception as e:
+                print(f"⚠️ Start fehlgeschlagen: {job['description']}: {e}")
+                if job["attempts"] <= max_retries:
+                    retry.append(job)
+                else:
+                    job["state"] = "FAILED"
+                    failed.append(job)
+        # erst nach dem nächsten (Backoff-)Intervall erneut starten
+        queue.extend(retry)
+
+        sleep(delay)
+        changed = False
+
+        # --- Status abfragen ---
+        for job in list(running):
+            status = _task_status(job["task"])
+            state = status.get("state", "UNKNOWN")
+            if state == STATE_COMPLETED:
+                running.remove(job)
+                job["state"] = "INGESTING"
+                job["completed_at"] = clock()
+                awaiting_ingest.append(job)
+                changed = True
+                print(f"✅ Export fertig: {job['description']}")
+            elif state in STATES_FAILED:
+                running.remove(job)
+                changed = True
+                error = status.get("error_message", "")
+                if job["attempts"] <= max_retries:
+                    print(f"🔁 {job['description']} {state} ({error}) – erneuter Versuch")
+                    job["state"] = "QUEUED"
+                    queue.append(job)
+                else:
+                    print(f"❌ {job['description']} endgültig {state}: {error}")
+                    job["state"] = state
+                    failed.append(job)
+
+        # --- Fertige Dateien ins Inventar übernehmen ---
+        for job in list(awaiting_ingest):
+            path = find_exported_file(job["local_dir"], job["description"])
+            if path:
+                # Kachelung: aus dem flachen Drive-Ordner in den Kachelordner verschieben
+                if job["target_dir"] != job["local_dir"]:
+                    os.makedirs(job["target_dir"], exist_ok=True)
+                    target = os.path.join(job["target_dir"], os.path.basename(path))
+                    shutil.move(path, target)
+                    path = target
+                raster_inventory.register_raster(
+                    inv_path, job["index"], job["year"], job["month"], path,
+                    source="gee_export", tile=job["tile"],
+                )
+                awaiting_ingest.remove(job)
+                job["state"] = "INGESTED"
+                job["path"] = path
+                completed.append(job)
+                changed = True
+                print(f"📥 Im Inventar: {os.path.basename(path)}")
+            elif clock() - job["completed_at"] > ingest_timeout:
+                awaiting_ingest.remove(job)
+                job["state"] = "NOT_INGESTED"
+                failed.append(job)
+                print(f"⚠️ Datei nach {ingest_timeout}s nicht im Drive-Ordner: {job['description']}")
+
+        # Backoff: bei Fortschritt zurücksetzen, sonst verdoppeln
+        delay = poll_interval if changed else min(delay * 2, max_poll_interval)
+
+    print(f"\n🏁 Exporte abgeschlossen: {len(completed)} ok, {len(failed)} fehlgeschlagen.")
+    return {"completed": completed, "failed": failed}
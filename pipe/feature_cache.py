@@ -0,0 +1,203 @@
+# ============================================================
+# 🗃️ feature_cache.py
+# Version: 2025-10 | Persistenter Pixel×Monat-Feature-Cache (artübergreifend, SQLite)
+# ============================================================
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+
+import numpy as np
+import rasterio
+from affine import Affine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pipe import raster_io, shared_points
+
+_HASH_CHUNK = 8 * 1024 ** 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rasters (
+    path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER,
+    hash TEXT, transform TEXT, width INTEGER, height INTEGER, names TEXT
+);
+CREATE TABLE IF NOT EXISTS cache (
+    hash TEXT, row INTEGER, col INTEGER, metric TEXT, value REAL, used INTEGER,
+    PRIMARY KEY (hash, row, col, metric)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_used ON cache (used);
+"""
+
+
+# ------------------------------------------------------------
+# Verwaltung
+# ------------------------------------------------------------
+
+def open_cache(cfg):
+    """
+    Öffnet den Cache aus feature_extraction.cache (None, wenn deaktiviert).
+    Zustand: {conn, max_entries, tick, hits, misses}.
+    """
+    opts = cfg.get("feature_extraction", {}).get("cache", {}) or {}
+    if not opts.get("enabled", False):
+        return None
+    path = opts.get("path") or os.path.join(cfg["paths"]["base_data_dir"], "feature_cache.sqlite")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEMA)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS q (i INTEGER, row INTEGER, col INTEGER)")
+    return {"conn": conn, "max_entries": int(opts.get("max_entries", 20_000_000)),
+            "tick": int(time.time()), "hits": 0, "misses": 0}
+
+
+def close_cache(cache):
+    """Begrenzt die Größe (älteste Zugriffe zuerst raus), speichert und meldet Trefferquote."""
+    if cache is None:
+        return
+    conn = cache["conn"]
+    n = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+    excess = n - cache["max_entries"]
+    if excess > 0:
+        conn.execute(
+            "DELETE FROM cache WHERE (hash, row, col, metric) IN "
+            "(SELECT hash, row, col, metric FROM cache ORDER BY used LIMIT ?)", (excess,)
+        )
+        print(f"  🧹 Cache: {excess} alte Einträge entfernt")
+    conn.commit()
+    conn.close()
+    total = cache["hits"] + cache["misses"]
+    if total:
+        print(f"  🗃️ Cache: {cache['hits']}/{total} Werte aus dem Cache ({100 * cache['hits'] / total:.0f} %)")
+
+
+def file_hash(path):
+    """Inhalts-Hash (BLAKE2b) – gleiche Datei an anderem Ort/Namen teilt ihre Einträge."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def raster_meta(cache, path):
+    """
+    Hash, Geotransform, Größe und Bandnamen eines Rasters. Solange Größe und
+    mtime unverändert sind, kommt alles aus dem Cache – ohne die Datei zu öffnen.
+    """
+    conn = cache["conn"]
+    stat = os.stat(path)
+    row = conn.execute("SELECT size, mtime_ns, hash, transform, width, height, names FROM rasters WHERE path = ?",
+                       (path,)).fetchone()
+    if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+        return {"hash": row[2], "transform": Affine(*json.loads(row[3])),
+                "width": row[4], "height": row[5], "names": json.loads(row[6])}
+
+    with rasterio.open(path) as src:
+        meta = {"transform": src.transform, "width": src.width, "height": src.height,
+                "names": [d or f"band_{i}" for i, d in enumerate(src.descriptions, 1)]}
+    meta["hash"] = file_hash(path)
+    conn.execute(
+        "INSERT OR REPLACE INTO rasters VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (path, stat.st_size, stat.st_mtime_ns, meta["hash"], json.dumps(list(meta["transform"])[:6]),
+         meta["width"], meta["height"], json.dumps(meta["names"])),
+    )
+    return meta
+
+
+def raster_transform(cache, path):
+    """Geotransform eines Rasters – aus dem Cache, sonst aus dem Dateikopf."""
+    if cache is not None:
+        return raster_meta(cache, path)["transform"]
+    with rasterio.open(path) as src:
+        return src.transform
+
+
+def lookup(cache, rhash, rows, cols, metric):
+    """Werte für (rhash, row, col, metric) → (Werte, Treffer-Maske); markiert Treffer als benutzt."""
+    conn = cache["conn"]
+    n = len(rows)
+    values = np.full(n, np.nan)
+    hit = np.zeros(n, dtype=bool)
+    conn.execute("DELETE FROM q")
+    conn.executemany("INSERT INTO q VALUES (?, ?, ?)", zip(range(n), map(int, rows), map(int, cols)))
+    found = conn.execute(
+        "SELECT q.i, c.value FROM q JOIN cache c "
+        "ON c.hash = ? AND c.metric = ? AND c.row = q.row AND c.col = q.col", (rhash, metric)
+    ).fetchall()
+    if found:
+        idx = np.fromiter((i for i, _ in found), dtype=np.int64, count=len(found))
+        values[idx] = [np.nan if v is None else v for _, v in found]
+        hit[idx] = True
+        conn.execute(
+            "UPDATE cache SET used = ? WHERE hash = ? AND metric = ? AND (row, col) IN (SELECT row, col FROM q)",
+            (cache["tick"], rhash, metric),
+        )
+    cache["hits"] += int(hit.sum())
+    cache["misses"] += int(n - hit.sum())
+    return values, hit
+
+
+def store(cache, rhash, rows, cols, metric, values):
+    """Legt Werte ab (NaN wird als NULL gespeichert und als NaN zurückgegeben)."""
+    cache["conn"].executemany(
+        "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)",
+        ((rhash, int(r), int(c), metric, None if np.isnan(v) else float(v), cache["tick"])
+         for r, c, v in zip(rows, cols, values)),
+    )
+
+
+# ------------------------------------------------------------
+# Gecachte Abfragen
+# ------------------------------------------------------------
+
+def sample_coords(cache, path, xs, ys, pool=None):
+    """
+    Wie raster_io.sample_coords, fragt aber zuerst den Cache: nur Punkte mit
+    fehlenden Werten werden (in Blockreihenfolge) aus dem Raster gelesen.
+    cache None → direkter Rasterzugriff; pool (shared_points) → fehlende
+    Punkte parallel aus dem geteilten Raster.
+    """
+    if cache is None:
+        return shared_points.sample_coords(pool, path, xs, ys)
+
+    meta = raster_meta(cache, path)
+    rows, cols = raster_io.points_to_pixels(meta["transform"], xs, ys)
+    out, miss = {}, np.zeros(len(rows), dtype=bool)
+    for name in meta["names"]:
+        values, hit = lookup(cache, meta["hash"], rows, cols, name)
+        out[name] = values.astype(np.float32)
+        miss |= ~hit
+
+    if miss.any():
+        m = np.flatnonzero(miss)
+        fresh = shared_points.sample_coords(pool, path, np.asarray(xs)[m], np.asarray(ys)[m])
+        for name in meta["names"]:
+            out[name][m] = fresh[name]
+            store(cache, meta["hash"], rows[m], cols[m], name, fresh[name])
+    return out
+
+
+def window_stats(cache, path, row_offs, col_offs, height, width, metric, stat_fn, pool=None):
+    """
+    Kennzahl je Fenster (z. B. Puffer-STD), zwischengespeichert unter
+    (Hash, row_off, col_off, metric). stat_fn(fenster) → float; nur fehlende
+    Fenster werden gelesen (shared_points.map_windows, mit pool parallel).
+    """
+    row_offs, col_offs = np.asarray(row_offs, dtype=np.int64), np.asarray(col_offs, dtype=np.int64)
+    out = np.full(len(row_offs), np.nan)
+    todo = np.arange(len(row_offs))
+    if cache is not None:
+        rhash = raster_meta(cache, path)["hash"]
+        out, hit = lookup(cache, rhash, row_offs, col_offs, metric)
+        todo = np.flatnonzero(~hit)
+    if todo.size == 0:
+        return out
+
+    out[todo] = shared_points.map_windows(pool, path, row_offs[todo], col_offs[todo], height, width, stat_fn)
+    if cache is not None:
+        store(cache, rhash, row_offs[todo], col_offs[todo], metric, out[todo])
+    return out
@@ -12,6 +12,7 @@ from shapely.geometry import Point
 from rasterio.windows import from_bounds
 
 from config.config import cfg  # zentrale Konfiguration
+from pipe import region_tiles, feature_cache, shared_points
 
 
 def slugify(text):
@@ -26,14 +27,24 @@ def make_filename(prefix, taxon_name, region_name, index_name, ext="csv", date=N
     return f"{prefix}_{slug_taxon}_{slug_region}_{slug_index}{date_str}.{ext}"
 
 
-def get_matching_raster_path(observed_on, var='NDVI', lag_months=None):
+def get_matching_raster_path(observed_on, var='NDVI', lag_months=None, tile=None):
+    """Pfad des Monatsrasters (mit Zeitversatz); tile None → Gesamtregion (export.tiling.region_name)."""
     base_dir = cfg["data"]["base_dir"]
     raster_subdir = cfg["data"]["raster_dirs"].get(var, "")
     lag = lag_months if lag_months is not None else cfg["feature_extraction"].get("lag_months", 1)
 
     date = pd.to_datetime(observed_on) - pd.DateOffset(months=lag)
-    filename = f"{var}_BerlinBB_{date.year}_{date.month:02d}.tif"
-    return os.path.join(base_dir, raster_subdir, filename)
+    tile = tile or region_tiles.region_token(cfg)
+    folder = region_tiles.tile_dir(cfg, os.path.join(base_dir, raster_subdir), tile)
+    return os.path.join(folder, region_tiles.raster_name(var, tile, date.year, date.month) + ".tif")
+
+
+def _buffer_std(buf):
+    """STD im Puffer; Werte außerhalb [-1, 1] gelten als ungültig."""
+    buf = buf.astype(float)
+    buf[buf < -1] = np.nan
+    buf[buf > 1] = np.nan
+    return np.nanstd(buf)
 
 
 def extract_features_from_raster(gdf, var='NDVI', lag_months=None, buffer_m=None):
@@ -48,45 +59,65 @@ def extract_features_from_raster(gdf, var='NDVI', lag_months=None, buffer_m=None
 
     Returns:
         DataFrame mit extrahierten Features
+
+    Beobachtungen werden je Raster (Monat × Kachel) gebündelt und nach internem Block sortiert
+    gelesen (jeder Block einmal); die Ausgabe behält die Eingabereihenfolge.
+    Punkt- und Pufferwerte kommen, soweit vorhanden, aus dem persistenten
+    Feature-Cache (feature_extraction.cache) – artübergreifend. Mit
+    feature_extraction.parallel rechnen mehrere Prozesse auf dem einmal in
+    Shared Memory dekodierten Raster.
     """
-    features = []
+    features = {}
     buffer = buffer_m if buffer_m is not None else cfg["feature_extraction"].get("buffer_m", 100)
     lag = lag_months if lag_months is not None else cfg["feature_extraction"].get("lag_months", 1)
 
-    for _, row in gdf.iterrows():
-        try:
-            obs_date = pd.to_datetime(row['observed_on'])
-            raster_path = get_matching_raster_path(obs_date, var, lag)
-
+    # Kachel je Beobachtung (Mosaik: Nutzer muss keine Kachelgrenzen kennen)
+    tiles = region_tiles.tiles_for_points(cfg, gdf.geometry.x, gdf.geometry.y)
+    raster_paths = [
+        get_matching_raster_path(pd.to_datetime(d), var, lag, tile)
+        for d, tile in zip(gdf['observed_on'], tiles)
+    ]
+    by_raster = pd.Series(range(len(gdf))).groupby(raster_paths).indices
+    cache = feature_cache.open_cache(cfg)
+    pool = None
+    try:
+        pool = shared_points.open_pool(cfg)
+
+        for raster_path, pos in by_raster.items():
             if not os.path.exists(raster_path):
-                print(f"❌ Raster fehlt: {raster_path}")
+                print(f"❌ Raster fehlt: {raster_path} ({len(pos)} Beobachtungen)")
+                continue
+            try:
+                rows_gdf = gdf.iloc[pos]
+                xs, ys = rows_gdf.geometry.x.to_numpy(), rows_gdf.geometry.y.to_numpy()
+                transform = feature_cache.raster_transform(cache, raster_path)
+
+                # Punktwerte: Cache, sonst ein Lesevorgang je berührtem Block
+                at_point = next(iter(feature_cache.sample_coords(cache, raster_path, xs, ys, pool).values()))
+
+                # Buffer via from_bounds: Fenster je Punkt (gerundet wie rasterio.read)
+                window = from_bounds(*Point(xs[0], ys[0]).buffer(buffer).bounds, transform=transform)
+                height, width = int(round(window.height)), int(round(window.width))
+                col_f, row_f = ~transform * (xs - buffer, ys + buffer)
+                row_offs = np.floor(np.asarray(row_f) + 0.5).astype(np.int64)
+                col_offs = np.floor(np.asarray(col_f) + 0.5).astype(np.int64)
+                std_vals = feature_cache.window_stats(
+                    cache, raster_path, row_offs, col_offs, height, width, f"BUFSTD_{height}x{width}", _buffer_std, pool,
+                )
+            except Exception as e:
+                print(f"⚠️ Fehler bei Raster {os.path.basename(raster_path)}: {e}")
                 continue
 
-            with rasterio.open(raster_path) as src:
-                coords = (row.geometry.x, row.geometry.y)
-
-                # Punktwert
-                point_row, point_col = src.index(*coords)
-                val_at_point = src.read(1)[point_row, point_col]
-
-                # Buffer via from_bounds
-                window = from_bounds(*Point(*coords).buffer(buffer).bounds, transform=src.transform)
-                buf = src.read(1, window=window, boundless=True, fill_value=np.nan)
-                buf = buf.astype(float)
-                buf[buf < -1] = np.nan
-                buf[buf > 1] = np.nan
-                std_val = np.nanstd(buf)
-
-                features.append({
+            for j, (_, row) in enumerate(rows_gdf.iterrows()):
+                features[pos[j]] = {
                     'obs_id': row.get('obs_id', 'unknown'),
-                    f'{var}_at_point': val_at_point,
-                    f'{var}_std_{buffer}m': std_val,
+                    f'{var}_at_point': float(at_point[j]),
+                    f'{var}_std_{buffer}m': std_vals[j],
                     'observed_on': row['observed_on'],
                     'lon': row.geometry.x,
                     'lat': row.geometry.y
-                })
-        except Exception as e:
-            print(f"⚠️ Fehler bei Beobachtung {row.get('obs_id', 'unknown')}: {e}")
-            continue
-
-    return pd.DataFrame(features)
+                }
+    finally:
+        shared_points.close_pool(pool)
+        feature_cache.close_cache(cache)
+    return pd.DataFrame([features[k] for k in sorted(features)])
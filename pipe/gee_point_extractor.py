@@ -0,0 +1,187 @@
+# ============================================================
+# 🛰️ gee_point_extractor.py
+# Version: 2025-10 | Serverseitige Punktextraktion per reduceRegions (chunkweise)
+# ============================================================
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+OUTPUT_COLUMNS = ["row_id", "latitude", "longitude", "date", "species", "NDVI", "NDWI"]
+
+
+# ------------------------------------------------------------
+# Hilfsfunktionen
+# ------------------------------------------------------------
+
+def make_chunks(df, chunk_size=2000, lag_months=0):
+    """
+    Teilt die Punkte in Chunks auf – je Chunk nur ein Monat und
+    höchstens chunk_size Punkte (Payload-Limit der EE-API).
+    """
+    dates = pd.to_datetime(df["date"]) - pd.DateOffset(months=lag_months)
+    df = df.assign(_year=dates.dt.year, _month=dates.dt.month)
+
+    chunks = []
+    for (year, month), grp in df.groupby(["_year", "_month"], sort=True):
+        for start in range(0, len(grp), chunk_size):
+            part = grp.iloc[start:start + chunk_size]
+            chunks.append({
+                "year": int(year),
+                "month": int(month),
+                "points": part[["row_id", "latitude", "longitude"]],
+                "meta": part.drop(columns=["_year", "_month"]),
+            })
+    return chunks
+
+
+def _chunk_region(ee_module, points, pad_deg=0.001):
+    """Kleinste Bounding-Box um die Punkte eines Chunks (leicht gepuffert)."""
+    return ee_module.Geometry.Rectangle([
+        float(points["longitude"].min()) - pad_deg,
+        float(points["latitude"].min()) - pad_deg,
+        float(points["longitude"].max()) + pad_deg,
+        float(points["latitude"].max()) + pad_deg,
+    ])
+
+
+def reduce_chunk(chunk, indices, scale, ee_module, image_fn):
+    """Lädt einen Chunk als FeatureCollection hoch und liest alle Indizes per reduceRegions."""
+    pts = chunk["points"]
+    region = _chunk_region(ee_module, pts)
+
+    image = None
+    for index in indices:
+        band = image_fn(chunk["year"], chunk["month"], region, index)
+        image = band if image is None else image.addBands(band)
+
+    fc = ee_module.FeatureCollection([
+        ee_module.Feature(ee_module.Geometry.Point([float(lon), float(lat)]), {"row_id": int(rid)})
+        for rid, lat, lon in pts.itertuples(index=False)
+    ])
+    reduced = image.reduceRegions(collection=fc, reducer=ee_module.Reducer.first(), scale=scale)
+    features = reduced.getInfo().get("features", [])
+
+    values = {f["properties"]["row_id"]: f["properties"] for f in features}
+    out = chunk["meta"].copy()
+    for index in indices:
+        out[index] = [
+            np.nan if values.get(rid, {}).get(index) is None else float(values[rid][index])
+            for rid in out["row_id"]
+        ]
+    return out
+
+
+def _reduce_with_retry(chunk, indices, scale, ee_module, image_fn, max_retries, sleep):
+    for attempt in range(max_retries + 1):
+        try:
+            return reduce_chunk(chunk, indices, scale, ee_module, image_fn)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            wait = 2 ** attempt
+            print(f"🔁 Chunk {chunk['year']}-{chunk['month']:02d} fehlgeschlagen ({e}) – neuer Versuch in {wait}s")
+            sleep(wait)
+
+
+# ------------------------------------------------------------
+# Hauptfunktion
+# ------------------------------------------------------------
+
+def extract_features_gee(
+    cfg,
+    df=None,
+    indices=("NDVI", "NDWI"),
+    chunk_size=None,
+    max_workers=None,
+    max_retries=None,
+    lag_months=0,
+    ee_module=None,
+    image_fn=None,
+    sleep=time.sleep,
+):
+    """
+    Ergänzt Beobachtungen um NDVI/NDWI direkt serverseitig in Earth Engine –
+    ohne Export ganzer Monatsszenen.
+
+    Die Punkte werden je Monat in FeatureCollection-Chunks (≤ chunk_size Punkte)
+    hochgeladen und mit reduceRegions auf get_monthly_index ausgewertet.
+    Mehrere Chunks laufen parallel; fertige Chunks werden sofort an die
+    Feature-Tabelle angehängt.
+
+    Args:
+        cfg (dict): Konfiguration.
+        df (DataFrame): Beobachtungen (None → inaturalist_combined.csv).
+        indices (tuple): Abzufragende Indizes.
+        chunk_size (int): Max. Punkte pro Anfrage.
+        max_workers (int): Gleichzeitige Anfragen.
+        max_retries (int): Wiederholungen pro Chunk.
+        lag_months (int): Zeitversatz zur Beobachtung.
+        ee_module, image_fn: austauschbar für Tests (Stand-in der ee-API).
+
+    Returns:
+        DataFrame in Originalreihenfolge.
+    """
+    opts = cfg["feature_extraction"].get("gee_points", {})
+    chunk_size = chunk_size or opts.get("chunk_size", 2000)
+    max_workers = max_workers or opts.get("max_workers", 4)
+    max_retries = max_retries if max_retries is not None else opts.get("max_retries", 2)
+    if ee_module is None or image_fn is None:
+        from pipe import export_indices  # importiert earthengine-api
+        ee_module = ee_module or export_indices.ee
+        image_fn = image_fn or export_indices.get_monthly_index
+    scale = cfg["gee"]["scale"]
+
+    out_dir = cfg["paths"]["output_dir"]
+    if df is None:
+        infile = os.path.join(out_dir, "inaturalist_combined.csv")
+        if not os.path.exists(infile):
+            raise FileNotFoundError(f"❌ {infile} fehlt – bitte zuerst inat_loader ausführen!")
+        df = pd.read_csv(infile)
+
+    df = df.copy()
+    if "date" not in df.columns:
+        df["date"] = df["observed_on"]
+    df["date"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
+    df = df.dropna(subset=["latitude", "longitude"])
+    df["row_id"] = np.arange(len(df))
+    df = df[[c for c in ["row_id", "latitude", "longitude", "date", "species"] if c in df.columns]]
+
+    chunks = make_chunks(df, chunk_size=chunk_size, lag_months=lag_months)
+    print(f"🛰️ {len(df)} Punkte in {len(chunks)} Chunks (≤ {chunk_size}), {max_workers} parallel")
+
+    os.makedirs(out_dir, exist_ok=True)
+    outfile = os.path.join(out_dir, "inaturalist_features_gee.csv")
+    if os.path.exists(outfile):
+        os.remove(outfile)
+
+    parts = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_reduce_with_retry, c, indices, scale, ee_module, image_fn, max_retries, sleep): c
+            for c in chunks
+        }
+        for i, fut in enumerate(as_completed(futures), 1):
+            chunk = futures[fut]
+            try:
+                part = fut.result()
+            except Exception as e:
+                print(f"❌ Chunk {chunk['year']}-{chunk['month']:02d} verworfen: {e}")
+                continue
+            # Streaming: direkt anhängen, Header nur beim ersten Chunk
+            part.to_csv(outfile, mode="a", header=not os.path.exists(outfile), index=False)
+            parts.append(part)
+            print(f"   📥 [{i}/{len(chunks)}] {chunk['year']}-{chunk['month']:02d}: {len(part)} Punkte")
+
+    if not parts:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+    df_out = pd.concat(parts, ignore_index=True).sort_values("row_id").reset_index(drop=True)
+    print(f"\n✅ Features gespeichert: {outfile}")
+    return df_out
@@ -1,4 +1,5 @@
 from pipe.feature_extractor import extract_features_from_raster, make_filename
+from pipe.training_matrix import build_training_matrix
 from config.config import cfg
 import pandas as pd
 import geopandas as gpd
@@ -50,3 +51,12 @@ output_path = os.path.join(cfg["paths"]["output_path"], output_file)
 full_df.to_csv(output_path, index=False)
 
 print(f"✅ Kombinierte Punktmenge gespeichert unter: {output_path}")
+
+# 🧮 Modellmatrix (float32, memory-mapped) – direkt aus den Einzeltabellen, ohne CSV-Umweg
+feature_cols = [c for c in bg_feat.columns if c.startswith(index)]
+matrix_name = os.path.splitext(make_filename("matrix", taxon_name, region_name, index))[0]  # Ordner ohne Endung
+matrix_dir = os.path.join(cfg["paths"]["output_path"], matrix_name)
+build_training_matrix(
+    [fund_df], [bg_feat], matrix_dir, feature_cols,
+    labels=(cfg["labels"]["fund"], cfg["labels"]["background"]),
+)
@@ -6,15 +6,19 @@ import requests, pandas as pd, os, time
 from datetime import datetime
 from tqdm import tqdm
 
-def fetch_inat_observations(taxon_id, bbox, start_date, end_date, max_pages=50, sleep=1.0):
-    """Lädt iNaturalist-Beobachtungen per API."""
-    all_results = []
+# Spalten von parse_results (auch für Offline-Dumps und den Streaming-Modus)
+RESULT_COLUMNS = [
+    "species", "taxon_id", "latitude", "longitude",
+    "observed_on", "quality_grade", "user_login", "place_guess",
+]
+
+def iter_inat_pages(taxon_id, bbox, start_date, end_date, max_pages=50, sleep=1.0):
+    """Liefert iNaturalist-Beobachtungen seitenweise (Liste je Seite), sobald sie geladen sind."""
     base_url = "https://api.inaturalist.org/v1/observations"
 
-    bbox_str = ",".join(map(str, bbox))
-    print(f"🔍 Lade Beobachtungen für Taxon {taxon_id} (BBox={bbox_str}) ...")
-
     for page in tqdm(range(1, max_pages + 1), desc=f"Seiten für Taxon {taxon_id}"):
+        if page > 1:
+            time.sleep(sleep)  # Rate-Limit nur vor einer weiteren Anfrage, nicht nach der letzten Seite
         params = {
             "taxon_id": taxon_id,
             "nelat": bbox[3], "nelng": bbox[2],
@@ -34,13 +38,23 @@ def fetch_inat_observations(taxon_id, bbox, start_date, end_date, max_pages=50,
             results = resp.json().get("results", [])
             if not results:
                 break
-
-            all_results.extend(results)
-            time.sleep(sleep)
         except Exception as e:
             print("❌ API-Fehler:", e)
             break
 
+        yield results
+
+
+def fetch_inat_observations(taxon_id, bbox, start_date, end_date, max_pages=50, sleep=1.0):
+    """Lädt iNaturalist-Beobachtungen per API."""
+    all_results = []
+
+    bbox_str = ",".join(map(str, bbox))
+    print(f"🔍 Lade Beobachtungen für Taxon {taxon_id} (BBox={bbox_str}) ...")
+
+    for results in iter_inat_pages(taxon_id, bbox, start_date, end_date, max_pages, sleep):
+        all_results.extend(results)
+
     print(f"✅ {len(all_results)} Beobachtungen geladen.")
     return all_results
 
@@ -59,7 +73,26 @@ def parse_results(results, species_name):
             "user_login": obs.get("user", {}).get("login"),
             "place_guess": obs.get("place_guess"),
         })
-    return pd.DataFrame(records)
+    return pd.DataFrame(records, columns=RESULT_COLUMNS)
+
+
+def species_from_config(cfg, years_as_period=True):
+    """
+    Taxa, Zeitraum und BBox eines Abrufs: inat.species (target/contrast/period)
+    wie in local.yaml, sonst inat.default_taxon – ohne period mit export.years
+    als Zeitraum (years_as_period=False → kein Datumsfilter).
+    """
+    inat = cfg["inat"]
+    species = inat.get("species") or {}
+    taxa = [species[k] for k in ("target", "contrast") if k in species] or [
+        {"id": inat.get("default_taxon_id"), "name": inat.get("default_taxon"), "gbif_id": inat.get("default_gbif_id")}
+    ]
+    period = species.get("period")
+    if not period and years_as_period and cfg.get("export", {}).get("years"):
+        years = cfg["export"]["years"]
+        period = {"start": f"{min(years)}-01-01", "end": f"{max(years)}-12-31"}
+    bbox = inat.get("region_bbox") or inat.get("bbox_default")
+    return {"taxa": taxa, "period": period or {}, "bbox": bbox}
 
 
 def run_inat_fetch(cfg_local):
@@ -116,5 +149,5 @@ if "cfg_local" in globals():
     df_combined = run_inat_fetch(cfg_local)
     print("\n✅ Fetch abgeschlossen. Vorschau:")
     display(df_combined.head())
-else:
+elif __name__ == "__main__":
     print("⚠️ Keine cfg_local geladen. Bitte zuerst local.yaml laden!")
\ No newline at end of file
@@ -0,0 +1,164 @@
+# ============================================================
+# 🔀 io_pipeline.py
+# Version: 2025-10 | Read-ahead & Write-behind für Rasterstufen (I/O überlappt Rechnen)
+# ============================================================
+
+import queue
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_DONE = object()
+
+
+# ------------------------------------------------------------
+# Read-ahead
+# ------------------------------------------------------------
+
+def prefetch(items, read_fn, depth=1, stats=None):
+    """
+    Liest/dekodiert im Hintergrund-Thread bereits die nächsten `depth` Elemente,
+    während der Aufrufer das aktuelle verarbeitet. Liefert (item, read_fn(item)).
+    depth 0 liest synchron ohne Hintergrund-Thread.
+
+    stats (dict, optional) sammelt read_s (gesamte Lesezeit) und
+    read_wait_s (Zeit, die der Aufrufer tatsächlich auf Daten gewartet hat).
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("read_s", 0.0)
+    stats.setdefault("read_wait_s", 0.0)
+    if depth < 1:
+        # kein Read-ahead: synchron lesen – spart die vorgeladenen Szenen im Speicher
+        for item in items:
+            t0 = time.perf_counter()
+            data = read_fn(item)
+            stats["read_s"] += time.perf_counter() - t0
+            stats["read_wait_s"] += time.perf_counter() - t0
+            yield item, data
+        return
+    buf = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def reader():
+        for item in items:
+            if stop.is_set():
+                break
+            t0 = time.perf_counter()
+            try:
+                payload = (item, read_fn(item), None)
+            except Exception as e:
+                payload = (item, None, e)
+            stats["read_s"] += time.perf_counter() - t0
+            buf.put(payload)
+        buf.put(_DONE)
+
+    thread = threading.Thread(target=reader, name="raster-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            t0 = time.perf_counter()
+            entry = buf.get()
+            stats["read_wait_s"] += time.perf_counter() - t0
+            if entry is _DONE:
+                break
+            item, data, error = entry
+            if error is not None:
+                raise error
+            yield item, data
+    finally:
+        stop.set()
+        # Reader ggf. aus einem blockierenden put() befreien
+        while thread.is_alive():
+            try:
+                buf.get_nowait()
+            except queue.Empty:
+                thread.join(timeout=0.05)
+
+
+# ------------------------------------------------------------
+# Write-behind
+# ------------------------------------------------------------
+
+def start_writer(max_pending=1):
+    """
+    Startet einen Hintergrund-Writer mit begrenzter Warteschlange. Schreibaufträge
+    (Kompression, Upload auf Drive) laufen parallel zur nächsten Berechnung;
+    bei voller Warteschlange blockiert submit_write (Backpressure, Speicher bleibt begrenzt).
+    """
+    state = {
+        "queue": queue.Queue(maxsize=max(max_pending, 1)),
+        "errors": [],
+        "write_s": 0.0,
+        "submit_wait_s": 0.0,
+        "jobs": 0,
+    }
+
+    def worker():
+        while True:
+            job = state["queue"].get()
+            if job is _DONE:
+                break
+            fn, args, kwargs = job
+            t0 = time.perf_counter()
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                state["errors"].append(e)
+                print(f"     ⚠️ Schreibfehler im Hintergrund: {e}")
+            state["write_s"] += time.perf_counter() - t0
+
+    state["thread"] = threading.Thread(target=worker, name="raster-write-behind", daemon=True)
+    state["thread"].start()
+    return state
+
+
+def submit_write(state, fn, *args, **kwargs):
+    """Reiht einen Schreibauftrag ein (blockiert nur, wenn max_pending erreicht ist)."""
+    if state["errors"]:
+        raise state["errors"][0]
+    t0 = time.perf_counter()
+    state["queue"].put((fn, args, kwargs))
+    state["submit_wait_s"] += time.perf_counter() - t0
+    state["jobs"] += 1
+
+
+def finish_writer(state):
+    """Wartet auf alle ausstehenden Schreibaufträge und gibt die Wartezeit zurück."""
+    t0 = time.perf_counter()
+    state["queue"].put(_DONE)
+    state["thread"].join()
+    state["drain_wait_s"] = time.perf_counter() - t0
+    if state["errors"]:
+        raise state["errors"][0]
+    return state["drain_wait_s"]
+
+
+def peak_rss_mb():
+    """Höchster Arbeitsspeicher (RSS) des Prozesses bisher in MB (None ohne resource-Modul)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024  # macOS: Bytes, Linux: KB
+
+
+def report(read_stats, writer):
+    """Gibt aus, wie viel I/O-Zeit hinter der Berechnung versteckt wurde (plus Peak-RSS)."""
+    read_s, read_wait = read_stats.get("read_s", 0.0), read_stats.get("read_wait_s", 0.0)
+    write_s = writer["write_s"]
+    write_wait = writer["submit_wait_s"] + writer.get("drain_wait_s", 0.0)
+    hidden = max(read_s - read_wait, 0.0) + max(write_s - write_wait, 0.0)
+    total = read_s + write_s
+    pct = 100 * hidden / total if total else 0.0
+    print(f"  🔀 I/O: Lesen {read_s:.1f}s (gewartet {read_wait:.1f}s), "
+          f"Schreiben {write_s:.1f}s in {writer['jobs']} Aufträgen (gewartet {write_wait:.1f}s) "
+          f"→ {hidden:.1f}s ({pct:.0f} %) versteckt")
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"  🧠 Peak-RSS: {peak:.0f} MB")
+    return {"read_s": read_s, "read_wait_s": read_wait, "write_s": write_s,
+            "write_wait_s": write_wait, "hidden_s": hidden, "peak_rss_mb": peak}
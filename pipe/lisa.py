@@ -0,0 +1,234 @@
+# ============================================================
+# 🧭 lisa.py
+# Version: 2025-10 | Lokaler Moran/Geary auf dem Gitter, Pseudo-p-Werte & Clusterkarten vektorisiert
+# ============================================================
+
+import numpy as np
+from scipy.stats import norm
+
+# Clustercodes wie esda (Moran_Local.q); 0 = nicht signifikant
+QUADRANTS = {1: "HH", 2: "LH", 3: "LL", 4: "HL"}
+_BYTES_PER_DRAW = 24  # int64-Index + float64-Wert + Zwischenergebnis je Ziehung
+
+
+# ------------------------------------------------------------
+# Hilfsfunktionen
+# ------------------------------------------------------------
+
+def grid_lag(z):
+    """
+    Räumlicher Lag auf dem Gitter mit Rook-Nachbarschaft und Zeilenstandardisierung
+    (entspricht lat2W(*z.shape) mit w.transform = "r"). Gibt (lag, Nachbaranzahl) zurück.
+    """
+    total = np.zeros_like(z)
+    card = np.zeros(z.shape, dtype=np.int64)
+    total[1:, :] += z[:-1, :]
+    total[:-1, :] += z[1:, :]
+    total[:, 1:] += z[:, :-1]
+    total[:, :-1] += z[:, 1:]
+    card[1:, :] += 1
+    card[:-1, :] += 1
+    card[:, 1:] += 1
+    card[:, :-1] += 1
+    return total / np.maximum(card, 1), card
+
+
+def local_moran(sub):
+    """
+    Lokaler Moran auf einem (Downsample-)Gitter wie esda.Moran_Local:
+    z = (y - Mittel) / Std, Is = (n - 1) · z · lag / Σz². Gibt (Is, z, lag, card) zurück.
+    """
+    y = sub.astype("float64")
+    z = y - y.mean()
+    std = z.std()
+    if std > 0:
+        z /= std
+    lag, card = grid_lag(z)
+    den = (z * z).sum()
+    scale = (z.size - 1) / den if den > 0 else 0.0
+    return scale * z * lag, z, lag, card
+
+
+def local_geary(z, card):
+    """
+    Lokaler Geary wie esda.Geary_Local.localG (Rook, zeilenstandardisiert):
+    c_i = Σ_j (z_i - z_j)² / k_i – ohne Gewichtsobjekt und ohne Permutationen.
+    """
+    total = np.zeros_like(z)
+    d = (z[1:, :] - z[:-1, :]) ** 2
+    total[1:, :] += d
+    total[:-1, :] += d
+    d = (z[:, 1:] - z[:, :-1]) ** 2
+    total[:, 1:] += d
+    total[:, :-1] += d
+    return total / np.maximum(card, 1)
+
+
+def downsample_grid(arr, downsample):
+    """Downsample-Gitter arr[::ds, ::ds] als float64, NaN → 0 (wie im Vollraster-Lauf)."""
+    sub = arr[::downsample, ::downsample].astype("float64")
+    sub[np.isnan(sub)] = 0
+    return sub
+
+
+def upsample(grid, downsample, shape):
+    """
+    Zellwerte auf Vollauflösung (entspricht np.repeat über beide Achsen + Zuschnitt),
+    aber mit genau einer float32-Allokation in Zielgröße.
+    """
+    rows = np.arange(shape[0]) // downsample
+    cols = np.arange(shape[1]) // downsample
+    return grid.astype("float32", copy=False)[rows[:, None], cols[None, :]]
+
+
+def moran_geary(arr, downsample=5):
+    """
+    Lokaler Moran (Is) und Geary (localG) auf dem Downsample-Gitter als
+    float32-Gitter in Zellauflösung – beide aus derselben z-Standardisierung.
+    """
+    Is, z, _, card = local_moran(downsample_grid(arr, downsample))
+    return Is.astype("float32"), local_geary(z, card).astype("float32")
+
+
+def quadrants(z, lag):
+    """Quadrant je Zelle: 1 HH, 2 LH, 3 LL, 4 HL (Wert vs. Nachbarschaftsmittel)."""
+    zp, lp = z > 0, lag > 0
+    q = np.full(z.shape, 3, dtype=np.int8)
+    q[zp & lp] = 1
+    q[~zp & lp] = 2
+    q[zp & ~lp] = 4
+    return q
+
+
+def _draw_neighbours(rng, n_other, permutations, k):
+    """Gemeinsame Ziehungsmatrix (permutations × k), je Zeile ohne Zurücklegen aus n_other Werten."""
+    draws = rng.integers(0, n_other, size=(permutations, k))
+    while True:
+        s = np.sort(draws, axis=1)
+        dup = (s[:, 1:] == s[:, :-1]).any(axis=1)
+        if not dup.any():
+            return draws
+        draws[dup] = rng.integers(0, n_other, size=(int(dup.sum()), k))
+
+
+# ------------------------------------------------------------
+# Signifikanz
+# ------------------------------------------------------------
+
+def permutation_pvalues(z, card, Is, permutations=999, seed=12345, max_memory_mb=512):
+    """
+    Pseudo-p-Werte per bedingter Permutation (wie esda, gefaltet/einseitig):
+    für jede Zelle werden ihre k Nachbarn durch k zufällige andere Zellen
+    ersetzt. Eine geseedete Ziehungsmatrix wird von allen Zellen geteilt und
+    für Zelle i um i herum verschoben – dadurch ist alles ein Array-Gather,
+    chunkweise so, dass höchstens max_memory_mb gleichzeitig belegt sind.
+    Das Ergebnis hängt nicht von der Chunkgröße ab.
+    """
+    zf, cf, If = z.ravel(), card.ravel(), Is.ravel()
+    n = zf.size
+    den = (zf * zf).sum()
+    scale = (n - 1) / den if den > 0 else 0.0
+    kmax = int(cf.max())
+    if n < 3 or n - 1 < kmax or den <= 0:  # zu kleines Gitter / konstante Szene: nichts signifikant
+        return np.ones(z.shape)
+
+    rng = np.random.default_rng(seed)
+    draws = _draw_neighbours(rng, n - 1, permutations, kmax)
+    budget = max_memory_mb * 1024 ** 2
+    p = np.empty(n)
+
+    p[cf == 0] = 1.0  # Zellen ohne Nachbarn
+    for k in np.unique(cf[cf > 0]):
+        cells = np.flatnonzero(cf == k)
+        d = draws[:, :k]
+        chunk = max(1, int(budget // (permutations * k * _BYTES_PER_DRAW)))
+        for start in range(0, cells.size, chunk):
+            idx = cells[start:start + chunk]
+            ids = d[None, :, :] + (d[None, :, :] >= idx[:, None, None])  # Zelle i selbst überspringen
+            lag_perm = zf[ids].sum(axis=2) / k
+            rlis = (scale * zf[idx])[:, None] * lag_perm
+            larger = (rlis >= If[idx, None]).sum(axis=1)
+            low = (permutations - larger) < larger
+            larger[low] = permutations - larger[low]
+            p[idx] = (larger + 1.0) / (permutations + 1.0)
+    return p.reshape(z.shape)
+
+
+def analytic_pvalues(z, card, Is):
+    """
+    p-Werte aus dem analytischen z-Wert unter Randomisierung (Anselin 1995)
+    für zeilenstandardisierte Gewichte – kein Sampling, O(n).
+    Ohne Varianz (n < 3, konstante Szene) bzw. für Zellen ohne Nachbarn ist p = 1.
+    """
+    n = z.size
+    m2 = (z * z).sum() / n
+    if n < 3 or m2 <= 0:
+        return np.ones(z.shape)
+    b2 = (z ** 4).sum() / n / m2 ** 2
+    k = np.maximum(card, 1).astype("float64")
+    w2 = 1.0 / k              # Σ_j w_ij²
+    wkh = 1.0 - 1.0 / k       # Σ_{k≠h} w_ik w_ih
+    e_i = -1.0 / (n - 1)
+    var_i = w2 * (n - b2) / (n - 1) + wkh * (2 * b2 - n) / ((n - 1) * (n - 2)) - 1.0 / (n - 1) ** 2
+    I_anselin = Is * n / (n - 1)  # Is nutzt (n - 1)/Σz² statt 1/m2
+    zs = (I_anselin - e_i) / np.sqrt(np.maximum(var_i, 1e-12))
+    p = norm.sf(np.abs(zs))
+    p[card == 0] = 1.0
+    return p
+
+
+def cluster_map(q, p, alpha=0.05):
+    """Clusterkategorie je Zelle: Quadrant, falls p ≤ alpha, sonst 0."""
+    return np.where(p <= alpha, q, 0).astype(np.int8)
+
+
+# ------------------------------------------------------------
+# Hauptfunktion
+# ------------------------------------------------------------
+
+def lisa_rasters(
+    arr,
+    downsample=5,
+    mode="permutation",
+    permutations=999,
+    seed=12345,
+    alpha=0.05,
+    max_memory_mb=512,
+    coarse=False,
+):
+    """
+    Lokaler Moran samt Signifikanz für eine ganze Szene auf demselben
+    Downsample-Gitter wie moran_geary (arr[::ds, ::ds], NaN → 0), zurück auf
+    volle Auflösung vergrößert – oder mit coarse=True in Zellauflösung belassen.
+
+    Args:
+        arr (ndarray): Basisraster (NaN = nodata).
+        downsample (int): Reduktionsfaktor.
+        mode (str): "permutation" (Pseudo-p) oder "analytic" (z-Wert, schnell).
+        permutations (int): Anzahl Permutationen.
+        seed (int): Seed der Ziehungsmatrix (reproduzierbar).
+        alpha (float): Signifikanzniveau der Clusterkarte.
+        max_memory_mb (int): Speicherobergrenze der Permutationsblöcke.
+        coarse (bool): Ergebnis in Zellauflösung (raster_io.coarse_profile).
+
+    Returns:
+        {"MORAN": Is, "MORANP": p, "LISA": Clustercode 0–4} als float32,
+        NaN dort, wo arr (bzw. der Stützpunkt der Zelle) NaN ist.
+    """
+    Is, z, lag, card = local_moran(downsample_grid(arr, downsample))
+
+    if mode == "analytic":
+        p = analytic_pvalues(z, card, Is)
+    elif mode == "permutation":
+        p = permutation_pvalues(z, card, Is, permutations=permutations, seed=seed, max_memory_mb=max_memory_mb)
+    else:
+        raise ValueError(f"❌ Unbekannter LISA-Modus: {mode}")
+    clusters = cluster_map(quadrants(z, lag), p, alpha)
+
+    nodata = np.isnan(arr[::downsample, ::downsample] if coarse else arr)
+    out = {}
+    for name, grid in (("MORAN", Is), ("MORANP", p), ("LISA", clusters)):
+        grid = grid.astype("float32") if coarse else upsample(grid, downsample, arr.shape)
+        grid[nodata] = np.nan
+        out[name] = grid
+    return out
@@ -0,0 +1,245 @@
+# ============================================================
+# 🛰️ local_composite.py
+# Version: 2025-10 | Offline-Monatskomposite (NDVI/NDWI) aus lokalen Sentinel-2-L2A-Bändern
+# ============================================================
+
+import os
+import re
+import sys
+import math
+import warnings
+from datetime import date
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform_bounds
+from rasterio.windows import Window
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pipe import raster_io, raster_inventory, region_tiles
+
+# Gleiche Logik wie export_indices (mask_scl / compute_index / CLOUDY_PIXEL_PERCENTAGE)
+SCL_KEEP = (4, 5, 6)             # Vegetation, Boden, Wasser
+SCL_CLOUD = (8, 9, 10)           # Wolken mittel/hoch, Zirren
+INDEX_BANDS = {"NDVI": ("B8", "B4"), "NDWI": ("B3", "B8")}  # normalizedDifference([a, b])
+HARMONIZE_FROM = date(2022, 1, 25)  # Baseline 04.00: +1000 DN (S2_SR_HARMONIZED zieht ab)
+BOA_OFFSET = 1000
+M_PER_DEG = 111319.49079327357   # GEE: scale (m) → Grad in EPSG:4326
+_CLOUD_PREVIEW = 1024            # max. Kantenlänge der SCL-Vorschau für den Wolkenanteil
+
+_BAND_RE = re.compile(r"(?<![A-Za-z0-9])(B0?3|B0?4|B0?8|SCL)(?![A-Za-z0-9])", re.IGNORECASE)
+_RES_RE = re.compile(r"[_\-.]?\d{2}m(?![A-Za-z0-9])")
+_DATE_RE = re.compile(r"(20\d{2})(\d{2})(\d{2})")
+_EXTENSIONS = (".tif", ".tiff", ".jp2")
+
+
+# ------------------------------------------------------------
+# Szenen finden
+# ------------------------------------------------------------
+
+def composite_options(cfg):
+    """local_composite mit Defaults."""
+    opts = {
+        "source_dir": os.path.join(cfg["paths"]["base_data_dir"], "S2_L2A"),
+        "block_size": 512,
+        "harmonize": True,
+        "overwrite": False,
+    }
+    opts.update(cfg.get("local_composite", {}) or {})
+    return opts
+
+
+def _band_name(token):
+    """B03/B3 → B3, B04 → B4, B08 → B8, scl → SCL."""
+    token = token.upper()
+    return token if token == "SCL" else "B" + str(int(token[1:]))
+
+
+def scan_scenes(source_dir):
+    """
+    Sucht Bänder B3/B4/B8/SCL (GeoTIFF/JP2, auch in Unterordnern wie .SAFE/R10m,
+    R20m) und gruppiert sie je Szene. Szenenschlüssel = Dateiname ohne Band- und
+    Auflösungskennung, das Datum stammt aus dem ersten YYYYMMDD im Namen.
+    Gibt {Schlüssel: {"date", "bands": {Band: Pfad}}} zurück.
+    """
+    scenes = {}
+    for root, _, files in os.walk(source_dir):
+        for fname in sorted(files):
+            stem, ext = os.path.splitext(fname)
+            if ext.lower() not in _EXTENSIONS:
+                continue
+            band = _BAND_RE.search(stem)
+            when = _DATE_RE.search(stem)
+            if not band or not when:
+                continue
+            key = _RES_RE.sub("", _BAND_RE.sub("", stem, count=1)).strip("_-.")
+            scene = scenes.setdefault(key, {"date": date(*map(int, when.groups())), "bands": {}})
+            scene["bands"][_band_name(band.group(1))] = os.path.join(root, fname)
+    return scenes
+
+
+def cloud_percentage(scene):
+    """
+    Wolkenanteil in % wie CLOUDY_PIXEL_PERCENTAGE: aus den Datei-Tags, sonst
+    aus einer verkleinerten SCL-Vorschau (Klassen 8/9/10 an allen gültigen Pixeln).
+    """
+    for path in scene["bands"].values():
+        with rasterio.open(path) as src:
+            tag = src.tags().get("CLOUDY_PIXEL_PERCENTAGE")
+        if tag is not None:
+            return float(tag)
+    with rasterio.open(scene["bands"]["SCL"]) as src:
+        f = max(1, math.ceil(max(src.height, src.width) / _CLOUD_PREVIEW))
+        scl = src.read(1, out_shape=(math.ceil(src.height / f), math.ceil(src.width / f)),
+                       resampling=Resampling.nearest)
+    valid = scl > 0
+    return 100.0 * np.isin(scl[valid], SCL_CLOUD).sum() / max(int(valid.sum()), 1)
+
+
+def scenes_for_month(scenes, index, year, month, bbox, cloud_filter):
+    """
+    Szenen eines Monats (filterDate), mit allen nötigen Bändern, die bbox
+    schneiden (filterBounds) und unter dem Wolkenfilter liegen.
+    """
+    needed = set(INDEX_BANDS[index]) | {"SCL"}
+    out = []
+    for key, scene in sorted(scenes.items()):
+        if (scene["date"].year, scene["date"].month) != (year, month) or not needed <= set(scene["bands"]):
+            continue
+        with rasterio.open(scene["bands"]["SCL"]) as src:
+            x0, y0, x1, y1 = transform_bounds(src.crs, "EPSG:4326", *src.bounds)
+        if x1 <= bbox[0] or x0 >= bbox[2] or y1 <= bbox[1] or y0 >= bbox[3]:
+            continue
+        if "cloud_pct" not in scene:
+            scene["cloud_pct"] = cloud_percentage(scene)
+        if scene["cloud_pct"] < cloud_filter:
+            out.append(scene)
+    return out
+
+
+# ------------------------------------------------------------
+# Komposit
+# ------------------------------------------------------------
+
+def target_grid(bbox, scale_m):
+    """EPSG:4326-Zielgitter über bbox mit GEE-Pixelgröße scale/111319.49 m → Profil."""
+    res = scale_m / M_PER_DEG
+    width = max(1, math.ceil((bbox[2] - bbox[0]) / res - 1e-9))
+    height = max(1, math.ceil((bbox[3] - bbox[1]) / res - 1e-9))
+    return {
+        "driver": "GTiff", "dtype": "float32", "count": 1, "nodata": np.nan,
+        "crs": "EPSG:4326", "transform": from_origin(bbox[0], bbox[3], res, res),
+        "width": width, "height": height,
+    }
+
+
+def masked_index(bands, scl, index, offset=0.0):
+    """
+    Index einer Szene im Fenster: SCL-Maske (4/5/6) wie mask_scl, dann
+    (a − b) / (a + b) wie normalizedDifference; DN 0 und a + b = 0 → NaN.
+    """
+    a_name, b_name = INDEX_BANDS[index]
+    a = bands[a_name].astype(np.float32)
+    b = bands[b_name].astype(np.float32)
+    invalid = (a == 0) | (b == 0) | ~np.isin(scl, SCL_KEEP)
+    if offset:
+        a = np.maximum(a - offset, 0)
+        b = np.maximum(b - offset, 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        nd = (a - b) / (a + b)
+    nd[invalid | ~np.isfinite(nd)] = np.nan
+    return nd
+
+
+def composite_month(scenes, index, profile, out_path, block_size=512, harmonize=True):
+    """
+    NaN-bewusster Median aller Szenen, kachelweise (block_size²) über das
+    Zielgitter: je Fenster werden nur die Szenenausschnitte auf das Gitter
+    gewarpt (nearest) – Speicher ≈ Szenen × block_size² × 4 Byte.
+    """
+    grid = {"crs": profile["crs"], "transform": profile["transform"],
+            "width": profile["width"], "height": profile["height"], "resampling": Resampling.nearest}
+    needed = list(INDEX_BANDS[index]) + ["SCL"]
+    handles = []
+    try:
+        for scene in scenes:
+            srcs = {b: rasterio.open(scene["bands"][b]) for b in needed}
+            vrts = {b: WarpedVRT(src, **grid) for b, src in srcs.items()}
+            offset = BOA_OFFSET if harmonize and scene["date"] >= HARMONIZE_FROM else 0.0
+            handles.append((srcs, vrts, offset))
+
+        writer = raster_io.open_band_writer(out_path, profile, [index])
+        for y in range(0, profile["height"], block_size):
+            for x in range(0, profile["width"], block_size):
+                win = Window(x, y, min(block_size, profile["width"] - x), min(block_size, profile["height"] - y))
+                layers = np.full((len(handles), int(win.height), int(win.width)), np.nan, dtype=np.float32)
+                for k, (_, vrts, offset) in enumerate(handles):
+                    bands = {b: vrts[b].read(1, window=win) for b in INDEX_BANDS[index]}
+                    layers[k] = masked_index(bands, vrts["SCL"].read(1, window=win), index, offset)
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", RuntimeWarning)  # Pixel ohne gültige Szene → NaN
+                    median = np.nanmedian(layers, axis=0)
+                raster_io.write_window(writer, 1, median, win)
+        return raster_io.close_band_writer(writer)
+    finally:
+        for srcs, vrts, _ in handles:
+            for h in list(vrts.values()) + list(srcs.values()):
+                h.close()
+
+
+# ------------------------------------------------------------
+# Stufe
+# ------------------------------------------------------------
+
+def build_local_composites(cfg, source_dir=None, indices=("NDVI", "NDWI"), years=None, months=None, tiles=None):
+    """
+    Erzeugt Monatsraster wie der GEE-Export, aber lokal und offline: je
+    (Kachel, Index, Jahr, Monat) ein NaN-Median über alle passenden Szenen in
+    source_dir (local_composite.source_dir). Dateinamen/Ordner entsprechen dem
+    Export (z. B. NDVI_BerlinBB_2023_07.tif bzw. Kachelordner), die Raster
+    werden mit source="local_composite" im Inventar eingetragen.
+    """
+    opts = composite_options(cfg)
+    source_dir = source_dir or opts["source_dir"]
+    years = years or cfg["export"]["years"]
+    months = months or cfg["export"]["months"]
+    cloud_filter = float(cfg["gee"].get("cloud_filter", 30))
+    scale = float(cfg["gee"].get("scale", 10))
+    inv_path = cfg["paths"].get("raster_inventory")
+
+    scenes = scan_scenes(source_dir)
+    print(f"🛰️ {len(scenes)} Sentinel-2-Szenen in {source_dir}")
+    grid = [t for t in region_tiles.tile_grid(cfg) if tiles is None or t["id"] in tiles]
+
+    written = []
+    for tile in grid:
+        profile = target_grid(tile["export_bbox"], scale)
+        for index in indices:
+            local_dir = cfg["paths"][f"{index.lower()}_dir"]
+            folder = region_tiles.tile_dir(cfg, local_dir, tile["id"])
+            for year in years:
+                for month in months:
+                    name = region_tiles.raster_name(index, tile["id"], int(year), int(month))
+                    out_path = os.path.join(folder, f"{name}.tif")
+                    if os.path.exists(out_path) and not opts["overwrite"]:
+                        print(f"⏭️ {name} vorhanden")
+                        continue
+                    selected = scenes_for_month(scenes, index, int(year), int(month), tile["export_bbox"], cloud_filter)
+                    if not selected:
+                        print(f"⚠️ {name}: keine Szene (Bänder/Wolkenfilter < {cloud_filter:.0f} %)")
+                        continue
+                    composite_month(selected, index, profile, out_path, opts["block_size"], opts["harmonize"])
+                    if inv_path:
+                        raster_inventory.register_raster(
+                            inv_path, index, int(year), int(month), out_path,
+                            source="local_composite", tile=tile["id"],
+                        )
+                    written.append(out_path)
+                    print(f"✅ {name}: Median aus {len(selected)} Szenen ({profile['width']}×{profile['height']} px)")
+
+    print(f"\n🏁 {len(written)} Monatskomposite geschrieben.")
+    return written
@@ -0,0 +1,301 @@
+# ============================================================
+# 📦 occurrence_dump.py
+# Version: 2025-10 | Streaming-Import großer Fundpunkt-Dumps (iNat-CSV, GBIF DwC-A)
+# ============================================================
+
+import os
+import csv
+import sys
+import gzip
+import shutil
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pipe import inat_loader
+
+RESULT_COLUMNS = inat_loader.RESULT_COLUMNS  # Ausgabeschema = parse_results
+
+# Feld → mögliche Spalten (erste vorhandene gewinnt): iNat-Export, GBIF-Simple-CSV, DwC-Terms
+FIELD_COLUMNS = {
+    "latitude": ["latitude", "decimalLatitude"],
+    "longitude": ["longitude", "decimalLongitude"],
+    "observed_on": ["observed_on", "eventDate"],
+    "taxon_id": ["taxon_id", "taxonKey", "taxonID"],
+    "name": ["scientific_name", "species", "scientificName"],
+    "accuracy": ["positional_accuracy", "public_positional_accuracy", "coordinateUncertaintyInMeters"],
+    "quality_grade": ["quality_grade"],
+    "user_login": ["user_login", "recordedBy"],
+    "place_guess": ["place_guess", "locality", "verbatimLocality"],
+}
+# ID-Spalten des Taxonfilters je Namensraum: iNat-Taxon-IDs (Taxon-Feld "id") nur gegen
+# iNat-Spalten, GBIF-Keys ("gbif_id", inkl. Unterart → Art, Synonym → akzeptiertes Taxon)
+# nur gegen GBIF-Spalten – gleiche Zahlen bezeichnen dort andere Taxa
+ID_COLUMNS = {
+    "id": ["taxon_id"],
+    "gbif_id": ["taxonKey", "speciesKey", "acceptedTaxonKey"],
+}
+
+
+# ------------------------------------------------------------
+# Quelle öffnen
+# ------------------------------------------------------------
+
+def dump_options(cfg):
+    """inat.dump mit Defaults."""
+    opts = {"path": None, "chunksize": 200_000}
+    opts.update(cfg["inat"].get("dump", {}) or {})
+    return opts
+
+
+def _read_meta(text):
+    """
+    meta.xml eines Darwin-Core-Archivs → Lesevorgaben der Core-Datei
+    (Datei, Trennzeichen, Kodierung, Kopfzeilen, Spaltennamen aus den Terms).
+    """
+    root = ET.fromstring(text)
+    core = next(el for el in root if el.tag.endswith("core"))
+    attr = lambda k, d: core.get(k, d).encode().decode("unicode_escape")
+    fields = {int(f.get("index")): f.get("term").rstrip("/").rsplit("/", 1)[-1]
+              for f in core if f.tag.endswith("field") and f.get("index") is not None}
+    names = [fields.get(i, f"_col{i}") for i in range(max(fields) + 1)]
+    location = next(el.text.strip() for el in core.iter() if el.tag.endswith("location"))
+    quote = attr("fieldsEnclosedBy", '"')
+    return {
+        "location": location,
+        "names": names,
+        "kw": {
+            "sep": attr("fieldsTerminatedBy", ","),
+            "encoding": core.get("encoding", "UTF-8"),
+            "skiprows": int(core.get("ignoreHeaderLines", "0")),
+            "header": None,
+            "names": names,
+            "quoting": csv.QUOTE_MINIMAL if quote else csv.QUOTE_NONE,
+            **({"quotechar": quote} if quote else {}),
+        },
+    }
+
+
+def _sniff_header(line):
+    """Kopfzeile einer CSV/TSV → (Trennzeichen, Spaltennamen)."""
+    line = line.rstrip("\r\n")
+    sep = "\t" if "\t" in line else csv.Sniffer().sniff(line, delimiters=",;|").delimiter
+    return sep, next(csv.reader([line], delimiter=sep))
+
+
+def open_dump(path):
+    """
+    Erkennt das Format und liefert die Lesevorgaben:
+    {"open": () → Pfad/Dateiobjekt, "names": Spalten, "kw": read_csv-Argumente}.
+    DwC-A: .zip mit meta.xml oder entpackter Ordner; ZIP ohne meta.xml (GBIF
+    Simple-CSV): größte Datei darin. Sonst CSV/TSV (auch .gz). ZIP-Inhalte
+    werden direkt gestreamt, nicht entpackt.
+    """
+    if os.path.isdir(path):
+        with open(os.path.join(path, "meta.xml"), encoding="utf-8") as f:
+            meta = _read_meta(f.read())
+        core = os.path.join(path, meta["location"])
+        return {"open": lambda: core, "names": meta["names"], "kw": meta["kw"]}
+
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            if "meta.xml" in zf.namelist():
+                meta = _read_meta(zf.read("meta.xml"))
+                member, names, kw = meta["location"], meta["names"], meta["kw"]
+            else:
+                member = max(zf.infolist(), key=lambda i: i.file_size).filename
+                with zf.open(member) as f:
+                    sep, names = _sniff_header(f.readline().decode("utf-8-sig"))
+                kw = {"sep": sep, "quoting": csv.QUOTE_NONE if sep == "\t" else csv.QUOTE_MINIMAL}
+
+        def _open():
+            with zipfile.ZipFile(path) as zf:  # Datei bleibt offen, bis der Member geschlossen wird
+                return zf.open(member)
+        return {"open": _open, "names": names, "kw": kw}
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8-sig") as f:
+        sep, names = _sniff_header(f.readline())
+    return {"open": lambda: path, "names": names, "kw": {"sep": sep}}
+
+
+def resolve_columns(names):
+    """Feld → vorhandene Quellspalte (oder None); nur diese werden gelesen."""
+    present = set(names)
+    cols = {field: next((c for c in options if c in present), None) for field, options in FIELD_COLUMNS.items()}
+    missing = [f for f in ("latitude", "longitude", "observed_on") if cols[f] is None]
+    if missing:
+        raise ValueError(f"❌ Dump ohne Pflichtspalten für {missing} – Spalten: {names[:20]}")
+    cols["ids"] = {key: [c for c in options if c in present] for key, options in ID_COLUMNS.items()}
+    return cols
+
+
+# ------------------------------------------------------------
+# Filter (je Block, vektorisiert)
+# ------------------------------------------------------------
+
+def _taxon_labels(chunk, cols, taxa):
+    """
+    Artname je Zeile für die gesuchten Taxa (sonst NaN). Treffer über die ID
+    des passenden Namensraums (id → iNat-Spalten, gbif_id → GBIF-Keys) oder
+    über den wissenschaftlichen Namen (ganze Wörter, Autor/Unterart dürfen folgen).
+    """
+    labels = pd.Series(np.nan, index=chunk.index, dtype=object)
+    names = chunk[cols["name"]].fillna("").str.lower() if cols["name"] else None
+    for taxon in taxa:
+        hit = pd.Series(False, index=chunk.index)
+        for key, id_cols in cols["ids"].items():
+            if taxon.get(key) is not None:
+                for c in id_cols:
+                    hit |= chunk[c] == str(taxon[key])
+        if names is not None and taxon.get("name"):
+            name = taxon["name"].replace("_", " ").lower()
+            hit |= (names == name) | names.str.startswith(name + " ")
+        labels[hit & labels.isna()] = taxon.get("name") or str(taxon.get("id") or taxon.get("gbif_id"))
+    return labels
+
+
+def filter_chunk(chunk, cols, bbox=None, start=None, end=None, taxa=None, max_accuracy=None, quality_grade=None):
+    """
+    Wendet bbox, Zeitraum (observed_on, ISO-Datum), Taxa, max_accuracy (m; ohne
+    Angabe → behalten) und quality_grade auf einen Block an und gibt ihn im
+    Schema von parse_results zurück.
+    """
+    lat = pd.to_numeric(chunk[cols["latitude"]], errors="coerce")
+    lon = pd.to_numeric(chunk[cols["longitude"]], errors="coerce")
+    keep = lat.notna() & lon.notna()
+    if bbox is not None:
+        keep &= (lon >= bbox[0]) & (lat >= bbox[1]) & (lon <= bbox[2]) & (lat <= bbox[3])
+
+    date = chunk[cols["observed_on"]].fillna("").str.slice(0, 10)
+    if start:
+        keep &= date >= str(start)
+    if end:
+        keep &= (date <= str(end)) & (date != "")
+    if max_accuracy is not None and cols["accuracy"]:
+        acc = pd.to_numeric(chunk[cols["accuracy"]], errors="coerce")
+        keep &= ~(acc > float(max_accuracy))
+    if quality_grade and cols["quality_grade"]:
+        keep &= chunk[cols["quality_grade"]] == quality_grade
+
+    if taxa:
+        labels = _taxon_labels(chunk[keep], cols, taxa)
+        keep[keep] = labels.notna()
+        species = labels[labels.notna()]
+    else:
+        species = chunk.loc[keep, cols["name"]] if cols["name"] else np.nan
+
+    column = lambda field: chunk.loc[keep, cols[field]] if cols[field] else None
+    return pd.DataFrame({
+        "species": species,
+        "taxon_id": pd.to_numeric(column("taxon_id"), errors="coerce") if cols["taxon_id"] else None,
+        "latitude": lat[keep],
+        "longitude": lon[keep],
+        "observed_on": date[keep],
+        "quality_grade": column("quality_grade"),
+        "user_login": column("user_login"),
+        "place_guess": column("place_guess"),
+    }, columns=RESULT_COLUMNS).reset_index(drop=True)
+
+
+# ------------------------------------------------------------
+# Streaming
+# ------------------------------------------------------------
+
+def stream_occurrences(path, bbox=None, start=None, end=None, taxa=None, max_accuracy=None,
+                       quality_grade=None, chunksize=200_000):
+    """
+    Liest einen Dump blockweise (chunksize Zeilen, nur benötigte Spalten, alles
+    als Text) und liefert je Block die gefilterten Beobachtungen im Schema von
+    parse_results. Speicher ≈ ein Block, unabhängig von der Dumpgröße.
+    taxa: [{"id", "name", "gbif_id"?}, …] – species erhält den angegebenen Namen.
+    """
+    spec = open_dump(path)
+    cols = resolve_columns(spec["names"])
+    id_cols = {c for options in cols["ids"].values() for c in options}
+    usecols = sorted({c for c in cols.values() if isinstance(c, str)} | id_cols)
+    source = spec["open"]()
+    stats = {"read": 0, "kept": 0}
+    try:
+        reader = pd.read_csv(
+            source, usecols=usecols, dtype=str, chunksize=chunksize,
+            keep_default_na=False, na_values=[""], on_bad_lines="skip", **spec["kw"],
+        )
+        with reader:
+            for chunk in tqdm(reader, desc=f"📦 {os.path.basename(path)}", unit=" Block"):
+                out = filter_chunk(chunk, cols, bbox, start, end, taxa, max_accuracy, quality_grade)
+                stats["read"] += len(chunk)
+                stats["kept"] += len(out)
+                if len(out):
+                    yield out
+    finally:
+        if hasattr(source, "close"):
+            source.close()
+        print(f"✅ {stats['kept']} von {stats['read']} Zeilen übernommen.")
+
+
+def load_occurrences(path, **filters):
+    """stream_occurrences als ein DataFrame (für gefilterte Ergebnisse, die in den Speicher passen)."""
+    parts = list(stream_occurrences(path, **filters))
+    if not parts:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+
+def run_dump_ingest(cfg, dump_path=None, taxa=None, period=None, bbox=None):
+    """
+    Gegenstück zu inat_loader.run_inat_fetch für Offline-Dumps: filtert den Dump
+    in einem Durchgang nach allen Taxa und schreibt – blockweise angehängt –
+    inaturalist_<Art>.csv je Taxon und inaturalist_combined.csv in output_dir.
+    Taxa/Zeitraum/BBox: inat_loader.species_from_config (ohne inat.species.period
+    kein Datumsfilter).
+    """
+    opts = dump_options(cfg)
+    dump_path = dump_path or opts["path"]
+    if not dump_path or not os.path.exists(dump_path):
+        raise FileNotFoundError(f"❌ Dump {dump_path} fehlt – inat.dump.path setzen!")
+
+    inat = cfg["inat"]
+    selection = inat_loader.species_from_config(cfg, years_as_period=False)
+    taxa = taxa or selection["taxa"]
+    period = period or selection["period"]
+    bbox = bbox or selection["bbox"]
+
+    base_dir = cfg["paths"]["output_dir"]
+    os.makedirs(base_dir, exist_ok=True)
+    print(f"📅 Zeitraum: {period.get('start', '–')} → {period.get('end', '–')}")
+    print(f"🗺️ BBox: {bbox}")
+
+    outputs = {t["name"]: os.path.join(base_dir, f"inaturalist_{t['name'].replace(' ', '_')}.csv") for t in taxa}
+    counts = dict.fromkeys(outputs, 0)
+    for path in outputs.values():
+        pd.DataFrame(columns=RESULT_COLUMNS).to_csv(path, index=False)
+
+    for part in stream_occurrences(
+        dump_path, bbox=bbox, start=period.get("start"), end=period.get("end"), taxa=taxa,
+        max_accuracy=inat.get("max_accuracy"), quality_grade=inat.get("quality_grade"),
+        chunksize=opts["chunksize"],
+    ):
+        for name, group in part.groupby("species", sort=False):
+            group.to_csv(outputs[name], mode="a", header=False, index=False)
+            counts[name] += len(group)
+
+    for name, path in outputs.items():
+        print(f"💾 Gespeichert: {path} ({counts[name]} Zeilen)")
+
+    # --- Kombinierte Datei (Reihenfolge wie run_inat_fetch, ohne alles zu laden) ---
+    out_combined = os.path.join(base_dir, "inaturalist_combined.csv")
+    with open(out_combined, "w", encoding="utf-8") as dst:
+        for i, path in enumerate(outputs.values()):
+            with open(path, encoding="utf-8") as src:
+                header = src.readline()
+                if i == 0:
+                    dst.write(header)
+                shutil.copyfileobj(src, dst)
+    print(f"💾 Kombiniert gespeichert: {out_combined} ({sum(counts.values())} Zeilen)")
+    return out_combined
@@ -0,0 +1,190 @@
+# ============================================================
+# 🗺️ predict_suitability.py
+# Version: 2025-10 | Flächige Habitateignungskarte – kachelweise & parallel
+# ============================================================
+
+import os
+import sys
+import time
+import pickle
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pipe import raster_io, region_tiles
+from pipe.env_feature_extractor import FEATURE_COLUMNS, find_raster
+
+_WORKER = {}
+
+
+# ------------------------------------------------------------
+# Hilfsfunktionen
+# ------------------------------------------------------------
+
+def resolve_feature_sources(cfg, features, year, month, tile=None):
+    """
+    Ordnet jedem Feature (z. B. NDVI_STD) eine Quelle (Pfad, Band) zu –
+    Mehrband-Stack bevorzugt, sonst Einzeldatei wie im Punkt-Extraktor.
+    tile wählt bei Kachelung den Kachelordner.
+    """
+    sources = []
+    for name in features:
+        index = name.split("_")[0]
+        index_dir = cfg["paths"][f"{index.lower()}_dir"]
+        if tile:
+            index_dir = region_tiles.tile_dir(cfg, index_dir, tile)
+
+        stack = find_raster(index_dir, f"{index}_STACK", year, month)
+        if stack and name in raster_io.stack_bands(stack):
+            sources.append((stack, raster_io.stack_bands(stack).index(name) + 1))
+            continue
+
+        path = find_raster(index_dir, name, year, month)
+        if path is None:
+            raise FileNotFoundError(f"❌ Kein Raster für {name} {year}-{month:02d} in {index_dir}")
+        sources.append((path, 1))
+    return sources
+
+
+def make_tiles(height, width, tile_size):
+    """Fenster-Raster über das Referenzgitter (letzte Zeile/Spalte ggf. kleiner)."""
+    return [
+        Window(x, y, min(tile_size, width - x), min(tile_size, height - y))
+        for y in range(0, height, tile_size)
+        for x in range(0, width, tile_size)
+    ]
+
+
+def _init_worker(model, sources, ref):
+    """Pro Prozess: Modell einmal entpacken, Raster einmal öffnen (ggf. auf Referenzgitter warpen)."""
+    _WORKER["model"] = model
+    _WORKER["handles"] = []
+    for path, band in sources:
+        src = rasterio.open(path)
+        scale, offset = src.scales[band - 1], src.offsets[band - 1]
+        if (src.transform, src.width, src.height) != (ref["transform"], ref["width"], ref["height"]):
+            # z. B. grobe Moran/Geary-Raster → nearest auf das Vorhersagegitter
+            src = WarpedVRT(src, crs=ref["crs"], transform=ref["transform"],
+                            width=ref["width"], height=ref["height"], resampling=Resampling.nearest)
+        _WORKER["handles"].append((src, band, scale, offset))
+
+
+def _predict_tile(window, nan_policy):
+    """Baut den Pixel×Feature-Block eines Fensters und ruft predict_proba auf."""
+    h, w = int(window.height), int(window.width)
+    block = np.empty((h * w, len(_WORKER["handles"])), dtype=np.float32)
+    for j, (src, band, scale, offset) in enumerate(_WORKER["handles"]):
+        vals = src.read(band, window=window, masked=True).astype("float32").filled(np.nan)
+        block[:, j] = vals.ravel() * scale + offset
+
+    out = np.full(h * w, np.nan, dtype=np.float32)
+    valid = ~np.isnan(block).any(axis=1) if nan_policy == "skip" else ~np.isnan(block).all(axis=1)
+    if valid.any():
+        proba = _WORKER["model"].predict_proba(block[valid])
+        out[valid] = proba[:, 1] if proba.ndim == 2 else proba
+    return window, out.reshape(h, w)
+
+
+def load_model(model):
+    """Modellobjekt oder Pfad zu einer Pickle-Datei."""
+    if isinstance(model, (str, os.PathLike)):
+        with open(model, "rb") as f:
+            return pickle.load(f)
+    return model
+
+
+# ------------------------------------------------------------
+# Hauptfunktion
+# ------------------------------------------------------------
+
+def predict_suitability(
+    cfg,
+    model,
+    year,
+    month,
+    features=None,
+    out_path=None,
+    tile_size=None,
+    workers=None,
+    nan_policy="skip",
+    tile=None,
+):
+    """
+    Erzeugt eine flächige Habitateignungskarte für einen Monat.
+
+    Die passenden NDVI/NDWI- und Artefakt-Raster werden kachelweise gelesen,
+    je Kachel zu einem Block im Schema des Punkt-Extraktors (FEATURE_COLUMNS)
+    zusammengesetzt und in einem Prozesspool mit model.predict_proba bewertet.
+    Fertige Kacheln werden sofort in ein gekacheltes GeoTIFF geschrieben;
+    höchstens 2 × workers Kacheln sind gleichzeitig im Speicher.
+
+    Args:
+        cfg (dict): Konfiguration.
+        model: Objekt mit predict_proba oder Pfad zu einem Pickle.
+        year, month (int): Zeitpunkt der Umweltraster.
+        features (list): Spaltenreihenfolge (None → feature_names_in_ des
+            Modells oder FEATURE_COLUMNS).
+        out_path (str): Zieldatei (None → output_dir/suitability_YYYY_MM.tif).
+        tile_size (int): Kantenlänge der Kacheln in Pixeln.
+        workers (int): Anzahl Prozesse.
+        nan_policy (str): "skip" → Pixel mit NaN-Feature bleiben NaN,
+            "pass" → NaN an das Modell durchreichen (z. B. XGBoost).
+        tile (str): Kachel-ID bei export.tiling (eine Karte je Kachel).
+
+    Returns:
+        Pfad der Eignungskarte.
+    """
+    opts = cfg.get("prediction", {})
+    tile_size = tile_size or opts.get("tile_size", 512)
+    workers = workers or opts.get("workers") or os.cpu_count() or 1
+    model = load_model(model)
+    features = features or list(getattr(model, "feature_names_in_", FEATURE_COLUMNS))
+    name = f"suitability_{tile}_{year}_{month:02d}.tif" if tile else f"suitability_{year}_{month:02d}.tif"
+    out_path = out_path or os.path.join(cfg["paths"]["output_dir"], name)
+
+    sources = resolve_feature_sources(cfg, features, year, month, tile)
+    with rasterio.open(sources[0][0]) as ref_src:
+        ref = {"crs": ref_src.crs, "transform": ref_src.transform,
+               "width": ref_src.width, "height": ref_src.height}
+
+    tiles = make_tiles(ref["height"], ref["width"], tile_size)
+    print(f"🗺️ Vorhersage {year}-{month:02d}: {ref['width']}×{ref['height']} px, "
+          f"{len(tiles)} Kacheln à {tile_size}, {workers} Prozesse, {len(features)} Features")
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    meta = {
+        "driver": "GTiff", "dtype": "float32", "count": 1, "nodata": np.nan,
+        "crs": ref["crs"], "transform": ref["transform"],
+        "width": ref["width"], "height": ref["height"],
+        "tiled": True, "blockxsize": tile_size, "blockysize": tile_size,
+        "compress": "deflate", "predictor": 3, "BIGTIFF": "IF_SAFER",
+    }
+
+    t0 = time.time()
+    done = 0
+    with rasterio.open(out_path, "w", **meta) as dst, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(model, sources, ref)) as pool:
+        dst.set_band_description(1, "suitability")
+        pending = set()
+        for tile in tiles:
+            pending.add(pool.submit(_predict_tile, tile, nan_policy))
+            if len(pending) >= 2 * workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    window, values = fut.result()
+                    dst.write(values, 1, window=window)
+                    done += 1
+        for fut in pending:
+            window, values = fut.result()
+            dst.write(values, 1, window=window)
+            done += 1
+
+    print(f"✅ Eignungskarte gespeichert: {out_path} ({done} Kacheln, {time.time() - t0:.1f}s)")
+    return out_path
@@ -0,0 +1,76 @@
+# ============================================================
+# 📘 raster_inventory.py
+# Version: 2025-10 | Lokales Verzeichnis aller vorhandenen Monatsraster
+# ============================================================
+
+import os
+from datetime import datetime
+
+import pandas as pd
+
+INVENTORY_COLUMNS = ["index", "year", "month", "tile", "path", "source", "registered_at"]
+
+
+# ------------------------------------------------------------
+# Hilfsfunktionen
+# ------------------------------------------------------------
+
+def inventory_path(cfg):
+    """Pfad der Inventar-CSV (paths.raster_inventory oder base_data_dir)."""
+    path = cfg["paths"].get("raster_inventory")
+    if path:
+        return path
+    return os.path.join(cfg["paths"]["base_data_dir"], "raster_inventory.csv")
+
+
+def load_inventory(path):
+    """Lädt das Inventar – leerer DataFrame, falls noch keins existiert."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=INVENTORY_COLUMNS)
+    inv = pd.read_csv(path, dtype={"tile": str})
+    # Inventare von vor der Kachelung: eine Region ohne Kachel-ID
+    return inv.reindex(columns=INVENTORY_COLUMNS).fillna({"tile": ""})
+
+
+def _match(inv, index, year, month, tile):
+    hit = (inv["index"] == index) & (inv["year"] == int(year)) & (inv["month"] == int(month))
+    if tile is not None:
+        hit &= inv["tile"] == tile
+    return hit
+
+
+def register_raster(path, index, year, month, raster_path, source="local", tile=None):
+    """
+    Trägt ein Raster ins Inventar ein (ersetzt vorhandenen Eintrag
+    für dieselbe Kombination index/year/month/tile).
+    """
+    inv = load_inventory(path)
+    tile = tile or ""
+    keep = ~_match(inv, index, year, month, tile)
+    entry = pd.DataFrame([{
+        "index": index,
+        "year": int(year),
+        "month": int(month),
+        "tile": tile,
+        "path": raster_path,
+        "source": source,
+        "registered_at": datetime.now().isoformat(timespec="seconds"),
+    }])
+    inv = pd.concat([inv[keep], entry], ignore_index=True)
+    inv = inv.sort_values(["index", "year", "month", "tile"]).reset_index(drop=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    inv.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    return inv
+
+
+def lookup_raster(path, index, year, month, tile=None):
+    """Gibt den registrierten Rasterpfad zurück oder None (tile None → beliebige Kachel)."""
+    inv = load_inventory(path)
+    hit = inv[_match(inv, index, year, month, tile)]
+    if hit.empty:
+        return None
+    raster_path = hit.iloc[-1]["path"]
+    return raster_path if os.path.exists(raster_path) else None
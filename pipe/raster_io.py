@@ -0,0 +1,432 @@
+# ============================================================
+# 💾 raster_io.py
+# Version: 2025-10 | Gemeinsames Lesen/Schreiben von Rastern (GTiff, COG, int16)
+# ============================================================
+
+import os
+import sys
+import shutil
+import uuid
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from affine import Affine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.config import cfg
+from pipe import lisa
+
+# int16-Kodierung: wert = code * scale + offset (GDAL scale/offset-Metadaten)
+QUANTIZATION = {
+    "NDVI": (1e-4, 0.0),    # [-1, 1]
+    "NDWI": (1e-4, 0.0),    # [-1, 1]
+    "STD": (1e-4, 0.0),     # [0, ~1]
+    "MORAN": (1e-3, 0.0),   # lokale I, ca. [-32, 32]
+    "GEARY": (1e-3, 0.0),   # lokale c, ca. [0, 32]
+    "MORANP": (1e-4, 0.0),  # Pseudo-p-Wert [0, 1]
+    "LISA": (1.0, 0.0),     # Clustercode 0–4
+    "COUNT": (1.0, 0.0),    # Anzahl gültiger Jahre (Klimatologie)
+    "ANOM": (1e-4, 0.0),    # Abweichung vom Monatsmittel, ca. [-2, 2]
+    "ZSCORE": (1e-3, 0.0),  # Abweichung in Standardabweichungen
+}
+INT16_NODATA = -32768
+ARTEFACT_METRICS = ("STD", "MORAN", "GEARY", "MORANP", "LISA")
+CLIMATOLOGY_METRICS = ("COUNT", "ANOM", "ZSCORE")
+_ROW_CHUNK = 1024
+
+
+# ------------------------------------------------------------
+# Hilfsfunktionen
+# ------------------------------------------------------------
+
+def raster_options():
+    """Ausgabeoptionen aus cfg["outputs"]["raster"] mit Defaults."""
+    opts = {"format": "gtiff", "layout": "files", "blocksize": 512, "compress": "deflate", "quantize": False}
+    opts.update(cfg.get("outputs", {}).get("raster", {}) or {})
+    return opts
+
+
+def metric_from_path(path):
+    """Leitet die Kennzahl aus Datei- oder Bandnamen ab (NDVI_STD_2023_07.tif → STD)."""
+    tokens = os.path.basename(path).upper().replace(".TIF", "").split("_")
+    for metric in ARTEFACT_METRICS + CLIMATOLOGY_METRICS:
+        if metric in tokens[1:]:
+            return metric
+    return tokens[0]
+
+
+def is_artefact_file(path):
+    """
+    True für abgeleitete Dateien (_STD_, _MORAN_, _GEARY_, _MORANP_, _LISA_,
+    _STACK_, Klimatologie _CLIM_/_ANOM_) statt Basisraster.
+    """
+    tokens = os.path.basename(path).upper().replace(".TIF", "").split("_")
+    return any(t in tokens[1:] for t in ARTEFACT_METRICS + ("STACK", "CLIM", "ANOM"))
+
+
+def quantization_for(metric):
+    """(scale, offset) für eine Kennzahl – Overrides aus outputs.raster.quantization."""
+    overrides = raster_options().get("quantization") or {}
+    if metric in overrides:
+        scale, offset = overrides[metric]
+        return float(scale), float(offset)
+    return QUANTIZATION.get(metric, QUANTIZATION["NDVI"])
+
+
+def quantize(data, scale, offset):
+    """float → int16 (NaN → INT16_NODATA), zeilenblockweise ohne volle float-Kopie."""
+    out = np.empty(data.shape, dtype=np.int16)
+    for y in range(0, data.shape[0], _ROW_CHUNK):
+        block = (data[y:y + _ROW_CHUNK] - offset) / scale
+        nan = np.isnan(block)
+        np.clip(np.rint(block, out=block), -32767, 32767, out=block)
+        block[nan] = INT16_NODATA
+        out[y:y + _ROW_CHUNK] = block
+    return out
+
+
+def coarse_profile(profile, downsample, shape):
+    """
+    Profil eines Downsample-Gitters arr[::ds, ::ds]: gleicher Ursprung,
+    Pixelgröße × ds – Zelle i deckt die Vollpixel i·ds … i·ds + ds - 1 ab.
+    """
+    prof = profile.copy()
+    prof.update(
+        transform=profile["transform"] * Affine.scale(downsample),
+        height=shape[0],
+        width=shape[1],
+    )
+    return prof
+
+
+def read_band(src, band=1, window=None, boundless=False):
+    """
+    Liest ein Band als float32 mit NaN für nodata und macht eine
+    int16-Quantisierung (scale/offset) transparent rückgängig.
+    """
+    arr = src.read(band, window=window, boundless=boundless, masked=True)
+    out = arr.astype("float32").filled(np.nan)
+    scale, offset = src.scales[band - 1], src.offsets[band - 1]
+    if scale != 1.0 or offset != 0.0:
+        out *= scale
+        out += offset
+    return out
+
+
+def read_raster(path, band=1):
+    """Öffnet ein Raster und liefert (float32-Array mit NaN, Profil)."""
+    with rasterio.open(path) as src:
+        return read_band(src, band), src.profile
+
+
+def read_value(src, row, col, band=1):
+    """Liest genau ein Pixel (1×1-Fenster) dekodiert als float; außerhalb → NaN."""
+    if not (0 <= row < src.height and 0 <= col < src.width):
+        return np.nan
+    win = rasterio.windows.Window(col, row, 1, 1)
+    return float(read_band(src, band, window=win)[0, 0])
+
+
+# ------------------------------------------------------------
+# Punktabfragen in Blockreihenfolge
+# ------------------------------------------------------------
+
+def points_to_pixels(src, xs, ys):
+    """
+    Koordinaten → (rows, cols) als int64-Arrays (vektorisiert, ohne Python-Schleife).
+    src: geöffnetes Raster oder direkt dessen Affine-Transform.
+    """
+    inv = ~getattr(src, "transform", src)
+    cols, rows = inv * (np.asarray(xs, dtype="float64"), np.asarray(ys, dtype="float64"))
+    return np.floor(rows).astype(np.int64), np.floor(cols).astype(np.int64)
+
+
+def block_groups(src, rows, cols, band=1):
+    """
+    Gruppiert Pixelabfragen nach dem internen Block (Kachel bzw. Streifen) des
+    Bands. Liefert [(Block-Fenster, Indizes der Abfragen)] in Dateireihenfolge;
+    Abfragen außerhalb des Rasters fehlen.
+    """
+    bh, bw = src.block_shapes[band - 1]
+    rows, cols = np.asarray(rows), np.asarray(cols)
+    inside = np.flatnonzero((rows >= 0) & (rows < src.height) & (cols >= 0) & (cols < src.width))
+    if inside.size == 0:
+        return []
+    n_bcols = -(-src.width // bw)
+    key = (rows[inside] // bh) * n_bcols + cols[inside] // bw
+    order = np.argsort(key, kind="stable")
+    key, inside = key[order], inside[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    groups = []
+    for s, e in zip(starts, np.r_[starts[1:], key.size]):
+        br, bc = divmod(int(key[s]), n_bcols)
+        win = rasterio.windows.Window(bc * bw, br * bh, min(bw, src.width - bc * bw), min(bh, src.height - br * bh))
+        groups.append((win, inside[s:e]))
+    return groups
+
+
+def sample_points(src, rows, cols, bands=None):
+    """
+    Liest viele Pixel auf einmal: Abfragen werden nach internem Block sortiert,
+    jeder berührte Block wird genau einmal gelesen/dekodiert, und die Werte
+    werden in die ursprüngliche Reihenfolge zurückgeschrieben.
+
+    bands=None → alle Bänder. Gibt float32 [n, len(bands)] zurück (NaN für
+    nodata und Punkte außerhalb).
+    """
+    bands = list(bands or range(1, src.count + 1))
+    out = np.full((len(rows), len(bands)), np.nan, dtype=np.float32)
+    scales = np.asarray([src.scales[b - 1] for b in bands], dtype="float32")
+    offsets = np.asarray([src.offsets[b - 1] for b in bands], dtype="float32")
+    for win, idx in block_groups(src, rows, cols, bands[0]):
+        block = src.read(bands, window=win, masked=True).astype("float32").filled(np.nan)
+        vals = block[:, rows[idx] - win.row_off, cols[idx] - win.col_off].T
+        out[idx] = vals * scales + offsets
+    return out
+
+
+def sample_coords(path, xs, ys):
+    """
+    Öffnet ein Raster und liest alle Bänder an vielen Koordinaten in
+    Blockreihenfolge → {Bandname: Werte}; Bänder ohne Beschreibung heißen band_1, …
+    """
+    with rasterio.open(path) as src:
+        rows, cols = points_to_pixels(src, xs, ys)
+        vals = sample_points(src, rows, cols)
+        names = [d or f"band_{i}" for i, d in enumerate(src.descriptions, 1)]
+    return {name: vals[:, j] for j, name in enumerate(names)}
+
+
+def sample_windows(src, row_offs, col_offs, height, width, band=1):
+    """
+    Liefert für jede Abfrage das Fenster (row_off, col_off, height × width) –
+    boundless, außerhalb NaN. Abfragen werden nach dem Block ihres (auf das
+    Raster begrenzten) Mittelpunkts gruppiert; je Gruppe wird die umschließende
+    Fläche einmal gelesen. Generator über (Index, Fenster) in Blockreihenfolge.
+    """
+    row_offs, col_offs = np.asarray(row_offs, dtype=np.int64), np.asarray(col_offs, dtype=np.int64)
+    hits = ((row_offs < src.height) & (row_offs + height > 0)
+            & (col_offs < src.width) & (col_offs + width > 0))
+    for i in np.flatnonzero(~hits):
+        yield int(i), np.full((height, width), np.nan, dtype=np.float32)
+
+    centre_r = np.clip(row_offs + height // 2, 0, src.height - 1)
+    centre_c = np.clip(col_offs + width // 2, 0, src.width - 1)
+    centre_r[~hits] = -1  # ganz außerhalb → oben bereits als NaN geliefert
+    for _, idx in block_groups(src, centre_r, centre_c, band):
+        r0, c0 = int(row_offs[idx].min()), int(col_offs[idx].min())
+        r1, c1 = int(row_offs[idx].max()) + height, int(col_offs[idx].max()) + width
+        area = read_band(src, band, window=rasterio.windows.Window(c0, r0, c1 - c0, r1 - r0), boundless=True)
+        for i in idx:
+            r, c = row_offs[i] - r0, col_offs[i] - c0
+            yield int(i), area[r:r + height, c:c + width]
+
+
+# ------------------------------------------------------------
+# Schreiben
+# ------------------------------------------------------------
+
+def open_band_writer(out_path, profile, names, tmp_dir=None, tags=None, **overrides):
+    """
+    Öffnet ein Ausgaberaster (Bandnamen names) zum fensterweisen Schreiben –
+    Format, Quantisierung und lokales Zwischenschreiben wie save_raster.
+    Zustand für write_window/close_band_writer.
+    """
+    opts = raster_options()
+    opts.update(overrides)
+    tmp_dir = tmp_dir or cfg["paths"].get("temp_dir", "/tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    out_dir = os.path.dirname(out_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    meta = profile.copy()
+    for key in ("blockxsize", "blockysize", "tiled", "interleave", "compress", "predictor"):
+        meta.pop(key, None)
+    meta.update(driver="GTiff", count=len(names), BIGTIFF="IF_NEEDED")
+    if opts["quantize"]:
+        meta.update(dtype="int16", nodata=INT16_NODATA)
+    else:
+        meta.update(dtype="float32")
+    if len(names) > 1:
+        meta.update(interleave="pixel")
+
+    tmp = os.path.join(tmp_dir, f"tmp_{uuid.uuid4().hex[:8]}_{os.path.basename(out_path)}")
+    if opts["format"] == "cog":
+        meta.update(tiled=True, blockxsize=opts["blocksize"], blockysize=opts["blocksize"])
+    else:
+        meta.update(compress="lzw")
+
+    quant = [quantization_for(metric_from_path(n)) if opts["quantize"] else (1.0, 0.0) for n in names]
+    dst = rasterio.open(tmp, "w", **meta)
+    for i, name in enumerate(names, 1):
+        dst.set_band_description(i, name)
+    dst.scales = tuple(q[0] for q in quant)
+    dst.offsets = tuple(q[1] for q in quant)
+    if tags:
+        dst.update_tags(**tags)
+    return {"dst": dst, "tmp": tmp, "out_path": out_path, "opts": opts, "quant": quant}
+
+
+def write_window(writer, band, data, window=None):
+    """Schreibt ein Band (bzw. ein Fenster davon) – float32 oder int16-quantisiert."""
+    if writer["opts"]["quantize"]:
+        data = quantize(data, *writer["quant"][band - 1])
+    elif data.dtype != np.float32:
+        data = data.astype("float32")
+    writer["dst"].write(data, band, window=window)
+
+
+def close_band_writer(writer):
+    """Schließt das Raster, wandelt ggf. in COG um und legt es atomar am Ziel ab."""
+    writer["dst"].close()
+    opts, tmp, out_path = writer["opts"], writer["tmp"], writer["out_path"]
+
+    if opts["format"] == "cog":
+        cog_tmp = tmp + ".cog.tif"
+        rasterio.shutil.copy(
+            tmp, cog_tmp, driver="COG",
+            BLOCKSIZE=opts["blocksize"],
+            COMPRESS=opts["compress"].upper(),
+            PREDICTOR="YES",
+            INTERLEAVE="PIXEL",
+            OVERVIEWS="NONE",
+            BIGTIFF="IF_SAFER",
+        )
+        os.remove(tmp)
+        tmp = cog_tmp
+
+    # Erst neben das Ziel kopieren, dann atomar umbenennen – nie halbe Dateien am Zielort
+    staged = out_path + ".incoming"
+    shutil.move(tmp, staged)
+    os.replace(staged, out_path)
+    return out_path
+
+
+def _write_bands(out_path, profile, bands, tmp_dir=None, tags=None, **overrides):
+    """
+    Schreibt eine Liste (name, array) als ein- oder mehrbandiges GeoTIFF
+    gemäß cfg["outputs"]["raster"] (siehe save_raster); tags → Datei-Metadaten.
+    """
+    writer = open_band_writer(out_path, profile, [name for name, _ in bands], tmp_dir=tmp_dir, tags=tags, **overrides)
+    for i, (_, data) in enumerate(bands, 1):
+        write_window(writer, i, data)
+    return close_band_writer(writer)
+
+
+def save_raster(out_path, profile, data, metric=None, tmp_dir=None, **overrides):
+    """
+    Speichert ein Artefakt gemäß cfg["outputs"]["raster"]:
+
+    - format "gtiff": gestreiftes float32-GeoTIFF mit LZW (bisheriges Verhalten)
+    - format "cog": Cloud-Optimized GeoTIFF mit internen Kacheln (blocksize),
+      Prädiktor (float: 3, int: 2) und Kompression
+
+    Mit quantize=True wird zusätzlich als int16 mit scale/offset gespeichert;
+    read_band dekodiert das automatisch.
+
+    Es wird zuerst lokal (tmp_dir bzw. paths.temp_dir) geschrieben und danach
+    an den Zielort verschoben – Teilschreibvorgänge landen nie auf Drive.
+    """
+    metric = metric or metric_from_path(out_path)
+    return _write_bands(out_path, profile, [(metric, data)], tmp_dir=tmp_dir, **overrides)
+
+
+def save_bands(out_path, profile, bands, tags=None, tmp_dir=None, **overrides):
+    """
+    Speichert ein Mehrband-Raster mit freien Bandnamen [(name, array), …]
+    (Format/Quantisierung wie save_raster) und optionalen Datei-Tags.
+    """
+    return _write_bands(out_path, profile, bands, tmp_dir=tmp_dir, tags=tags, **overrides)
+
+
+# ------------------------------------------------------------
+# Mehrband-Stack pro Index-Monat
+# ------------------------------------------------------------
+
+def stack_band_names(index):
+    """Kanonische Bandnamen eines Stacks, z. B. NDVI, NDVI_STD, NDVI_MORAN, NDVI_GEARY."""
+    return [index] + [f"{index}_{m}" for m in ARTEFACT_METRICS]
+
+
+def stack_path(base_dir, index, month, suffix=""):
+    """Pfad des Stacks für einen Monat (month als 'YYYY_MM')."""
+    return os.path.join(base_dir, f"{index}_STACK_{month}{suffix}.tif")
+
+
+def stack_bands(path):
+    """Bandbeschreibungen eines vorhandenen Stacks (leer, falls Datei fehlt)."""
+    if not os.path.exists(path):
+        return []
+    with rasterio.open(path) as src:
+        return [d for d in src.descriptions if d]
+
+
+def write_stack(out_path, profile, bands, tmp_dir=None, **overrides):
+    """
+    Schreibt/ergänzt einen Mehrband-Stack. Vorhandene Bänder bleiben erhalten,
+    neu berechnete ersetzen gleichnamige. Reihenfolge: Basis, STD, MORAN, GEARY, MORANP, LISA.
+    """
+    merged = {}
+    if os.path.exists(out_path):
+        with rasterio.open(out_path) as src:
+            profile = src.profile
+            for i, name in enumerate(src.descriptions, 1):
+                if name and name not in bands:
+                    merged[name] = read_band(src, i)
+    merged.update(bands)
+
+    index = next(iter(merged)).split("_")[0]
+    order = [n for n in stack_band_names(index) if n in merged]
+    order += [n for n in merged if n not in order]
+    return _write_bands(out_path, profile, [(n, merged[n]) for n in order], tmp_dir=tmp_dir, **overrides)
+
+
+def read_pixel(src, row, col):
+    """Liest alle Bänder eines Pixels in einem Zugriff → {Bandname: Wert}."""
+    names = [d or f"band_{i}" for i, d in enumerate(src.descriptions, 1)]
+    if not (0 <= row < src.height and 0 <= col < src.width):
+        return {n: np.nan for n in names}
+    win = rasterio.windows.Window(col, row, 1, 1)
+    vals = src.read(window=win, masked=True).astype("float32").filled(np.nan)[:, 0, 0]
+    vals = vals * np.asarray(src.scales, dtype="float32") + np.asarray(src.offsets, dtype="float32")
+    return {n: float(v) for n, v in zip(names, vals)}
+
+
+def artefacts_exist(out_dir, index, month, metrics, suffix=""):
+    """True, wenn alle Kennzahlen eines Index-Monats im aktuellen Layout vorliegen."""
+    if raster_options().get("layout", "files") == "stack":
+        bands = stack_bands(stack_path(out_dir, index, month, suffix))
+        return all(f"{index}_{m}" in bands for m in metrics)
+    return all(os.path.exists(os.path.join(out_dir, f"{index}_{m}_{month}{suffix}.tif")) for m in metrics)
+
+
+def save_artefacts(out_dir, index, month, profile, artefacts, base=None, suffix="", tmp_dir=None, downsample=1):
+    """
+    Speichert berechnete Artefakte {metric: array} eines Index-Monats –
+    je nach outputs.raster.layout als Einzeldateien ({index}_{metric}_{month}.tif)
+    oder als ein Mehrband-Stack ({index}_STACK_{month}.tif, inkl. Basisband).
+    Gibt die geschriebenen Pfade zurück.
+
+    Arrays in Zellauflösung eines Downsample-Gitters (Form ≠ Profil) werden als
+    Einzeldatei mit skaliertem Geotransform geschrieben (coarse_profile); im
+    Stack müssen alle Bänder ein Gitter teilen, dort werden sie vergrößert.
+    """
+    shape = (profile["height"], profile["width"])
+    if raster_options().get("layout", "files") == "stack":
+        bands = {
+            f"{index}_{m}": data if data.shape == shape else lisa.upsample(data, downsample, shape)
+            for m, data in artefacts.items()
+        }
+        if base is not None:
+            bands = {index: base, **bands}
+        return [write_stack(stack_path(out_dir, index, month, suffix), profile, bands, tmp_dir=tmp_dir)]
+
+    paths = []
+    for metric, data in artefacts.items():
+        out = os.path.join(out_dir, f"{index}_{metric}_{month}{suffix}.tif")
+        prof = profile if data.shape == shape else coarse_profile(profile, downsample, data.shape)
+        paths.append(save_raster(out, prof, data, tmp_dir=tmp_dir))
+    return paths
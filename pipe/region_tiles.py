@@ -0,0 +1,152 @@
+# ============================================================
+# 🧩 region_tiles.py
+# Version: 2025-10 | Festes Kachelgitter für große Regionen + Mosaik-Abfragen
+# ============================================================
+
+import os
+import math
+import sys
+from glob import glob
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pipe import feature_cache
+
+_EPS = 1e-9  # Gleitkomma-Toleranz an Kachelgrenzen (52.3 / 0.1 = 522.999…)
+
+
+# ------------------------------------------------------------
+# Gitter & Namen
+# ------------------------------------------------------------
+
+def tiling_options(cfg):
+    """export.tiling mit Defaults (enabled: false → eine Region wie bisher)."""
+    opts = {"enabled": False, "region_name": "BerlinBB", "tile_deg": 0.5, "halo_deg": 0.0}
+    opts.update(cfg["export"].get("tiling", {}) or {})
+    return opts
+
+
+def region_token(cfg):
+    """Dateinamen-Token der Gesamtregion (ohne Kachelung), z. B. BerlinBB."""
+    return tiling_options(cfg)["region_name"]
+
+
+def tile_id(x0, y0):
+    """Kachel-ID aus der linken unteren Ecke, z. B. (13.0, 52.5) → E01300N05250."""
+    ew = "E" if x0 >= 0 else "W"
+    ns = "N" if y0 >= 0 else "S"
+    return f"{ew}{abs(round(x0 * 100)):05d}{ns}{abs(round(y0 * 100)):05d}"
+
+
+def tile_grid(cfg, bbox=None):
+    """
+    Kacheln des festen Gitters (Ursprung 0°/0°, Kantenlänge tile_deg), die
+    bbox (Default export.region_bbox) schneiden. Jede Kachel:
+    {"id", "bbox" (Kern), "export_bbox" (Kern + halo_deg, für Randeffekte)}.
+    Ohne Kachelung: eine Kachel mit dem Regionsnamen als ID.
+    """
+    opts = tiling_options(cfg)
+    bbox = bbox or cfg["export"]["region_bbox"]
+    if not opts["enabled"]:
+        return [{"id": opts["region_name"], "bbox": list(bbox), "export_bbox": list(bbox)}]
+
+    size, halo = float(opts["tile_deg"]), float(opts["halo_deg"])
+    x_min, y_min, x_max, y_max = bbox
+    tiles = []
+    for iy in range(math.floor(y_min / size + _EPS), math.ceil(y_max / size - _EPS)):
+        for ix in range(math.floor(x_min / size + _EPS), math.ceil(x_max / size - _EPS)):
+            x0, y0 = ix * size, iy * size
+            core = [x0, y0, x0 + size, y0 + size]
+            tiles.append({
+                "id": tile_id(x0, y0),
+                "bbox": core,
+                "export_bbox": [core[0] - halo, core[1] - halo, core[2] + halo, core[3] + halo],
+            })
+    return tiles
+
+
+def tiles_for_points(cfg, lon, lat):
+    """Kachel-ID je Koordinate (vektorisiert); ohne Kachelung überall der Regionsname."""
+    opts = tiling_options(cfg)
+    lon, lat = np.asarray(lon, dtype="float64"), np.asarray(lat, dtype="float64")
+    if not opts["enabled"]:
+        return np.full(lon.shape, opts["region_name"], dtype=object)
+    size = float(opts["tile_deg"])
+    x0 = np.floor(lon / size + _EPS) * size
+    y0 = np.floor(lat / size + _EPS) * size
+    return np.array([tile_id(x, y) for x, y in zip(x0, y0)], dtype=object)
+
+
+def raster_name(index, tile, year, month):
+    """Dateiname eines Monatsrasters, z. B. NDVI_E01300N05250_2023_07 (ohne .tif)."""
+    return f"{index}_{tile}_{year}_{int(month):02d}"
+
+
+def tile_dir(cfg, index_dir, tile):
+    """Ablageordner einer Kachel: index_dir/<tile> (ohne Kachelung: index_dir selbst)."""
+    if not tiling_options(cfg)["enabled"]:
+        return index_dir
+    return os.path.join(index_dir, tile)
+
+
+def list_tile_dirs(cfg, index_dir):
+    """Vorhandene Kachelordner → {tile: Ordner} (ohne Kachelung: {Region: index_dir})."""
+    opts = tiling_options(cfg)
+    if not opts["enabled"]:
+        return {opts["region_name"]: index_dir}
+    if not os.path.isdir(index_dir):
+        return {}
+    return {
+        name: os.path.join(index_dir, name)
+        for name in sorted(os.listdir(index_dir))
+        if os.path.isdir(os.path.join(index_dir, name)) and not name.startswith(".")
+    }
+
+
+# ------------------------------------------------------------
+# Mosaik-Index (in-process, statt VRT)
+# ------------------------------------------------------------
+
+def mosaic_index(cfg, index_dir, prefix, year, month, find_fn):
+    """
+    Sammelt für einen Monat je Kachel das passende Raster →
+    {tile: (Pfad, Kernbereich-bbox)}. find_fn(ordner, prefix, year, month) ist
+    die Suchfunktion des Aufrufers (z. B. env_feature_extractor.find_raster).
+    """
+    cores = {t["id"]: t["bbox"] for t in tile_grid(cfg)}
+    index = {}
+    for tile, folder in list_tile_dirs(cfg, index_dir).items():
+        path = find_fn(folder, prefix, year, month)
+        if path:
+            index[tile] = (path, cores.get(tile))
+    return index
+
+
+def sample_mosaic(cfg, mosaic, lon, lat, cache=None, pool=None):
+    """
+    Liest Werte an beliebigen Koordinaten aus einem Mosaik-Index: Punkte werden
+    ihrer Kachel zugeordnet und je Kachel in Blockreihenfolge gelesen (mit
+    cache zuerst aus dem Feature-Cache, mit pool parallel über Shared Memory).
+    Gibt {Bandname: Werte} in Eingabereihenfolge zurück (fehlende Kachel → NaN).
+    """
+    lon, lat = np.asarray(lon, dtype="float64"), np.asarray(lat, dtype="float64")
+    tiles = tiles_for_points(cfg, lon, lat)
+    out = {}
+    for tile in np.unique(tiles):
+        if tile not in mosaic:
+            continue
+        pos = np.flatnonzero(tiles == tile)
+        for name, vals in feature_cache.sample_coords(cache, mosaic[tile][0], lon[pos], lat[pos], pool).items():
+            out.setdefault(name, np.full(lon.shape, np.nan, dtype=np.float32))[pos] = vals
+    return out
+
+
+def find_tile_raster(cfg, index_dir, pattern):
+    """Alle Raster eines Glob-Musters über alle Kachelordner (für Übersichten/Checks)."""
+    return sorted(
+        path
+        for folder in list_tile_dirs(cfg, index_dir).values()
+        for path in glob(os.path.join(folder, pattern))
+    )
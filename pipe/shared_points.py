@@ -0,0 +1,189 @@
+# ============================================================
+# 🧵 shared_points.py
+# Version: 2025-10 | Parallele Punktextraktion: Raster einmal in Shared Memory, Punkte auf Prozesse verteilt
+# ============================================================
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import rasterio
+from affine import Affine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pipe import raster_io
+
+_CHUNKS_PER_WORKER = 4  # mehrere Teilstücke je Prozess → gleichmäßige Auslastung
+
+
+# ------------------------------------------------------------
+# Verwaltung
+# ------------------------------------------------------------
+
+def open_pool(cfg):
+    """
+    Startet den Prozesspool aus feature_extraction.parallel (None, wenn
+    deaktiviert oder nur ein Prozess). Zustand: {executor, workers, min_points, shared}.
+    """
+    opts = cfg.get("feature_extraction", {}).get("parallel", {}) or {}
+    if not opts.get("enabled", False):
+        return None
+    workers = int(opts.get("workers") or os.cpu_count() or 1)
+    if workers < 2:
+        return None
+    print(f"🧵 Parallele Punktextraktion: {workers} Prozesse (Shared Memory)")
+    return {
+        "executor": ProcessPoolExecutor(max_workers=workers),
+        "workers": workers,
+        "min_points": int(opts.get("min_points", 10_000)),
+        "shared": None,
+    }
+
+
+def close_pool(pool):
+    """Gibt das geteilte Raster frei und beendet die Prozesse."""
+    if pool is None:
+        return
+    release(pool)
+    pool["executor"].shutdown()
+
+
+def share(pool, path):
+    """
+    Dekodiert alle Bänder eines Rasters genau einmal direkt in einen
+    Shared-Memory-Block (float32, NaN für nodata, scale/offset angewandt).
+    Es ist immer nur ein Raster gleichzeitig geteilt – das vorige wird freigegeben.
+    Gibt den Deskriptor für die Prozesse zurück.
+    """
+    current = pool["shared"]
+    if current is not None and current["path"] == path:
+        return current["desc"]
+    release(pool)
+
+    with rasterio.open(path) as src:
+        shape = (src.count, src.height, src.width)
+        shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 4, 1))
+        arr = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        for b in range(1, src.count + 1):
+            plane = arr[b - 1]
+            src.read(b, out=plane, out_dtype="float32")
+            plane[src.read_masks(b) == 0] = np.nan
+            scale, offset = src.scales[b - 1], src.offsets[b - 1]
+            if scale != 1.0 or offset != 0.0:
+                plane *= scale
+                plane += offset
+        desc = {
+            "name": shm.name,
+            "shape": shape,
+            "transform": tuple(src.transform)[:6],
+            "names": [d or f"band_{i}" for i, d in enumerate(src.descriptions, 1)],
+        }
+    del arr, plane
+    pool["shared"] = {"path": path, "shm": shm, "desc": desc}
+    return desc
+
+
+def release(pool):
+    """Schließt und entfernt den aktuell geteilten Rasterblock."""
+    current = pool["shared"]
+    if current is None:
+        return
+    current["shm"].close()
+    current["shm"].unlink()
+    pool["shared"] = None
+
+
+def _bounds(n, pool):
+    """Zusammenhängende Teilstücke [a, b) der Punkttabelle."""
+    k = max(min(pool["workers"] * _CHUNKS_PER_WORKER, n), 1)
+    edges = np.linspace(0, n, k + 1).astype(np.int64)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+# ------------------------------------------------------------
+# Arbeitsprozesse (lesen die geteilten Bänder ohne Kopie)
+# ------------------------------------------------------------
+
+def _attach(desc):
+    shm = shared_memory.SharedMemory(name=desc["name"])
+    return shm, np.ndarray(desc["shape"], dtype=np.float32, buffer=shm.buf)
+
+
+def _window(plane, r, c, height, width):
+    """Fenster (r, c, height × width) aus einem Band; außerhalb NaN (wie boundless)."""
+    out = np.full((height, width), np.nan, dtype=np.float32)
+    r0, c0 = max(r, 0), max(c, 0)
+    r1, c1 = min(r + height, plane.shape[0]), min(c + width, plane.shape[1])
+    if r0 < r1 and c0 < c1:
+        out[r0 - r:r1 - r, c0 - c:c1 - c] = plane[r0:r1, c0:c1]
+    return out
+
+
+def _sample_chunk(desc, xs, ys):
+    shm, arr = _attach(desc)
+    try:
+        _, h, w = arr.shape
+        rows, cols = raster_io.points_to_pixels(Affine(*desc["transform"]), xs, ys)
+        out = np.full((len(rows), arr.shape[0]), np.nan, dtype=np.float32)
+        ok = (rows >= 0) & (rows < h) & (cols >= 0) & (cols < w)
+        out[ok] = arr[:, rows[ok], cols[ok]].T
+    finally:
+        del arr
+        shm.close()
+    return out
+
+
+def _windows_chunk(desc, band, row_offs, col_offs, height, width, fn):
+    shm, arr = _attach(desc)
+    plane = arr[band - 1]
+    try:
+        out = [fn(_window(plane, int(r), int(c), height, width)) for r, c in zip(row_offs, col_offs)]
+    finally:
+        del arr, plane
+        shm.close()
+    return out
+
+
+# ------------------------------------------------------------
+# Abfragen (pool None oder wenige Punkte → seriell wie bisher)
+# ------------------------------------------------------------
+
+def sample_coords(pool, path, xs, ys):
+    """
+    Wie raster_io.sample_coords, aber verteilt auf den Prozesspool: das Raster
+    wird einmal in Shared Memory dekodiert, jeder Prozess liest seine Punkte
+    daraus. Ergebnis {Bandname: Werte} in Eingabereihenfolge.
+    """
+    xs, ys = np.asarray(xs, dtype="float64"), np.asarray(ys, dtype="float64")
+    if pool is None or len(xs) < pool["min_points"]:
+        return raster_io.sample_coords(path, xs, ys)
+
+    desc = share(pool, path)
+    futures = [pool["executor"].submit(_sample_chunk, desc, xs[a:b], ys[a:b]) for a, b in _bounds(len(xs), pool)]
+    vals = np.concatenate([f.result() for f in futures])
+    return {name: vals[:, j] for j, name in enumerate(desc["names"])}
+
+
+def map_windows(pool, path, row_offs, col_offs, height, width, fn, band=1):
+    """
+    fn(Fenster) für jede Abfrage (row_off, col_off, height × width; außerhalb NaN)
+    → Liste in Eingabereihenfolge. Mit Pool rechnen die Prozesse auf dem geteilten
+    Band; fn muss dafür eine Modulfunktion sein (picklebar).
+    """
+    row_offs, col_offs = np.asarray(row_offs, dtype=np.int64), np.asarray(col_offs, dtype=np.int64)
+    if pool is None or len(row_offs) < pool["min_points"]:
+        out = [None] * len(row_offs)
+        with rasterio.open(path) as src:
+            for i, win in raster_io.sample_windows(src, row_offs, col_offs, height, width, band):
+                out[i] = fn(win)
+        return out
+
+    desc = share(pool, path)
+    futures = [
+        pool["executor"].submit(_windows_chunk, desc, band, row_offs[a:b], col_offs[a:b], height, width, fn)
+        for a, b in _bounds(len(row_offs), pool)
+    ]
+    return [v for f in futures for v in f.result()]
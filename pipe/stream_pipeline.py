@@ -0,0 +1,197 @@
+# ============================================================
+# 🌊 stream_pipeline.py
+# Version: 2025-10 | Abruf → Feature-Extraktion → Schreiben als überlappende Stufen
+# ============================================================
+
+import os
+import sys
+import queue
+import threading
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pipe import inat_loader, env_feature_extractor, feature_cache, shared_points, io_pipeline
+
+_DONE = object()
+
+
+def streaming_options(cfg):
+    """feature_extraction.streaming mit Defaults."""
+    opts = {"queue_pages": 4, "batch_size": 2000, "write_queue": 2}
+    opts.update(cfg.get("feature_extraction", {}).get("streaming", {}) or {})
+    return opts
+
+
+# ------------------------------------------------------------
+# Stufen
+# ------------------------------------------------------------
+
+def _fetcher(fetch_fn, selection, max_pages, pages, stop, stats):
+    """
+    Hintergrund-Thread: ruft die Seiten aller Taxa nacheinander ab und legt sie
+    als parse_results-Tabellen in die Warteschlange. Ist sie voll, wartet der
+    Abruf (Backpressure) – höchstens queue_pages Seiten liegen im Speicher.
+    """
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    period = selection["period"]
+    try:
+        for taxon in selection["taxa"]:
+            it = iter(fetch_fn(taxon["id"], selection["bbox"], period.get("start"), period.get("end"), max_pages))
+            while True:
+                t0 = time.perf_counter()
+                results = next(it, None)
+                stats["fetch_s"] += time.perf_counter() - t0
+                if results is None or not put(inat_loader.parse_results(results, taxon["name"])):
+                    break
+                stats["pages"] += 1
+    except Exception as e:
+        put(e)
+    finally:
+        put(_DONE)
+
+
+def extract_batch(cfg, obs, columns, cache=None, pool=None):
+    """
+    Features eines Beobachtungsblocks (Schema parse_results) → Zeilen wie
+    inaturalist_features.csv; je Monat ein gebündelter Rasterzugriff.
+    """
+    date = pd.to_datetime(obs["observed_on"], errors="coerce")
+    feats = pd.DataFrame({
+        "latitude": obs["latitude"].to_numpy(),
+        "longitude": obs["longitude"].to_numpy(),
+        "date": date.dt.strftime("%Y-%m-%d").to_numpy(),
+        "species": obs["species"].to_numpy(),
+    })
+    for col in columns:
+        feats[col] = float("nan")
+
+    valid = date.notna().to_numpy()
+    groups = pd.DataFrame({"y": date.dt.year, "m": date.dt.month})[valid].groupby(["y", "m"]).indices
+    rows = valid.nonzero()[0]
+    for (year, month), pos in groups.items():
+        pos = rows[pos]
+        lon = feats["longitude"].to_numpy(dtype="float64")[pos]
+        lat = feats["latitude"].to_numpy(dtype="float64")[pos]
+        sampled = env_feature_extractor.sample_month(cfg, int(year), int(month), lon, lat, cache, pool)
+        for name, values in sampled.items():
+            if name in columns:
+                feats.iloc[pos, feats.columns.get_loc(name)] = values
+    return feats
+
+
+def _append(outputs, obs, feats):
+    """Schreibauftrag (Write-behind-Thread): Block an alle Ausgabedateien anhängen."""
+    for name, group in obs.groupby("species", sort=False):
+        group.to_csv(outputs["species"][name], mode="a", header=False, index=False)
+    obs.to_csv(outputs["combined"], mode="a", header=False, index=False)
+    feats.to_csv(outputs["features"], mode="a", header=False, index=False)
+
+
+# ------------------------------------------------------------
+# Gesamtlauf
+# ------------------------------------------------------------
+
+def run_streaming(cfg, fetch_fn=None):
+    """
+    Streaming-Modus von run_inat_fetch + extract_features: abgerufene Seiten
+    laufen über eine begrenzte Warteschlange (queue_pages) in Blöcken von
+    batch_size Punkten durch die Rasterextraktion und dann an den Write-behind-
+    Writer (write_queue). Netzwerk, Rasterzugriffe und Schreiben überlappen –
+    die Laufzeit nähert sich max(Abruf, Extraktion) statt der Summe; der
+    Speicher bleibt durch die Warteschlangen begrenzt.
+    Schreibt inaturalist_<Art>.csv, inaturalist_combined.csv und
+    inaturalist_features.csv in output_dir.
+    """
+    opts = streaming_options(cfg)
+    fetch_fn = fetch_fn or inat_loader.iter_inat_pages
+    selection = inat_loader.species_from_config(cfg)
+    columns = env_feature_extractor.feature_columns(cfg)
+
+    out_dir = cfg["paths"]["output_dir"]
+    os.makedirs(out_dir, exist_ok=True)
+    outputs = {
+        "species": {t["name"]: os.path.join(out_dir, f"inaturalist_{t['name'].replace(' ', '_')}.csv")
+                    for t in selection["taxa"]},
+        "combined": os.path.join(out_dir, "inaturalist_combined.csv"),
+        "features": os.path.join(out_dir, "inaturalist_features.csv"),
+    }
+    for path in list(outputs["species"].values()) + [outputs["combined"]]:
+        pd.DataFrame(columns=inat_loader.RESULT_COLUMNS).to_csv(path, index=False)
+    pd.DataFrame(columns=["latitude", "longitude", "date", "species"] + columns).to_csv(outputs["features"], index=False)
+
+    period = selection["period"]
+    print(f"🌊 Streaming: {', '.join(t['name'] for t in selection['taxa'])} | "
+          f"📅 {period.get('start', '–')} → {period.get('end', '–')} | 🗺️ {selection['bbox']}")
+
+    stats = {"fetch_s": 0.0, "pages": 0, "wait_s": 0.0, "extract_s": 0.0, "points": 0}
+    pages = queue.Queue(maxsize=max(int(opts["queue_pages"]), 1))
+    stop = threading.Event()
+    fetcher = threading.Thread(
+        target=_fetcher, name="inat-fetch", daemon=True,
+        args=(fetch_fn, selection, int(cfg["inat"].get("max_pages", 50)), pages, stop, stats),
+    )
+    writer = io_pipeline.start_writer(opts["write_queue"])
+    cache = feature_cache.open_cache(cfg)
+    pool = shared_points.open_pool(cfg)
+    t_start = time.perf_counter()
+    fetcher.start()
+
+    def flush(batch):
+        obs = pd.concat(batch, ignore_index=True)
+        t0 = time.perf_counter()
+        feats = extract_batch(cfg, obs, columns, cache, pool)
+        stats["extract_s"] += time.perf_counter() - t0
+        stats["points"] += len(obs)
+        io_pipeline.submit_write(writer, _append, outputs, obs, feats)
+
+    try:
+        batch, pending = [], 0
+        while True:
+            t0 = time.perf_counter()
+            item = pages.get()
+            stats["wait_s"] += time.perf_counter() - t0
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            if len(item):
+                batch.append(item)
+                pending += len(item)
+            if pending >= opts["batch_size"]:
+                flush(batch)
+                batch, pending = [], 0
+        if batch:
+            flush(batch)
+    finally:
+        stop.set()
+        while fetcher.is_alive():  # Abruf aus einem blockierenden put() befreien
+            try:
+                pages.get_nowait()
+            except queue.Empty:
+                fetcher.join(timeout=0.05)
+        shared_points.close_pool(pool)
+        feature_cache.close_cache(cache)
+        io_pipeline.finish_writer(writer)
+
+    wall = time.perf_counter() - t_start
+    serial = stats["fetch_s"] + stats["extract_s"] + writer["write_s"]
+    print(f"\n✅ {stats['points']} Beobachtungen aus {stats['pages']} Seiten → {outputs['features']}")
+    print(f"  ⏱️ Laufzeit {wall:.1f}s statt {serial:.1f}s nacheinander "
+          f"(Abruf {stats['fetch_s']:.1f}s, Extraktion {stats['extract_s']:.1f}s, "
+          f"Schreiben {writer['write_s']:.1f}s; auf Seiten gewartet {stats['wait_s']:.1f}s)")
+    peak = io_pipeline.peak_rss_mb()
+    if peak is not None:
+        print(f"  🧠 Peak-RSS: {peak:.0f} MB")
+    stats.update({"wall_s": wall, "write_s": writer["write_s"], "outputs": outputs})
+    return stats
@@ -0,0 +1,167 @@
+# ============================================================
+# 🧮 training_matrix.py
+# Version: 2025-10 | Modellfertige float32-Matrix (memory-mapped) aus Fund- & Hintergrundpunkten
+# ============================================================
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+_CHUNK_ROWS = 200_000
+MISSING_GROUP = -1  # Gruppe für Punkte ohne Koordinaten (räumliche Blöcke sind ≥ 0)
+
+
+# ------------------------------------------------------------
+# Hilfsfunktionen
+# ------------------------------------------------------------
+
+def _iter_chunks(source, columns):
+    """Liefert DataFrame-Chunks einer CSV-Datei oder eines DataFrames (nur benötigte Spalten)."""
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), _CHUNK_ROWS):
+            yield source.iloc[start:start + _CHUNK_ROWS].reindex(columns=columns)
+        return
+    header = pd.read_csv(source, nrows=0).columns
+    usecols = [c for c in columns if c in header]
+    for chunk in pd.read_csv(source, usecols=usecols, chunksize=_CHUNK_ROWS):
+        yield chunk.reindex(columns=columns)
+
+
+def _count_rows(source):
+    if isinstance(source, pd.DataFrame):
+        return len(source)
+    return sum(len(c) for c in pd.read_csv(source, usecols=[0], chunksize=_CHUNK_ROWS))
+
+
+def _group_codes(values, mapping):
+    """Stabile Integer-Codes über alle Chunks hinweg (mapping wird ergänzt)."""
+    for v in pd.unique(values):
+        mapping.setdefault(v, len(mapping))
+    return values.map(mapping).to_numpy(dtype=np.int64)
+
+
+def spatial_groups(lon, lat, block_deg=0.05):
+    """
+    Gruppen-ID (≥ 0) je Punkt aus einem festen Lon/Lat-Raster (für räumliche
+    Kreuzvalidierung); fehlende Koordinaten → MISSING_GROUP.
+    """
+    lon = np.asarray(lon, dtype="float64")
+    lat = np.asarray(lat, dtype="float64")
+    missing = np.isnan(lon) | np.isnan(lat)
+    gx = np.floor((np.where(missing, 0.0, lon) + 180.0) / block_deg).astype("int64")
+    gy = np.floor((np.where(missing, 0.0, lat) + 90.0) / block_deg).astype("int64")
+    return np.where(missing, MISSING_GROUP, gy * 100_003 + gx).astype("int64")
+
+
+# ------------------------------------------------------------
+# Hauptfunktionen
+# ------------------------------------------------------------
+
+def build_training_matrix(
+    presence,
+    background,
+    out_dir,
+    feature_columns,
+    labels=(1, 0),
+    group_column=None,
+    block_deg=0.05,
+    shuffle=True,
+    seed=42,
+):
+    """
+    Fügt Fund- und Hintergrundtabellen zu einer zusammenhängenden float32-Matrix
+    mit festem Spaltenschema zusammen und schreibt sie als .npy auf die Platte:
+
+        X.npy       float32 [n, len(feature_columns)], C-contiguous
+        y.npy       int8    Label (labels[0] = Fund, labels[1] = Hintergrund)
+        groups.npy  int64   Gruppen (group_column oder räumliche Blöcke)
+        schema.json Spalten, dtypes, Zeilen, Quellen
+
+    Die Tabellen werden chunkweise direkt in die memory-mapped Zieldateien
+    geschrieben (kein pd.concat, keine float64-Zwischenkopie); die Durchmischung
+    erfolgt über eine feste Permutation beim Schreiben.
+
+    Args:
+        presence, background: Listen von CSV-Pfaden und/oder DataFrames.
+        out_dir (str): Zielordner.
+        feature_columns (list): Festes Feature-Schema; fehlende Spalten → NaN.
+        labels (tuple): (Fund, Hintergrund), z. B. aus cfg["labels"].
+        group_column (str): Spalte für Gruppen (None → räumliche Blöcke).
+        block_deg (float): Blockgröße der räumlichen Gruppen in Grad.
+        shuffle (bool): Zeilen zufällig anordnen.
+        seed (int): Seed der Permutation.
+
+    Returns:
+        Pfad des Ausgabeordners.
+    """
+    sources = [(s, labels[0]) for s in presence] + [(s, labels[1]) for s in background]
+    counts = [_count_rows(s) for s, _ in sources]
+    n, k = int(sum(counts)), len(feature_columns)
+
+    os.makedirs(out_dir, exist_ok=True)
+    X = np.lib.format.open_memmap(os.path.join(out_dir, "X.npy"), mode="w+", dtype=np.float32, shape=(n, k))
+    y = np.lib.format.open_memmap(os.path.join(out_dir, "y.npy"), mode="w+", dtype=np.int8, shape=(n,))
+    groups = np.lib.format.open_memmap(os.path.join(out_dir, "groups.npy"), mode="w+", dtype=np.int64, shape=(n,))
+
+    order = np.random.default_rng(seed).permutation(n) if shuffle else np.arange(n)
+    extra = [group_column] if group_column else ["lon", "lat", "longitude", "latitude"]
+    read_cols = list(dict.fromkeys(list(feature_columns) + extra))
+
+    group_map = {}
+    pos = 0
+    for source, label in sources:
+        for chunk in _iter_chunks(source, read_cols):
+            m = len(chunk)
+            if m == 0:
+                continue
+            idx = order[pos:pos + m]
+            X[idx] = chunk[feature_columns].to_numpy(dtype=np.float32, na_value=np.nan)
+            y[idx] = label
+            if group_column:
+                groups[idx] = _group_codes(chunk[group_column], group_map)
+            else:
+                lon = chunk["lon"].fillna(chunk["longitude"])
+                lat = chunk["lat"].fillna(chunk["latitude"])
+                groups[idx] = spatial_groups(lon, lat, block_deg)
+            pos += m
+
+    if pos != n:
+        raise ValueError(f"❌ Zeilenzahl inkonsistent: erwartet {n}, gelesen {pos}")
+
+    for arr in (X, y, groups):
+        arr.flush()
+    del X, y, groups
+
+    schema = {
+        "feature_columns": list(feature_columns),
+        "dtype": "float32",
+        "n_rows": n,
+        "labels": {"presence": labels[0], "background": labels[1]},
+        "groups": group_column or f"spatial_block_{block_deg}deg",
+        "group_codes": {str(k): v for k, v in group_map.items()},
+        "missing_group": None if group_column else MISSING_GROUP,
+        "shuffled": bool(shuffle),
+        "seed": seed,
+        "sources": [s if isinstance(s, str) else "<DataFrame>" for s, _ in sources],
+    }
+    with open(os.path.join(out_dir, "schema.json"), "w") as f:
+        json.dump(schema, f, indent=2)
+
+    print(f"✅ Trainingsmatrix gespeichert: {out_dir} ({n} × {k}, float32)")
+    return out_dir
+
+
+def load_training_matrix(out_dir, mmap=True):
+    """
+    Lädt X, y, groups und Schema. Mit mmap=True werden die Arrays nur
+    eingeblendet (np.load mmap_mode="r") – kein Parsen, keine Kopie.
+    """
+    mode = "r" if mmap else None
+    X = np.load(os.path.join(out_dir, "X.npy"), mmap_mode=mode)
+    y = np.load(os.path.join(out_dir, "y.npy"), mmap_mode=mode)
+    groups = np.load(os.path.join(out_dir, "groups.npy"), mmap_mode=mode)
+    with open(os.path.join(out_dir, "schema.json")) as f:
+        schema = json.load(f)
+    return X, y, groups, schema
@@ -0,0 +1,176 @@
+# ============================================================
+# 🧪 fake_ee.py
+# Stand-in für earthengine-api – nur die von den Pipelines genutzte API
+# ============================================================
+
+import os
+import threading
+import time
+
+
+class FakeTask:
+    """
+    Export-Task mit vorgegebener Statusfolge je Versuch. "START_ERROR" lässt
+    start() scheitern, "STATUS_ERROR" status(); COMPLETED legt die Exportdatei
+    im Drive-Ordner ab (wie die Drive-Synchronisierung).
+    """
+
+    def __init__(self, ee, params):
+        self.ee = ee
+        self.params = params
+        attempts = ee.scripts.get(params["description"], [["COMPLETED"]])
+        n = ee.attempts.get(params["description"], 0)
+        self.states = list(attempts[min(n, len(attempts) - 1)])
+        ee.attempts[params["description"]] = n + 1
+        self.done = False
+
+    def start(self):
+        if self.states and self.states[0] == "START_ERROR":
+            raise RuntimeError("Too many tasks already in the queue")
+        self.ee.log.append(("start", self.params["description"]))
+        self.ee.active += 1
+        self.ee.max_active = max(self.ee.max_active, self.ee.active)
+
+    def status(self):
+        state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        if state == "STATUS_ERROR":
+            raise RuntimeError("Earth Engine: transient backend error")
+        if state in ("COMPLETED", "FAILED", "CANCELLED") and not self.done:
+            self.done = True
+            self.ee.active -= 1
+            if state == "COMPLETED":
+                folder = os.path.join(self.ee.drive_root, self.params["folder"])
+                os.makedirs(folder, exist_ok=True)
+                open(os.path.join(folder, f"{self.params['fileNamePrefix']}.tif"), "wb").close()
+        out = {"state": state}
+        if state == "FAILED":
+            out["error_message"] = "User memory limit exceeded."
+        return out
+
+
+class FakeImage:
+    """ee.Image-Ersatz: Bänder als Funktionen (lon, lat) → Wert (None = maskiert)."""
+
+    def __init__(self, ee, bands):
+        self.ee = ee
+        self.bands = dict(bands)
+
+    def addBands(self, other):
+        return FakeImage(self.ee, {**self.bands, **other.bands})
+
+    def reduceRegions(self, collection, reducer, scale):
+        return _Reduced(self, collection)
+
+
+class _Reduced:
+    """Ergebnis von reduceRegions; getInfo() wertet aus (Latenz, geskriptete Fehler)."""
+
+    def __init__(self, image, collection):
+        self.image = image
+        self.features = collection["features"]
+
+    def getInfo(self):
+        ee = self.image.ee
+        with ee.lock:
+            ee.in_flight += 1
+            ee.max_in_flight = max(ee.max_in_flight, ee.in_flight)
+            fail = ee.fail_next > 0
+            ee.fail_next -= fail
+        try:
+            time.sleep(ee.latency)
+            if fail:
+                raise RuntimeError("Computation timed out.")
+            out = []
+            for f in reversed(self.features):  # Reihenfolge nicht garantiert → Join über row_id
+                lon, lat = f["geometry"]["coordinates"]
+                props = dict(f["properties"])
+                for band, fn in self.image.bands.items():
+                    value = fn(lon, lat)
+                    if value is not None:  # maskierte Pixel fehlen in den Properties
+                        props[band] = value
+                out.append({"type": "Feature", "properties": props})
+            with ee.lock:
+                ee.requests.append(len(self.features))
+            return {"type": "FeatureCollection", "features": out}
+        finally:
+            with ee.lock:
+                ee.in_flight -= 1
+
+
+class FakeEE:
+    """
+    Modul-Ersatz: Geometry.Rectangle/Point, Feature, FeatureCollection,
+    Reducer.first, batch.Export.image.toDrive; Bilder über fake_image().
+    """
+
+    def __init__(self, drive_root=None, scripts=None, fail_next=0, latency=0.0):
+        self.drive_root = drive_root
+        self.scripts = scripts or {}
+        self.attempts = {}
+        self.log = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        self.fail_next = fail_next
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+        ee = self
+
+        class Geometry:
+            @staticmethod
+            def Rectangle(coords):
+                return {"type": "Rectangle", "coords": list(coords)}
+
+            @staticmethod
+            def Point(coords):
+                return {"type": "Point", "coordinates": list(coords)}
+
+        class Reducer:
+            @staticmethod
+            def first():
+                return "first"
+
+        class image:
+            @staticmethod
+            def toDrive(**params):
+                return FakeTask(ee, params)
+
+        class Export:
+            pass
+
+        class batch:
+            pass
+
+        Export.image = image
+        batch.Export = Export
+        self.Geometry = Geometry
+        self.Reducer = Reducer
+        self.batch = batch
+
+    def Feature(self, geometry, properties):
+        return {"type": "Feature", "geometry": geometry, "properties": dict(properties)}
+
+    def FeatureCollection(self, features):
+        return {"type": "FeatureCollection", "features": list(features)}
+
+    def fake_image(self, bands):
+        return FakeImage(self, bands)
+
+
+class FakeClock:
+    """sleep/clock-Paar: sleep() stellt die Uhr vor und protokolliert die Wartezeit."""
+
+    def __init__(self, log=None):
+        self.now = 0.0
+        self.sleeps = []
+        self.log = log if log is not None else []
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.sleeps.append(seconds)
+        self.log.append(("sleep", seconds))
+
+    def clock(self):
+        return self.now
@@ -0,0 +1,51 @@
+# Sparse-Artefakte müssen den Vollraster-Generatoren entsprechen – auch mit NaN (Wolkenmaske).
+
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.transform import from_origin
+
+from pipe import artefact_sparse, artefact_generator_fast, artefact_generator_live
+
+STD_SIZE, DOWNSAMPLE = 7, 5
+
+
+def _scene(tmp_path):
+    rng = np.random.default_rng(0)
+    arr = rng.random((90, 110)).astype("float32")
+    arr[10:25, 30:50] = np.nan          # Wolkenloch
+    arr[60:62, :] = np.nan              # Streifen
+    folder = tmp_path / "ndvi"
+    folder.mkdir()
+    transform = from_origin(13.0, 52.5, 1e-4, 1e-4)
+    with rasterio.open(
+        folder / "NDVI_BerlinBB_2023_06.tif", "w", driver="GTiff", height=arr.shape[0], width=arr.shape[1],
+        count=1, dtype="float32", crs="EPSG:4326", transform=transform, nodata=np.nan,
+    ) as dst:
+        dst.write(arr, 1)
+    cfg = {
+        "paths": {"ndvi_dir": str(folder), "output_dir": str(tmp_path / "out")},
+        "export": {"tiling": {"enabled": False, "region_name": "BerlinBB"}},
+        "artefacts": {"std_kernel_size": STD_SIZE, "subsample_step": DOWNSAMPLE},
+    }
+    return arr, transform, cfg
+
+
+def test_sparse_matches_fast_and_live_with_nan(tmp_path):
+    arr, transform, cfg = _scene(tmp_path)
+    # Punkte am Wolkenrand, im Loch, am Rasterrand und innen
+    rows = np.array([9, 17, 26, 0, 89, 45, 61, 70])
+    cols = np.array([29, 40, 51, 0, 109, 64, 5, 100])
+    xs, ys = rasterio.transform.xy(transform, rows, cols)
+    points = pd.DataFrame({"longitude": xs, "latitude": ys, "date": "2023-06-15"})
+
+    sparse = artefact_sparse.compute_sparse_artefacts(cfg, points, indices=("NDVI",))
+
+    fast_std = artefact_generator_fast.local_std(arr, size=STD_SIZE, strip_rows=32)
+    live_std = artefact_generator_live.local_std_blockwise(arr, size=STD_SIZE, block_size=40)
+    fast_moran, fast_geary = artefact_generator_fast.compute_moran_geary(arr, DOWNSAMPLE)
+
+    np.testing.assert_allclose(live_std, fast_std, rtol=1e-6, atol=1e-7)
+    np.testing.assert_allclose(sparse["NDVI_STD"], fast_std[rows, cols], rtol=1e-6, atol=1e-7)
+    np.testing.assert_allclose(sparse["NDVI_MORAN"], fast_moran[rows, cols], rtol=1e-6, atol=1e-7)
+    np.testing.assert_allclose(sparse["NDVI_GEARY"], fast_geary[rows, cols], rtol=1e-6, atol=1e-7)
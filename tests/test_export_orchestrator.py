@@ -0,0 +1,84 @@
+# Export-Warteschlange gegen einen ee-Stand-in: Limit, Backoff, Neustarts, Inventar.
+
+import os
+
+import pandas as pd
+
+from pipe import export_orchestrator
+from tests.fake_ee import FakeEE, FakeClock
+
+
+def _cfg(tmp_path):
+    drive = tmp_path / "drive"
+    return {
+        "paths": {
+            "ndvi_dir": str(drive / "NDVI_Exports"),
+            "ndwi_dir": str(drive / "NDWI_Exports"),
+            "raster_inventory": str(tmp_path / "inventory.csv"),
+        },
+        "gee": {"scale": 10, "max_pixels": 1e13},
+        "export": {
+            "years": [2023], "months": [6, 7, 8],
+            "region_bbox": [12.8, 52.2, 13.8, 52.7],
+            "tiling": {"enabled": False, "region_name": "BerlinBB"},
+            "orchestrator": {},
+        },
+    }, str(drive)
+
+
+def _run(cfg, ee, clock, jobs=None, **kw):
+    kw = {"max_running": 2, "poll_interval": 1, "max_poll_interval": 8, "max_retries": 1, "ingest_timeout": 100, **kw}
+    return export_orchestrator.run_export_queue(
+        jobs=jobs, cfg=cfg, ee_module=ee, image_fn=lambda *args: "image",
+        sleep=clock.sleep, clock=clock.clock, **kw,
+    )
+
+
+def test_respects_max_running_and_ingests(tmp_path):
+    cfg, drive = _cfg(tmp_path)
+    jobs = export_orchestrator.build_export_jobs(cfg, indices=("NDVI", "NDWI"))
+    ee = FakeEE(drive, {j["description"]: [["RUNNING", "RUNNING", "COMPLETED"]] for j in jobs})
+    result = _run(cfg, ee, FakeClock(ee.log), jobs=jobs)
+
+    assert len(jobs) == 6 and len(result["completed"]) == 6 and not result["failed"]
+    assert ee.max_active == 2
+    inv = pd.read_csv(cfg["paths"]["raster_inventory"])
+    assert sorted(inv["month"].tolist()) == [6, 6, 7, 7, 8, 8]
+    assert set(inv["source"]) == {"gee_export"}
+    assert all(os.path.exists(p) for p in inv["path"])
+
+
+def test_backoff_doubles_until_progress(tmp_path):
+    cfg, drive = _cfg(tmp_path)
+    jobs = export_orchestrator.build_export_jobs(cfg, indices=("NDVI",), months=[6])
+    ee = FakeEE(drive, {jobs[0]["description"]: [["RUNNING"] * 5 + ["FAILED"], ["RUNNING", "COMPLETED"]]})
+    clock = FakeClock(ee.log)
+    _run(cfg, ee, clock, jobs=jobs)
+
+    # ohne Fortschritt verdoppeln bis max_poll_interval, nach FAILED (Fortschritt) zurück auf 1
+    assert clock.sleeps == [1, 2, 4, 8, 8, 8, 1, 2]
+
+
+def test_retries_failed_task_and_gives_up_after_max_retries(tmp_path):
+    cfg, drive = _cfg(tmp_path)
+    jobs = export_orchestrator.build_export_jobs(cfg, indices=("NDVI",), months=[6, 7])
+    flaky, broken = (j["description"] for j in jobs)
+    ee = FakeEE(drive, {
+        flaky: [["STATUS_ERROR", "FAILED"], ["RUNNING", "COMPLETED"]],
+        broken: [["FAILED"]],
+    })
+    result = _run(cfg, ee, FakeClock(ee.log), jobs=jobs)
+
+    assert [j["description"] for j in result["completed"]] == [flaky]
+    assert [(j["description"], j["state"], j["attempts"]) for j in result["failed"]] == [(broken, "FAILED", 2)]
+
+
+def test_failed_start_waits_for_next_poll(tmp_path):
+    cfg, drive = _cfg(tmp_path)
+    jobs = export_orchestrator.build_export_jobs(cfg, indices=("NDVI",), months=[6])
+    desc = jobs[0]["description"]
+    ee = FakeEE(drive, {desc: [["START_ERROR"], ["COMPLETED"]]})
+    result = _run(cfg, ee, FakeClock(ee.log), jobs=jobs)
+
+    assert result["completed"][0]["attempts"] == 2
+    assert ee.log[0][0] == "sleep" and ee.log[1] == ("start", desc)
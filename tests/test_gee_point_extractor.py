@@ -0,0 +1,67 @@
+# Serverseitige Punktextraktion gegen einen ee-Stand-in: Chunks, Parallelität, Retry, Join.
+
+import numpy as np
+import pandas as pd
+
+from pipe import gee_point_extractor
+from tests.fake_ee import FakeEE
+
+
+def _cfg(tmp_path):
+    return {
+        "paths": {"output_dir": str(tmp_path / "out")},
+        "gee": {"scale": 10},
+        "feature_extraction": {"gee_points": {}},
+    }
+
+
+def _points():
+    return pd.DataFrame({
+        "latitude": [52.30, 52.31, 52.32, 52.33, 52.34, 52.40, 52.41, np.nan],
+        "longitude": [13.1, 13.2, 13.3, 13.4, 13.5, 13.6, 13.7, 13.8],
+        "date": ["2023-06-02", "2023-06-10", "2023-06-20", "2023-06-21", "2023-06-30",
+                 "2023-07-01", "2023-07-15", "2023-07-16"],
+        "species": ["a"] * 8,
+    })
+
+
+def _image_fn(ee):
+    def image_fn(year, month, region, index):
+        if index == "NDVI":
+            return ee.fake_image({"NDVI": lambda lon, lat: month + lon})
+        # NDWI bei lat ≥ 52.4 maskiert → NaN
+        return ee.fake_image({"NDWI": lambda lon, lat: None if lat >= 52.4 else -lat})
+    return image_fn
+
+
+def test_chunks_parallel_retry_and_join(tmp_path):
+    ee = FakeEE(fail_next=1, latency=0.05)
+    sleeps = []
+    out = gee_point_extractor.extract_features_gee(
+        _cfg(tmp_path), _points(), chunk_size=2, max_workers=3, max_retries=2,
+        ee_module=ee, image_fn=_image_fn(ee), sleep=sleeps.append,
+    )
+
+    # Juni 5 Punkte → 2+2+1, Juli 2 Punkte (ohne Koordinate verworfen) → 2
+    assert sorted(ee.requests) == [1, 2, 2, 2]
+    assert 2 <= ee.max_in_flight <= 3
+    assert sleeps == [1]  # ein Fehlschlag, ein Retry nach 1 s
+
+    pts = _points().dropna(subset=["latitude"])
+    month = pd.to_datetime(pts["date"]).dt.month
+    assert out["row_id"].tolist() == list(range(7))
+    np.testing.assert_allclose(out["NDVI"], month + pts["longitude"])
+    expected_ndwi = np.where(pts["latitude"] >= 52.4, np.nan, -pts["latitude"])
+    np.testing.assert_allclose(out["NDWI"], expected_ndwi)
+
+    written = pd.read_csv(tmp_path / "out" / "inaturalist_features_gee.csv")
+    assert sorted(written["row_id"]) == list(range(7))
+
+
+def test_chunk_dropped_after_max_retries(tmp_path):
+    ee = FakeEE(fail_next=3)
+    out = gee_point_extractor.extract_features_gee(
+        _cfg(tmp_path), _points().iloc[:2], chunk_size=5, max_workers=1, max_retries=2,
+        ee_module=ee, image_fn=_image_fn(ee), sleep=lambda s: None,
+    )
+    assert out.empty and list(out.columns) == gee_point_extractor.OUTPUT_COLUMNS
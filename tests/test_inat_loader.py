@@ -0,0 +1,40 @@
+# Seitenabruf: Rate-Limit-Pause nur zwischen Anfragen.
+
+from pipe import inat_loader
+
+
+class _Resp:
+    status_code = 200
+
+    def __init__(self, results):
+        self._results = results
+
+    def json(self):
+        return {"results": self._results}
+
+
+def _fake_api(monkeypatch, pages):
+    calls = []
+
+    def get(url, params, timeout):
+        calls.append(("get", params["page"]))
+        return _Resp(pages[params["page"] - 1] if params["page"] <= len(pages) else [])
+
+    monkeypatch.setattr(inat_loader.requests, "get", get)
+    monkeypatch.setattr(inat_loader.time, "sleep", lambda s: calls.append(("sleep", s)))
+    return calls
+
+
+def test_sleeps_only_between_requests(monkeypatch):
+    calls = _fake_api(monkeypatch, [[{"id": 1}], [{"id": 2}]])
+    pages = list(inat_loader.iter_inat_pages(1, [0, 0, 1, 1], None, None, max_pages=5, sleep=0.5))
+
+    assert pages == [[{"id": 1}], [{"id": 2}]]
+    # dritte Anfrage ist leer → Ende ohne abschließende Pause
+    assert calls == [("get", 1), ("sleep", 0.5), ("get", 2), ("sleep", 0.5), ("get", 3)]
+
+
+def test_no_sleep_after_max_pages(monkeypatch):
+    calls = _fake_api(monkeypatch, [[{"id": 1}], [{"id": 2}]])
+    list(inat_loader.iter_inat_pages(1, [0, 0, 1, 1], None, None, max_pages=2, sleep=0.5))
+    assert calls[-1] == ("get", 2)
@@ -0,0 +1,38 @@
+# Signifikanz in Randfällen: keine Division durch 0, p = 1 ohne messbare Autokorrelation.
+
+import warnings
+
+import numpy as np
+import pytest
+
+from pipe import lisa
+
+
+@pytest.mark.parametrize("mode", ["analytic", "permutation"])
+@pytest.mark.parametrize("shape", [(1, 1), (1, 2), (2, 1)])
+def test_tiny_grids_are_not_significant(mode, shape):
+    arr = np.arange(np.prod(shape), dtype="float32").reshape(shape)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        out = lisa.lisa_rasters(arr, downsample=1, mode=mode, permutations=99)
+    np.testing.assert_array_equal(out["MORANP"], 1.0)
+    np.testing.assert_array_equal(out["LISA"], 0)
+
+
+@pytest.mark.parametrize("mode", ["analytic", "permutation"])
+def test_constant_scene_is_not_significant(mode):
+    arr = np.full((40, 40), 0.5, dtype="float32")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        out = lisa.lisa_rasters(arr, downsample=5, mode=mode, permutations=99)
+    np.testing.assert_array_equal(out["MORANP"], 1.0)
+
+
+def test_cells_without_neighbours_get_p_one():
+    z = np.array([[1.0, -1.0, 0.5]])
+    card = np.array([[0, 2, 1]])
+    Is = np.array([[0.0, 0.3, -0.2]])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        p = lisa.analytic_pvalues(z, card, Is)
+    assert p[0, 0] == 1.0 and np.all(np.isfinite(p))
@@ -0,0 +1,29 @@
+# Trainingsmatrix: räumliche Gruppen, auch für Punkte ohne Koordinaten.
+
+import numpy as np
+import pandas as pd
+
+from pipe import training_matrix
+
+
+def test_spatial_groups_map_missing_coordinates():
+    lon = np.array([13.41, 13.42, np.nan, 13.46, -0.01])
+    lat = np.array([52.51, 52.52, 52.5, np.nan, 0.01])
+    groups = training_matrix.spatial_groups(lon, lat, block_deg=0.05)
+
+    assert groups[0] == groups[1] != groups[3]
+    assert groups[2] == groups[3] == training_matrix.MISSING_GROUP
+    assert (groups[[0, 1, 4]] >= 0).all()
+
+
+def test_build_matrix_groups_missing_rows_separately(tmp_path):
+    presence = pd.DataFrame({"latitude": [52.51, np.nan], "longitude": [13.41, 13.42], "NDVI": [0.5, 0.6]})
+    background = pd.DataFrame({"lat": [52.52, 52.9], "lon": [13.42, np.nan], "NDVI": [0.1, 0.2]})
+    out = training_matrix.build_training_matrix(
+        [presence], [background], str(tmp_path / "matrix"), ["NDVI"], shuffle=False,
+    )
+    X, y, groups, schema = training_matrix.load_training_matrix(out)
+
+    assert y.tolist() == [1, 1, 0, 0]
+    assert groups[0] == groups[2] >= 0
+    assert groups[1] == groups[3] == schema["missing_group"] == training_matrix.MISSING_GROUP